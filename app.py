@@ -3,14 +3,47 @@ Household Expense Tracker - Khatabook Style
 Using Basic Python (No Pandas, No Graph APIs)
 Built with: Loops, Dictionaries, Lists, File Handling + Streamlit Dashboard
 Version: 3.0 - Dynamic Subcategories + Edit Functionality + Reports
+
+The data model, storage and helpers live in the khata package; this file is
+only the Streamlit dashboard.
 """
 
+import io
 import streamlit as st
-import json
-import os
-import time
 from datetime import datetime, timedelta
 
+from khata import (
+    CATEGORIES,
+    PAYMENT_MODES,
+    CSV_COLUMNS,
+    REPORT_SECTIONS,
+    SORT_CHOICES,
+    SharedLedger,
+    aggregate_expenses,
+    build_export,
+    calculate_average,
+    calculate_total,
+    filter_by_category,
+    filter_by_date_range,
+    filter_this_month,
+    filter_this_week,
+    filter_this_year,
+    filter_today,
+    generate_text_bar,
+    get_expense_by_id,
+    get_expense_page,
+    get_monthly_totals,
+    get_subcategory_wise_totals,
+    get_top_expenses,
+    guess_column_map,
+    import_csv,
+    iter_sorted_expenses,
+    rank_totals,
+    read_csv_headers,
+    stream_detailed_report,
+    with_zero_totals
+)
+
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
@@ -21,816 +54,41 @@ st.set_page_config(
     layout="wide"
 )
 
-# Data file path
-DATA_FILE = "expenses_data.json"
-
-# ============================================================================
-# ENHANCED CATEGORY & SUBCATEGORY STRUCTURE
-# ============================================================================
-
-CATEGORIES = {
-    "🛒 Groceries": [
-        "Vegetables (Sabzi)",
-        "Fruits (Phal)",
-        "Milk & Dairy (Doodh/Paneer/Dahi)",
-        "Rice & Grains (Chawal/Gehu)",
-        "Dal & Pulses (Dal/Chana)",
-        "Cooking Oil & Ghee",
-        "Spices & Masalas",
-        "Flour & Atta",
-        "Bread & Bakery",
-        "Eggs & Meat",
-        "Fish & Seafood",
-        "Snacks & Namkeen",
-        "Biscuits & Cookies",
-        "Tea & Coffee",
-        "Sugar & Jaggery",
-        "Dry Fruits",
-        "Packaged Food",
-        "Beverages & Soft Drinks",
-        "Other Groceries"
-    ],
-    
-    "💡 Utilities": [
-        "Electricity Bill",
-        "Water Bill",
-        "Gas (LPG/PNG) Bill",
-        "Internet/WiFi Bill",
-        "Mobile Recharge",
-        "Landline Bill",
-        "DTH/Cable TV",
-        "Newspaper/Magazine",
-        "Society Maintenance",
-        "Garbage Collection",
-        "Other Utilities"
-    ],
-    
-    "🏠 Housing & Rent": [
-        "House Rent",
-        "Society Maintenance",
-        "Property Tax",
-        "Home Insurance",
-        "Repairs & Maintenance",
-        "Plumbing Work",
-        "Electrical Work",
-        "Painting & Whitewash",
-        "Pest Control",
-        "Security Charges",
-        "Parking Charges",
-        "Other Housing"
-    ],
-    
-    "🚗 Transportation": [
-        "Petrol/Diesel",
-        "CNG/Gas",
-        "Auto Rickshaw",
-        "Cab/Taxi (Ola/Uber)",
-        "Bus Fare",
-        "Metro/Train Fare",
-        "Toll Charges",
-        "Parking Fees",
-        "Vehicle Service",
-        "Vehicle Repair",
-        "Tyre/Battery",
-        "Vehicle Insurance",
-        "Driving License/RC",
-        "Fastag Recharge",
-        "Other Transport"
-    ],
-    
-    "🏥 Medical & Health": [
-        "Doctor Consultation",
-        "Medicines (Pharmacy)",
-        "Lab Tests & Diagnostics",
-        "Hospital Bills",
-        "Health Insurance Premium",
-        "Dental Treatment",
-        "Eye Care/Spectacles",
-        "Ayurvedic/Homeopathy",
-        "Gym/Fitness Membership",
-        "Yoga Classes",
-        "Medical Equipment",
-        "First Aid Supplies",
-        "Vaccinations",
-        "Physiotherapy",
-        "Other Medical"
-    ],
-    
-    "📚 Education": [
-        "School Fees",
-        "College Fees",
-        "Tuition/Coaching Fees",
-        "Books & Notebooks",
-        "Stationery",
-        "School Uniform",
-        "School Bus/Transport",
-        "Online Courses",
-        "Certification Exams",
-        "Computer Classes",
-        "Music/Dance Classes",
-        "Sports Coaching",
-        "Educational Apps",
-        "Library Fees",
-        "Project Materials",
-        "Other Education"
-    ],
-    
-    "👕 Shopping & Clothing": [
-        "Men's Clothing",
-        "Women's Clothing",
-        "Kids' Clothing",
-        "Footwear/Shoes",
-        "Jewellery",
-        "Watches",
-        "Bags & Wallets",
-        "Cosmetics & Makeup",
-        "Skincare Products",
-        "Hair Care Products",
-        "Perfumes & Deodorants",
-        "Accessories",
-        "Festival Shopping",
-        "Wedding Shopping",
-        "Other Shopping"
-    ],
-    
-    "🎬 Entertainment": [
-        "Movies (Theatre)",
-        "OTT Subscriptions (Netflix/Prime/Hotstar)",
-        "Music Subscriptions (Spotify/Gaana)",
-        "Dining Out/Restaurant",
-        "Food Delivery (Swiggy/Zomato)",
-        "Cafe & Coffee",
-        "Street Food",
-        "Picnic/Outing",
-        "Amusement Park",
-        "Gaming",
-        "Books & Magazines",
-        "Hobbies",
-        "Party & Celebration",
-        "Other Entertainment"
-    ],
-    
-    "✈️ Travel & Vacation": [
-        "Flight Tickets",
-        "Train Tickets (IRCTC)",
-        "Bus Tickets",
-        "Hotel/Accommodation",
-        "Travel Insurance",
-        "Visa Fees",
-        "Passport Fees",
-        "Tour Package",
-        "Local Sightseeing",
-        "Travel Food",
-        "Travel Shopping",
-        "Pilgrimage/Religious Travel",
-        "Other Travel"
-    ],
-    
-    "💳 EMI & Loans": [
-        "Home Loan EMI",
-        "Car Loan EMI",
-        "Personal Loan EMI",
-        "Education Loan EMI",
-        "Credit Card Bill",
-        "Credit Card EMI",
-        "Gold Loan EMI",
-        "Two-Wheeler Loan EMI",
-        "Consumer Durable EMI",
-        "Other Loan EMI"
-    ],
-    
-    "📱 Electronics & Gadgets": [
-        "Mobile Phone",
-        "Laptop/Computer",
-        "Tablet/iPad",
-        "TV/Smart TV",
-        "Refrigerator",
-        "Washing Machine",
-        "AC/Cooler",
-        "Microwave/Oven",
-        "Mixer/Grinder",
-        "Water Purifier",
-        "Geyser/Heater",
-        "Fan/Cooler",
-        "Camera",
-        "Earphones/Headphones",
-        "Smart Watch",
-        "Other Electronics"
-    ],
-    
-    "🏡 Home & Furniture": [
-        "Furniture (Sofa/Bed/Table)",
-        "Mattress & Bedding",
-        "Curtains & Blinds",
-        "Kitchen Utensils",
-        "Cookware",
-        "Crockery & Cutlery",
-        "Home Decor",
-        "Cleaning Supplies",
-        "Detergent & Soap",
-        "Room Freshener",
-        "Storage & Organization",
-        "Garden Supplies",
-        "Light & Lamps",
-        "Other Home Items"
-    ],
-    
-    "👶 Kids & Baby": [
-        "Baby Food & Formula",
-        "Diapers",
-        "Baby Clothes",
-        "Baby Care Products",
-        "Toys & Games",
-        "School Supplies",
-        "Kids Books",
-        "Baby Furniture",
-        "Stroller/Pram",
-        "Kids Activities",
-        "Birthday Party",
-        "Other Kids Expenses"
-    ],
-    
-    "🐕 Pets": [
-        "Pet Food",
-        "Pet Grooming",
-        "Vet/Doctor Visits",
-        "Pet Medicines",
-        "Pet Accessories",
-        "Pet Insurance",
-        "Pet Boarding",
-        "Other Pet Expenses"
-    ],
-    
-    "💰 Investments & Savings": [
-        "SIP/Mutual Funds",
-        "Fixed Deposit",
-        "Recurring Deposit",
-        "PPF Contribution",
-        "NPS Contribution",
-        "LIC Premium",
-        "Stock Purchase",
-        "Gold Purchase",
-        "Chit Fund",
-        "Other Investments"
-    ],
-    
-    "🎁 Gifts & Donations": [
-        "Birthday Gifts",
-        "Wedding Gifts",
-        "Festival Gifts",
-        "Charity/Donation",
-        "Religious Donation",
-        "Temple/Church Offering",
-        "Tips & Gratuity",
-        "Other Gifts"
-    ],
-    
-    "👨‍👩‍👧‍👦 Family & Personal": [
-        "Salon/Haircut",
-        "Spa & Massage",
-        "Parlour/Beauty",
-        "Laundry/Dry Cleaning",
-        "Tailoring/Alterations",
-        "Marriage Expenses",
-        "Funeral Expenses",
-        "Family Function",
-        "Pocket Money",
-        "Personal Care",
-        "Other Personal"
-    ],
-    
-    "📋 Government & Taxes": [
-        "Income Tax",
-        "Property Tax",
-        "Professional Tax",
-        "GST Payment",
-        "Stamp Duty",
-        "Registration Fees",
-        "Court Fees",
-        "Fine/Penalty",
-        "Other Government"
-    ],
-    
-    "🔧 Services & Repairs": [
-        "Maid/Domestic Help",
-        "Cook Salary",
-        "Driver Salary",
-        "Watchman/Security",
-        "Carpenter Work",
-        "AC Service/Repair",
-        "Appliance Repair",
-        "Mobile Repair",
-        "Computer Repair",
-        "Other Services"
-    ],
-    
-    "❓ Miscellaneous": [
-        "ATM Withdrawal (Cash)",
-        "Bank Charges",
-        "Courier/Postage",
-        "Photocopy/Printing",
-        "Emergency Expense",
-        "Lost/Stolen Items",
-        "Uncategorized",
-        "Other Expenses"
-    ]
-}
+# Storage settings (STORAGE_MODE, DATA_FILE, ...) live in khata/storage.py
 
-PAYMENT_MODES = [
-    "Cash",
-    "UPI (GPay/PhonePe/Paytm)",
-    "Credit Card",
-    "Debit Card",
-    "Net Banking",
-    "Wallet (Paytm/Amazon)",
-    "Cheque",
-    "Bank Transfer (NEFT/IMPS)",
-    "EMI",
-    "Other"
-]
+# Page sizes offered on the View & Edit page
+PAGE_SIZES = [10, 25, 50, 100]
 
 # ============================================================================
-# HELPER FUNCTIONS
+# STREAMLIT DASHBOARD
 # ============================================================================
 
-def load_expenses():
-    """Load expenses from JSON file"""
-    if os.path.exists(DATA_FILE):
-        try:
-            with open(DATA_FILE, 'r') as file:
-                data = json.load(file)
-                return data
-        except:
-            return []
-    return []
-
-
-def save_expenses(expenses_list):
-    """Save expenses to JSON file"""
-    with open(DATA_FILE, 'w') as file:
-        json.dump(expenses_list, file, indent=2)
-
-
-def generate_unique_id():
-    """Generate unique ID using timestamp"""
-    return int(time.time() * 1000000)
-
-
-def add_expense(expenses_list, date, category, subcategory, description, amount, payment_mode):
-    """Add new expense"""
-    new_expense = {
-        'id': generate_unique_id(),
-        'date': date,
-        'category': category,
-        'subcategory': subcategory,
-        'description': description,
-        'amount': amount,
-        'payment_mode': payment_mode,
-        'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-        'updated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    }
-    expenses_list.append(new_expense)
-    return expenses_list
-
-
-def update_expense(expenses_list, expense_id, date, category, subcategory, description, amount, payment_mode):
-    """Update existing expense by ID"""
-    for i in range(len(expenses_list)):
-        if expenses_list[i]['id'] == expense_id:
-            expenses_list[i]['date'] = date
-            expenses_list[i]['category'] = category
-            expenses_list[i]['subcategory'] = subcategory
-            expenses_list[i]['description'] = description
-            expenses_list[i]['amount'] = amount
-            expenses_list[i]['payment_mode'] = payment_mode
-            expenses_list[i]['updated_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            break
-    return expenses_list
-
-
-def delete_expense(expenses_list, expense_id):
-    """Delete expense by ID"""
-    new_list = []
-    for expense in expenses_list:
-        if expense['id'] != expense_id:
-            new_list.append(expense)
-    return new_list
-
-
-def get_expense_by_id(expenses_list, expense_id):
-    """Get single expense by ID"""
-    for expense in expenses_list:
-        if expense['id'] == expense_id:
-            return expense
-    return None
-
-
-def calculate_total(expenses_list):
-    """Calculate total"""
-    total = 0
-    for expense in expenses_list:
-        total = total + expense['amount']
-    return total
-
-
-def calculate_average(expenses_list):
-    """Calculate average"""
-    if len(expenses_list) == 0:
-        return 0
-    total = calculate_total(expenses_list)
-    average = total / len(expenses_list)
-    return round(average, 2)
-
-
-def find_max_expense(expenses_list):
-    """Find maximum expense"""
-    if len(expenses_list) == 0:
-        return 0
-    max_amount = 0
-    for expense in expenses_list:
-        if expense['amount'] > max_amount:
-            max_amount = expense['amount']
-    return max_amount
-
+@st.cache_resource
+def get_shared_ledger():
+    """One SharedLedger for every session in this server process"""
+    return SharedLedger()
 
-def find_min_expense(expenses_list):
-    """Find minimum expense"""
-    if len(expenses_list) == 0:
-        return 0
-    min_amount = expenses_list[0]['amount']
-    for expense in expenses_list:
-        if expense['amount'] < min_amount:
-            min_amount = expense['amount']
-    return min_amount
 
+def report_download(expenses_list, report_type, sections=REPORT_SECTIONS, max_transactions=None):
+    """Detailed report for st.download_button: streamed into bytes only when the
+    button is clicked, and never kept in the export cache"""
+    def build():
+        buffer = io.BytesIO()
+        for line in stream_detailed_report(expenses_list, report_type, sections, max_transactions):
+            buffer.write(line.encode('utf-8'))
+            buffer.write(b"\n")
+        return buffer.getvalue()
+    return build
 
-def filter_by_category(expenses_list, category):
-    """Filter by category"""
-    filtered_list = []
-    for expense in expenses_list:
-        if expense['category'] == category:
-            filtered_list.append(expense)
-    return filtered_list
 
+def reset_view_page():
+    """Back to the first View & Edit page when its filters or sort change"""
+    st.session_state.view_page = 1
 
-def filter_by_payment_mode(expenses_list, payment_mode):
-    """Filter by payment mode"""
-    filtered_list = []
-    for expense in expenses_list:
-        if expense['payment_mode'] == payment_mode:
-            filtered_list.append(expense)
-    return filtered_list
-
-
-def filter_today(expenses_list):
-    """Filter today's expenses"""
-    today = datetime.now().strftime('%Y-%m-%d')
-    filtered_list = []
-    for expense in expenses_list:
-        if expense['date'] == today:
-            filtered_list.append(expense)
-    return filtered_list
-
-
-def filter_this_week(expenses_list):
-    """Filter this week's expenses"""
-    today = datetime.now()
-    week_start = today - timedelta(days=today.weekday())
-    week_start_str = week_start.strftime('%Y-%m-%d')
-    today_str = today.strftime('%Y-%m-%d')
-    
-    filtered_list = []
-    for expense in expenses_list:
-        if week_start_str <= expense['date'] <= today_str:
-            filtered_list.append(expense)
-    return filtered_list
-
-
-def filter_this_month(expenses_list):
-    """Filter this month's expenses"""
-    today = datetime.now()
-    month_start = today.replace(day=1).strftime('%Y-%m-%d')
-    today_str = today.strftime('%Y-%m-%d')
-    
-    filtered_list = []
-    for expense in expenses_list:
-        if month_start <= expense['date'] <= today_str:
-            filtered_list.append(expense)
-    return filtered_list
-
-
-def filter_this_year(expenses_list):
-    """Filter this year's expenses"""
-    today = datetime.now()
-    year_start = today.replace(month=1, day=1).strftime('%Y-%m-%d')
-    today_str = today.strftime('%Y-%m-%d')
-    
-    filtered_list = []
-    for expense in expenses_list:
-        if year_start <= expense['date'] <= today_str:
-            filtered_list.append(expense)
-    return filtered_list
-
-
-def filter_by_date_range(expenses_list, start_date, end_date):
-    """Filter by date range"""
-    filtered_list = []
-    for expense in expenses_list:
-        if start_date <= expense['date'] <= end_date:
-            filtered_list.append(expense)
-    return filtered_list
-
-
-def get_category_wise_totals(expenses_list):
-    """Calculate category-wise totals"""
-    category_totals = {}
-    
-    for category in CATEGORIES.keys():
-        category_totals[category] = 0
-    
-    for expense in expenses_list:
-        category = expense['category']
-        amount = expense['amount']
-        if category in category_totals:
-            category_totals[category] = category_totals[category] + amount
-        else:
-            category_totals[category] = amount
-    
-    return category_totals
-
-
-def get_subcategory_wise_totals(expenses_list, category):
-    """Calculate subcategory-wise totals"""
-    subcategory_totals = {}
-    
-    if category in CATEGORIES:
-        for subcategory in CATEGORIES[category]:
-            subcategory_totals[subcategory] = 0
-    
-    for expense in expenses_list:
-        if expense['category'] == category:
-            subcategory = expense['subcategory']
-            amount = expense['amount']
-            if subcategory in subcategory_totals:
-                subcategory_totals[subcategory] = subcategory_totals[subcategory] + amount
-            else:
-                subcategory_totals[subcategory] = amount
-    
-    return subcategory_totals
-
-
-def get_payment_mode_totals(expenses_list):
-    """Calculate payment mode-wise totals"""
-    payment_totals = {}
-    
-    for mode in PAYMENT_MODES:
-        payment_totals[mode] = 0
-    
-    for expense in expenses_list:
-        mode = expense['payment_mode']
-        amount = expense['amount']
-        if mode in payment_totals:
-            payment_totals[mode] = payment_totals[mode] + amount
-        else:
-            payment_totals[mode] = amount
-    
-    return payment_totals
-
-
-def get_daily_totals(expenses_list):
-    """Calculate daily totals"""
-    daily_totals = {}
-    
-    for expense in expenses_list:
-        date = expense['date']
-        amount = expense['amount']
-        
-        if date in daily_totals:
-            daily_totals[date] = daily_totals[date] + amount
-        else:
-            daily_totals[date] = amount
-    
-    return daily_totals
-
-
-def get_monthly_totals(expenses_list):
-    """Calculate monthly totals"""
-    monthly_totals = {}
-    
-    for expense in expenses_list:
-        date_parts = expense['date'].split('-')
-        year_month = date_parts[0] + '-' + date_parts[1]
-        amount = expense['amount']
-        
-        if year_month in monthly_totals:
-            monthly_totals[year_month] = monthly_totals[year_month] + amount
-        else:
-            monthly_totals[year_month] = amount
-    
-    return monthly_totals
-
-
-def sort_expenses_by_date(expenses_list, ascending=True):
-    """Sort by date using bubble sort"""
-    n = len(expenses_list)
-    sorted_list = expenses_list.copy()
-    
-    for i in range(n):
-        for j in range(0, n - i - 1):
-            if ascending:
-                if sorted_list[j]['date'] > sorted_list[j + 1]['date']:
-                    sorted_list[j], sorted_list[j + 1] = sorted_list[j + 1], sorted_list[j]
-            else:
-                if sorted_list[j]['date'] < sorted_list[j + 1]['date']:
-                    sorted_list[j], sorted_list[j + 1] = sorted_list[j + 1], sorted_list[j]
-    
-    return sorted_list
 
-
-def sort_expenses_by_amount(expenses_list, ascending=True):
-    """Sort by amount using bubble sort"""
-    n = len(expenses_list)
-    sorted_list = expenses_list.copy()
-    
-    for i in range(n):
-        for j in range(0, n - i - 1):
-            if ascending:
-                if sorted_list[j]['amount'] > sorted_list[j + 1]['amount']:
-                    sorted_list[j], sorted_list[j + 1] = sorted_list[j + 1], sorted_list[j]
-            else:
-                if sorted_list[j]['amount'] < sorted_list[j + 1]['amount']:
-                    sorted_list[j], sorted_list[j + 1] = sorted_list[j + 1], sorted_list[j]
-    
-    return sorted_list
-
-
-def search_expenses(expenses_list, search_term):
-    """Search expenses"""
-    search_term_lower = search_term.lower()
-    results = []
-    
-    for expense in expenses_list:
-        description_lower = expense['description'].lower() if expense['description'] else ""
-        category_lower = expense['category'].lower()
-        subcategory_lower = expense['subcategory'].lower()
-        
-        if (search_term_lower in description_lower or 
-            search_term_lower in category_lower or 
-            search_term_lower in subcategory_lower):
-            results.append(expense)
-    
-    return results
-
-
-def generate_text_bar(value, max_value, bar_length=20):
-    """Generate text-based bar"""
-    if max_value == 0:
-        return "░" * bar_length
-    
-    filled_length = int((value / max_value) * bar_length)
-    bar = "█" * filled_length + "░" * (bar_length - filled_length)
-    return bar
-
-
-def export_to_csv_format(expenses_list):
-    """Convert to CSV format"""
-    csv_lines = []
-    csv_lines.append("Date,Category,Subcategory,Description,Amount,Payment Mode")
-    
-    for expense in expenses_list:
-        desc = expense['description'].replace(',', ';') if expense['description'] else ""
-        line = f"{expense['date']},{expense['category']},{expense['subcategory']},{desc},{expense['amount']},{expense['payment_mode']}"
-        csv_lines.append(line)
-    
-    csv_string = "\n".join(csv_lines)
-    return csv_string
-
-
-def get_top_expenses(expenses_list, n=5):
-    """Get top N expenses"""
-    sorted_list = sort_expenses_by_amount(expenses_list, ascending=False)
-    return sorted_list[:n]
-
-
-def generate_detailed_report(expenses_list, report_type="monthly"):
-    """Generate detailed expense report"""
-    report_lines = []
-    
-    # Header
-    report_lines.append("=" * 60)
-    report_lines.append("       GHAR KA KHATA - DETAILED EXPENSE REPORT")
-    report_lines.append("=" * 60)
-    report_lines.append(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    report_lines.append(f"Report Type: {report_type.upper()}")
-    report_lines.append("=" * 60)
-    report_lines.append("")
-    
-    # Summary Section
-    total = calculate_total(expenses_list)
-    avg = calculate_average(expenses_list)
-    max_exp = find_max_expense(expenses_list)
-    min_exp = find_min_expense(expenses_list)
-    count = len(expenses_list)
-    
-    report_lines.append("📊 SUMMARY")
-    report_lines.append("-" * 40)
-    report_lines.append(f"Total Expenses     : Rs. {total:,.2f}")
-    report_lines.append(f"Total Transactions : {count}")
-    report_lines.append(f"Average Expense    : Rs. {avg:,.2f}")
-    report_lines.append(f"Highest Expense    : Rs. {max_exp:,.2f}")
-    report_lines.append(f"Lowest Expense     : Rs. {min_exp:,.2f}")
-    report_lines.append("")
-    
-    # Category-wise Breakdown
-    report_lines.append("📁 CATEGORY-WISE BREAKDOWN")
-    report_lines.append("-" * 40)
-    
-    category_totals = get_category_wise_totals(expenses_list)
-    
-    # Sort categories by amount
-    sorted_cats = []
-    for cat, amt in category_totals.items():
-        if amt > 0:
-            sorted_cats.append((cat, amt))
-    
-    for i in range(len(sorted_cats)):
-        for j in range(i + 1, len(sorted_cats)):
-            if sorted_cats[i][1] < sorted_cats[j][1]:
-                sorted_cats[i], sorted_cats[j] = sorted_cats[j], sorted_cats[i]
-    
-    for cat, amt in sorted_cats:
-        percentage = (amt / total * 100) if total > 0 else 0
-        report_lines.append(f"{cat}")
-        report_lines.append(f"    Amount: Rs. {amt:,.2f} ({percentage:.1f}%)")
-    
-    report_lines.append("")
-    
-    # Payment Mode Breakdown
-    report_lines.append("💳 PAYMENT MODE BREAKDOWN")
-    report_lines.append("-" * 40)
-    
-    payment_totals = get_payment_mode_totals(expenses_list)
-    for mode, amt in payment_totals.items():
-        if amt > 0:
-            percentage = (amt / total * 100) if total > 0 else 0
-            report_lines.append(f"{mode}: Rs. {amt:,.2f} ({percentage:.1f}%)")
-    
-    report_lines.append("")
-    
-    # Monthly Breakdown
-    report_lines.append("📅 MONTHLY BREAKDOWN")
-    report_lines.append("-" * 40)
-    
-    monthly_totals = get_monthly_totals(expenses_list)
-    sorted_months = sorted(monthly_totals.keys())
-    
-    for month in sorted_months:
-        amt = monthly_totals[month]
-        report_lines.append(f"{month}: Rs. {amt:,.2f}")
-    
-    report_lines.append("")
-    
-    # Top 10 Expenses
-    report_lines.append("🔝 TOP 10 HIGHEST EXPENSES")
-    report_lines.append("-" * 40)
-    
-    top_expenses = get_top_expenses(expenses_list, 10)
-    for i, expense in enumerate(top_expenses):
-        report_lines.append(f"{i+1}. Rs. {expense['amount']:,.2f}")
-        report_lines.append(f"   {expense['category']} → {expense['subcategory']}")
-        report_lines.append(f"   Date: {expense['date']} | {expense['payment_mode']}")
-        if expense['description']:
-            report_lines.append(f"   Note: {expense['description']}")
-        report_lines.append("")
-    
-    # Transaction Details
-    report_lines.append("📋 ALL TRANSACTIONS")
-    report_lines.append("-" * 40)
-    
-    sorted_expenses = sort_expenses_by_date(expenses_list, ascending=False)
-    for i, expense in enumerate(sorted_expenses):
-        report_lines.append(f"{i+1}. {expense['date']} | Rs. {expense['amount']:,.2f}")
-        report_lines.append(f"   {expense['category']} → {expense['subcategory']}")
-        report_lines.append(f"   Payment: {expense['payment_mode']}")
-        if expense['description']:
-            report_lines.append(f"   Note: {expense['description']}")
-        report_lines.append("")
-    
-    # Footer
-    report_lines.append("=" * 60)
-    report_lines.append("         End of Report - Ghar Ka Khata v3.0")
-    report_lines.append("=" * 60)
-    
-    return "\n".join(report_lines)
-
-
-# ============================================================================
-# STREAMLIT DASHBOARD
-# ============================================================================
-
-# Initialize session state
-if 'expenses' not in st.session_state:
-    st.session_state.expenses = load_expenses()
+# Initialize session state (a read-only view of the shared ledger)
+shared_ledger = get_shared_ledger()
+st.session_state.expenses = shared_ledger.view()
 
 if 'edit_expense_id' not in st.session_state:
     st.session_state.edit_expense_id = None
@@ -933,10 +191,11 @@ if page == "🏠 Dashboard":
     st.markdown("---")
     col1, col2, col3, col4 = st.columns(4)
     
-    total = calculate_total(filtered_expenses)
-    count = len(filtered_expenses)
-    avg = calculate_average(filtered_expenses)
-    max_exp = find_max_expense(filtered_expenses)
+    summary = aggregate_expenses(filtered_expenses, ['total', 'count', 'average', 'max'], ['category'])
+    total = summary['total']
+    count = summary['count']
+    avg = summary['average']
+    max_exp = summary['max']
     
     with col1:
         st.metric("💵 Total", f"₹{total:,.2f}")
@@ -949,12 +208,12 @@ if page == "🏠 Dashboard":
     
     # Category Breakdown
     st.markdown("---")
-    if len(filtered_expenses) > 0:
+    if count > 0:
         col1, col2 = st.columns(2)
         
         with col1:
             st.subheader("📊 Top Categories")
-            category_totals = get_category_wise_totals(filtered_expenses)
+            category_totals = with_zero_totals(CATEGORIES.keys(), summary['category'])
             
             max_cat_amt = 0
             for cat, amt in category_totals.items():
@@ -962,11 +221,7 @@ if page == "🏠 Dashboard":
                     max_cat_amt = amt
             
             # Sort and show top 5
-            sorted_cats = [(cat, amt) for cat, amt in category_totals.items() if amt > 0]
-            for i in range(len(sorted_cats)):
-                for j in range(i + 1, len(sorted_cats)):
-                    if sorted_cats[i][1] < sorted_cats[j][1]:
-                        sorted_cats[i], sorted_cats[j] = sorted_cats[j], sorted_cats[i]
+            sorted_cats = rank_totals(category_totals)
             
             for cat, amt in sorted_cats[:5]:
                 bar = generate_text_bar(amt, max_cat_amt, 12)
@@ -976,8 +231,8 @@ if page == "🏠 Dashboard":
         
         with col2:
             st.subheader("📋 Recent Expenses")
-            sorted_exp = sort_expenses_by_date(filtered_expenses, ascending=False)
-            for exp in sorted_exp[:5]:
+            # Only the 5 latest rows are sorted out and built, not the whole period
+            for exp in iter_sorted_expenses(filtered_expenses, [('date', False)], 5):
                 st.markdown(f"**{exp['date']}** - ₹{exp['amount']:,.0f}")
                 st.markdown(f"_{exp['subcategory']}_")
                 st.markdown("---")
@@ -1055,8 +310,7 @@ elif page == "➕ Add Expense":
         if submitted:
             if amount > 0:
                 date_str = expense_date.strftime('%Y-%m-%d')
-                st.session_state.expenses = add_expense(
-                    st.session_state.expenses,
+                shared_ledger.add_expense(
                     date_str,
                     selected_category,  # Use the category selected outside form
                     subcategory,
@@ -1064,7 +318,6 @@ elif page == "➕ Add Expense":
                     amount,
                     payment_mode
                 )
-                save_expenses(st.session_state.expenses)
                 st.success(f"✅ Expense of ₹{amount:,.2f} added to {selected_category} → {subcategory}")
                 st.balloons()
             else:
@@ -1086,15 +339,62 @@ elif page == "➕ Add Expense":
         with cols[i]:
             if st.button(item[0], key=f"quick_{i}", use_container_width=True):
                 today_str = datetime.now().strftime('%Y-%m-%d')
-                st.session_state.expenses = add_expense(
-                    st.session_state.expenses,
+                shared_ledger.add_expense(
                     today_str,
                     item[1], item[2], item[3], item[4],
                     "Cash"
                 )
-                save_expenses(st.session_state.expenses)
                 st.success(f"✅ {item[3]} added!")
                 st.rerun()
+    
+    # Bulk Import
+    st.markdown("---")
+    with st.expander("📤 Bulk Import (CSV / Bank Statement)"):
+        st.caption("Each row needs a date, an amount and a category or subcategory. "
+                   "Rows that don't match are skipped and listed below.")
+        uploaded = st.file_uploader("CSV file", type=["csv"], key="import_file")
+        
+        if uploaded is not None:
+            headers = read_csv_headers(uploaded.getvalue())
+            guessed = guess_column_map(headers)
+            options = ["(none)"] + headers
+            
+            column_map = {}
+            map_cols = st.columns(3)
+            for i, field in enumerate(guessed):
+                with map_cols[i % 3]:
+                    choice = st.selectbox(
+                        CSV_COLUMNS[field],
+                        options,
+                        index=options.index(guessed[field]) if guessed[field] else 0,
+                        key=f"import_map_{field}"
+                    )
+                column_map[field] = None if choice == "(none)" else choice
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                default_mode = st.selectbox("💳 Payment mode when missing", PAYMENT_MODES,
+                                            index=PAYMENT_MODES.index("Other"), key="import_default_mode")
+            with col2:
+                debit_negative = st.checkbox("Debits are negative (skip credits)", key="import_debit_negative")
+            
+            if st.button("📤 Import", key="import_run", use_container_width=True):
+                progress = st.empty()
+                uploaded.seek(0)
+                result = import_csv(
+                    io.TextIOWrapper(uploaded, encoding='utf-8-sig', newline=''),
+                    shared_ledger,
+                    column_map=column_map,
+                    defaults={'payment_mode': default_mode},
+                    debit_negative=debit_negative,
+                    progress=lambda imported, skipped: progress.text(f"Imported {imported:,} rows ({skipped:,} skipped)...")
+                )
+                progress.empty()
+                st.success(f"✅ Imported {result['imported']:,} expenses")
+                if result['skipped']:
+                    st.warning(f"⚠️ Skipped {result['skipped']:,} rows")
+                    for line, message in result['errors']:
+                        st.text(f"Line {line}: {message}")
 
 # ============================================================================
 # PAGE 3: VIEW & EDIT EXPENSES
@@ -1103,38 +403,42 @@ elif page == "➕ Add Expense":
 elif page == "📋 View & Edit Expenses":
     st.markdown('<h1 class="main-header">📋 View & Edit Expenses</h1>', unsafe_allow_html=True)
     
-    # Filters
+    # Filters (changing one jumps back to the first page)
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        filter_cat = st.selectbox("Filter Category", ["All"] + list(CATEGORIES.keys()), key="view_filter_cat")
+        filter_cat = st.selectbox("Filter Category", ["All"] + list(CATEGORIES.keys()), key="view_filter_cat", on_change=reset_view_page)
     with col2:
-        sort_by = st.selectbox("Sort By", ["Date (Newest)", "Date (Oldest)", "Amount (High)", "Amount (Low)"], key="view_sort")
+        sort_by = st.selectbox("Sort By", list(SORT_CHOICES.keys()), key="view_sort", on_change=reset_view_page)
     with col3:
-        search_term = st.text_input("🔍 Search", "", key="view_search")
-    
-    # Apply filters
-    display_expenses = st.session_state.expenses.copy()
-    
-    if filter_cat != "All":
-        display_expenses = filter_by_category(display_expenses, filter_cat)
-    
-    if search_term:
-        display_expenses = search_expenses(display_expenses, search_term)
-    
-    # Apply sorting
-    if sort_by == "Date (Newest)":
-        display_expenses = sort_expenses_by_date(display_expenses, ascending=False)
-    elif sort_by == "Date (Oldest)":
-        display_expenses = sort_expenses_by_date(display_expenses, ascending=True)
-    elif sort_by == "Amount (High)":
-        display_expenses = sort_expenses_by_amount(display_expenses, ascending=False)
-    else:
-        display_expenses = sort_expenses_by_amount(display_expenses, ascending=True)
+        search_term = st.text_input("🔍 Search", "", key="view_search", on_change=reset_view_page)
+    
+    # Search, filter and sort cover every expense, but only the current page
+    # is fetched and drawn
+    page_size = st.session_state.get("view_page_size", PAGE_SIZES[1])
+    page_number = st.session_state.get("view_page", 1)
+    category = None if filter_cat == "All" else filter_cat
+    display_expenses, match_count, total_filtered = get_expense_page(
+        st.session_state.expenses, SORT_CHOICES[sort_by], page_number, page_size, category, search_term)
+    
+    page_count = max(1, (match_count + page_size - 1) // page_size)
+    if page_number > page_count:
+        # Fewer matches than before (deletion, bigger pages): show the last page
+        page_number = page_count
+        st.session_state.view_page = page_count
+        display_expenses, match_count, total_filtered = get_expense_page(
+            st.session_state.expenses, SORT_CHOICES[sort_by], page_number, page_size, category, search_term)
+    
+    col1, col2, col3 = st.columns([1, 1, 2])
+    with col1:
+        st.selectbox("Rows per page", PAGE_SIZES, index=1, key="view_page_size")
+    with col2:
+        st.number_input("Page", min_value=1, max_value=page_count, step=1, key="view_page")
     
     # Summary
-    total_filtered = calculate_total(display_expenses)
-    st.markdown(f"**Showing {len(display_expenses)} expenses | Total: ₹{total_filtered:,.2f}**")
+    first_shown = (page_number - 1) * page_size + 1 if match_count else 0
+    last_shown = first_shown + len(display_expenses) - 1 if match_count else 0
+    st.markdown(f"**Showing {first_shown}-{last_shown} of {match_count} expenses (page {page_number} of {page_count}) | Total: ₹{total_filtered:,.2f}**")
     st.markdown("---")
     
     # Check if editing
@@ -1213,8 +517,7 @@ elif page == "📋 View & Edit Expenses":
                 
                 if save_btn:
                     if edit_amount > 0:
-                        st.session_state.expenses = update_expense(
-                            st.session_state.expenses,
+                        shared_ledger.update_expense(
                             st.session_state.edit_expense_id,
                             edit_date.strftime('%Y-%m-%d'),
                             edit_category,
@@ -1223,7 +526,6 @@ elif page == "📋 View & Edit Expenses":
                             edit_amount,
                             edit_payment
                         )
-                        save_expenses(st.session_state.expenses)
                         st.session_state.show_edit_form = False
                         st.session_state.edit_expense_id = None
                         st.success("✅ Expense updated successfully!")
@@ -1241,7 +543,7 @@ elif page == "📋 View & Edit Expenses":
     
     # Display expenses table
     if len(display_expenses) > 0:
-        for i, expense in enumerate(display_expenses):
+        for expense in display_expenses:
             col1, col2, col3, col4, col5 = st.columns([2, 3, 2, 1, 1])
             
             with col1:
@@ -1260,15 +562,14 @@ elif page == "📋 View & Edit Expenses":
                     st.write(f"_{expense['description'][:20]}_")
             
             with col4:
-                if st.button("✏️", key=f"edit_{i}_{expense['id']}"):
+                if st.button("✏️", key=f"edit_{expense['id']}"):
                     st.session_state.edit_expense_id = expense['id']
                     st.session_state.show_edit_form = True
                     st.rerun()
             
             with col5:
-                if st.button("🗑️", key=f"del_{i}_{expense['id']}"):
-                    st.session_state.expenses = delete_expense(st.session_state.expenses, expense['id'])
-                    save_expenses(st.session_state.expenses)
+                if st.button("🗑️", key=f"del_{expense['id']}"):
+                    shared_ledger.delete_expense(expense['id'])
                     st.rerun()
             
             st.markdown("---")
@@ -1358,34 +659,39 @@ elif page == "📊 Reports":
                     key="report_date_range"
                 )
         
-        # Filter based on report type
+        # Filter based on report type (report_key names the period for the download cache)
         if report_type == "This Month":
             report_expenses = filter_this_month(st.session_state.expenses)
+            report_key = (report_type, datetime.now().strftime('%Y-%m'))
         elif report_type == "This Year":
             report_expenses = filter_this_year(st.session_state.expenses)
+            report_key = (report_type, datetime.now().strftime('%Y'))
         elif report_type == "Custom Date Range" and len(date_range) == 2:
             start_str = date_range[0].strftime('%Y-%m-%d')
             end_str = date_range[1].strftime('%Y-%m-%d')
             report_expenses = filter_by_date_range(st.session_state.expenses, start_str, end_str)
+            report_key = (report_type, start_str, end_str)
         else:
             report_expenses = st.session_state.expenses
+            report_key = (report_type,)
         
         st.markdown("---")
         
         # Report Preview
         st.subheader("📋 Report Preview")
         
-        total = calculate_total(report_expenses)
-        count = len(report_expenses)
+        summary = aggregate_expenses(report_expenses, ['total', 'count', 'average'], ['category'])
+        total = summary['total']
+        count = summary['count']
         
         col1, col2, col3 = st.columns(3)
         col1.metric("Total Expenses", f"₹{total:,.2f}")
         col2.metric("Transactions", count)
-        col3.metric("Average", f"₹{calculate_average(report_expenses):,.2f}")
+        col3.metric("Average", f"₹{summary['average']:,.2f}")
         
         # Category Summary
         st.markdown("**Category Summary:**")
-        cat_totals = get_category_wise_totals(report_expenses)
+        cat_totals = with_zero_totals(CATEGORIES.keys(), summary['category'])
         
         for cat, amt in cat_totals.items():
             if amt > 0:
@@ -1394,46 +700,68 @@ elif page == "📊 Reports":
         
         st.markdown("---")
         
-        # Download Report
+        # Download Report: nothing is generated until asked for; after that the
+        # CSV and JSON come from the shared cache until the data changes, and
+        # the text report is streamed when its button is clicked
         st.subheader("📥 Download Report")
         
-        col1, col2, col3 = st.columns(3)
-        
+        col1, col2 = st.columns([3, 1])
         with col1:
-            # Detailed Text Report
-            detailed_report = generate_detailed_report(report_expenses, report_type)
-            st.download_button(
-                "📄 Download Detailed Report",
-                detailed_report,
-                f"expense_report_{datetime.now().strftime('%Y%m%d')}.txt",
-                "text/plain",
-                use_container_width=True,
-                key="download_detailed"
+            report_sections = st.multiselect(
+                "Report Sections",
+                list(REPORT_SECTIONS),
+                default=list(REPORT_SECTIONS),
+                format_func=lambda section: section.replace('_', ' ').title(),
+                key="report_sections"
             )
-        
         with col2:
-            # CSV Report
-            csv_data = export_to_csv_format(report_expenses)
-            st.download_button(
-                "📊 Download CSV",
-                csv_data,
-                f"expenses_{datetime.now().strftime('%Y%m%d')}.csv",
-                "text/csv",
-                use_container_width=True,
-                key="download_csv_report"
-            )
+            transactions_listed = st.selectbox("Transactions Listed", ["All", 100, 1000, 10000], key="report_transactions_cap")
+        max_transactions = None if transactions_listed == "All" else transactions_listed
         
-        with col3:
-            # JSON Report
-            json_data = json.dumps(report_expenses, indent=2, ensure_ascii=False)
-            st.download_button(
-                "📋 Download JSON",
-                json_data,
-                f"expenses_{datetime.now().strftime('%Y%m%d')}.json",
-                "application/json",
-                use_container_width=True,
-                key="download_json_report"
-            )
+        prepared = st.session_state.get('report_exports_for') == report_key
+        if not prepared and st.button("⚙️ Prepare Downloads", key="prepare_report_downloads"):
+            st.session_state.report_exports_for = report_key
+            prepared = True
+        
+        if prepared:
+            col1, col2, col3 = st.columns(3)
+            
+            with col1:
+                # Detailed Text Report
+                st.download_button(
+                    "📄 Download Detailed Report",
+                    report_download(report_expenses, report_type, report_sections, max_transactions),
+                    f"expense_report_{datetime.now().strftime('%Y%m%d')}.txt",
+                    "text/plain",
+                    use_container_width=True,
+                    key="download_detailed"
+                )
+            
+            with col2:
+                # CSV Report
+                csv_data = shared_ledger.export(
+                    'csv', report_key, lambda: build_export('csv', report_expenses))
+                st.download_button(
+                    "📊 Download CSV",
+                    csv_data,
+                    f"expenses_{datetime.now().strftime('%Y%m%d')}.csv",
+                    "text/csv",
+                    use_container_width=True,
+                    key="download_csv_report"
+                )
+            
+            with col3:
+                # JSON Report
+                json_data = shared_ledger.export(
+                    'json', report_key, lambda: build_export('json', report_expenses))
+                st.download_button(
+                    "📋 Download JSON",
+                    json_data,
+                    f"expenses_{datetime.now().strftime('%Y%m%d')}.json",
+                    "application/json",
+                    use_container_width=True,
+                    key="download_json_report"
+                )
     else:
         st.info("Add expenses to generate reports!")
 
@@ -1451,43 +779,71 @@ elif page == "📥 Export Data":
         
         st.markdown("---")
         
-        # Quick Export
+        # Quick Export (built on request, then cached until the data changes)
         st.subheader("📤 Quick Export")
         
-        col1, col2, col3 = st.columns(3)
-        
+        col1, col2 = st.columns([3, 1])
         with col1:
-            csv_data = export_to_csv_format(st.session_state.expenses)
-            st.download_button(
-                "📄 Export as CSV",
-                csv_data,
-                f"all_expenses_{datetime.now().strftime('%Y%m%d')}.csv",
-                "text/csv",
-                use_container_width=True,
-                key="export_csv"
+            csv_columns = st.multiselect(
+                "CSV Columns",
+                list(CSV_COLUMNS),
+                default=list(CSV_COLUMNS),
+                format_func=CSV_COLUMNS.get,
+                key="export_csv_columns"
             )
-        
         with col2:
-            json_data = json.dumps(st.session_state.expenses, indent=2, ensure_ascii=False)
-            st.download_button(
-                "📋 Export as JSON",
-                json_data,
-                f"all_expenses_{datetime.now().strftime('%Y%m%d')}.json",
-                "application/json",
-                use_container_width=True,
-                key="export_json"
-            )
+            csv_gzip = st.checkbox("Compress CSV (gzip)", key="export_csv_gzip")
+        csv_format = 'csv.gz' if csv_gzip else 'csv'
         
-        with col3:
-            full_report = generate_detailed_report(st.session_state.expenses, "All Time")
-            st.download_button(
-                "📊 Full Report",
-                full_report,
-                f"full_report_{datetime.now().strftime('%Y%m%d')}.txt",
-                "text/plain",
-                use_container_width=True,
-                key="export_report"
-            )
+        export_key = ("All Time",)
+        prepared = st.session_state.get('quick_exports_prepared', False)
+        if not prepared and st.button("⚙️ Prepare Exports", key="prepare_quick_exports"):
+            st.session_state.quick_exports_prepared = True
+            prepared = True
+        
+        if prepared:
+            col1, col2, col3 = st.columns(3)
+            
+            with col1:
+                # No columns picked means nothing to export, not every column
+                if csv_columns:
+                    csv_data = shared_ledger.export(
+                        csv_format, export_key + (tuple(csv_columns),),
+                        lambda: build_export(csv_format, st.session_state.expenses, columns=csv_columns))
+                else:
+                    st.warning("Select at least one CSV column to export.")
+                    csv_data = ""
+                st.download_button(
+                    "📄 Export as CSV",
+                    csv_data,
+                    f"all_expenses_{datetime.now().strftime('%Y%m%d')}.{csv_format}",
+                    "application/gzip" if csv_gzip else "text/csv",
+                    use_container_width=True,
+                    disabled=not csv_columns,
+                    key="export_csv"
+                )
+            
+            with col2:
+                json_data = shared_ledger.export(
+                    'json', export_key, lambda: build_export('json', st.session_state.expenses))
+                st.download_button(
+                    "📋 Export as JSON",
+                    json_data,
+                    f"all_expenses_{datetime.now().strftime('%Y%m%d')}.json",
+                    "application/json",
+                    use_container_width=True,
+                    key="export_json"
+                )
+            
+            with col3:
+                st.download_button(
+                    "📊 Full Report",
+                    report_download(st.session_state.expenses, "All Time"),
+                    f"full_report_{datetime.now().strftime('%Y%m%d')}.txt",
+                    "text/plain",
+                    use_container_width=True,
+                    key="export_report"
+                )
         
         st.markdown("---")
         
@@ -1504,8 +860,7 @@ elif page == "📥 Export Data":
             
             with col1:
                 if st.button("✅ Yes, Delete Everything", key="confirm_yes"):
-                    st.session_state.expenses = []
-                    save_expenses([])
+                    shared_ledger.replace_all([])
                     st.session_state.confirm_delete = False
                     st.success("All data deleted!")
                     st.rerun()
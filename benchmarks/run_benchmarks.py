@@ -0,0 +1,287 @@
+"""
+Benchmark suite for the expense tracker helpers
+
+Times storage load/save, CSV bulk import, every filter, every totals helper,
+the sorts, search, CSV export and the detailed report on synthetic ledgers of
+increasing size, and writes the timings as JSON so two versions can be compared.
+
+Usage:
+    python benchmarks/run_benchmarks.py                         # 1k, 10k, 100k, 1M rows
+    python benchmarks/run_benchmarks.py --sizes 1000,10000 --output before.json
+    python benchmarks/run_benchmarks.py --compare before.json after.json
+    python benchmarks/run_benchmarks.py --pure-python           # without the NumPy backend
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import khata
+from khata import storage, vectorized
+from synthetic_data import generate_expenses
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+DEFAULT_OUTPUT = "benchmark_results.json"
+DEFAULT_IMPORT_MAX_ROWS = 100000  # larger ledgers skip the import benchmark
+IMPORT_GROWTH_LIMIT = 2.0  # per-row import time this many times the smallest size's is flagged
+
+
+# ============================================================================
+# SETUP
+# ============================================================================
+
+def ledger_for(target, expenses):
+    """The expenses as the helpers would see them for one target"""
+    if target == "list":
+        return expenses
+    if target == "store":
+        return khata.ExpenseStore(expenses)
+    if target == "sqlite":
+        storage.save_sqlite_storage(expenses)
+        return khata.SqliteLedger()
+    if target == "partitioned":
+        storage.save_partitioned_storage(expenses)
+        return khata.PartitionedLedger()
+    if target == "mapped":
+        storage.write_binary_storage(expenses)
+        return khata.MappedLedger()
+    raise ValueError(f"Unknown target: {target}")
+
+
+def helper_benchmarks(expenses):
+    """(name, function of the ledger) for every query helper"""
+    first_category = next(iter(khata.CATEGORIES))
+    latest = max(expense['date'] for expense in expenses) if expenses else date.today().strftime('%Y-%m-%d')
+    quarter_start = (datetime.strptime(latest, '%Y-%m-%d') - timedelta(days=90)).strftime('%Y-%m-%d')
+    return [
+        ("filter_by_category", lambda ledger: khata.filter_by_category(ledger, first_category)),
+        ("filter_by_payment_mode", lambda ledger: khata.filter_by_payment_mode(ledger, "Cash")),
+        ("filter_today", khata.filter_today),
+        ("filter_this_week", khata.filter_this_week),
+        ("filter_this_month", khata.filter_this_month),
+        ("filter_this_year", khata.filter_this_year),
+        ("filter_by_date_range", lambda ledger: khata.filter_by_date_range(ledger, quarter_start, latest)),
+        ("get_category_wise_totals", khata.get_category_wise_totals),
+        ("get_subcategory_wise_totals", lambda ledger: khata.get_subcategory_wise_totals(ledger, first_category)),
+        ("get_payment_mode_totals", khata.get_payment_mode_totals),
+        ("get_daily_totals", khata.get_daily_totals),
+        ("get_monthly_totals", khata.get_monthly_totals),
+        ("sort_expenses_by_date", lambda ledger: khata.sort_expenses_by_date(ledger, ascending=False)),
+        ("sort_expenses_by_amount", lambda ledger: khata.sort_expenses_by_amount(ledger, ascending=False)),
+        ("search_expenses", lambda ledger: khata.search_expenses(ledger, "milk")),
+        ("search_expenses_short", lambda ledger: khata.search_expenses(ledger, "ho")),
+        ("export_to_csv_format", khata.export_to_csv_format),
+        ("generate_detailed_report", lambda ledger: khata.generate_detailed_report(ledger, "All Time"))
+    ]
+
+
+# ============================================================================
+# TIMING
+# ============================================================================
+
+def consume(result):
+    """Materialize lazy results (SQLite, partitioned and mapped filters return an unevaluated ledger)"""
+    if not isinstance(result, (list, dict, str, bytes)):
+        list(result)
+
+
+def time_call(function, repeat):
+    """Run function `repeat` times; the first run is reported separately as cold"""
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        runs.append(time.perf_counter() - start)
+    return {
+        'cold': runs[0],
+        'best': min(runs),
+        'median': statistics.median(runs),
+        'runs': runs
+    }
+
+
+def bench_storage(expenses, modes, repeat):
+    """load_expenses / save_expenses for each storage mode"""
+    results = []
+    for mode in modes:
+        storage.STORAGE_MODE = mode
+        results.append(dict(name="save_expenses", storage=mode, **time_call(lambda: khata.save_expenses(expenses), repeat)))
+        results.append(dict(name="load_expenses", storage=mode, **time_call(khata.load_expenses, repeat)))
+    return results
+
+
+def bench_import(expenses, modes):
+    """import_csv of the ledger's CSV export into an empty SharedLedger, once per storage mode.
+    
+    Each import starts from an empty data directory, so it runs once rather
+    than `repeat` times.
+    """
+    csv_path = os.path.abspath("import.csv")
+    khata.write_csv_file(csv_path, expenses)
+    cwd = os.getcwd()
+    
+    def import_once():
+        with tempfile.TemporaryDirectory(dir=cwd) as run_dir:
+            os.chdir(run_dir)
+            try:
+                khata.import_csv_file(csv_path, khata.SharedLedger())
+            finally:
+                os.chdir(cwd)
+    
+    results = []
+    for mode in modes:
+        storage.STORAGE_MODE = mode
+        results.append(dict(name="import_csv", storage=mode, **time_call(import_once, 1)))
+    os.remove(csv_path)
+    return results
+
+
+def check_import(result, import_rates):
+    """Warning text if an import's time per row grew past IMPORT_GROWTH_LIMIT times
+    the smallest size's (a linear import keeps it flat; one that rewrites
+    everything per batch grows with the ledger)"""
+    rate = result['best'] / result['size']
+    base = import_rates.setdefault(result['storage'], rate)
+    if base > 0 and rate / base > IMPORT_GROWTH_LIMIT:
+        return f"  <-- x{rate / base:.1f} time per row vs the smallest size"
+    return ""
+
+
+def run_size(size, args, end_date, import_rates):
+    """Every benchmark for one ledger size"""
+    print(f"--- {size:,} rows", flush=True)
+    expenses = generate_expenses(size, khata.CATEGORIES, khata.PAYMENT_MODES, seed=args.seed, end_date=end_date)
+    results = []
+    
+    for result in bench_storage(expenses, args.storage, args.repeat):
+        result.update(size=size, target="storage")
+        results.append(result)
+        print(f"  {result['storage']:8} {result['name']:28} {result['best']:.4f}s", flush=True)
+    
+    if size <= args.import_max_rows:
+        for result in bench_import(expenses, args.storage):
+            result.update(size=size, target="storage")
+            results.append(result)
+            print(f"  {result['storage']:8} {result['name']:28} {result['best']:.4f}s{check_import(result, import_rates)}",
+                  flush=True)
+    
+    for target in args.targets:
+        build = time_call(lambda: ledger_for(target, expenses), 1)
+        results.append(dict(name="build_ledger", size=size, target=target, **build))
+        ledger = ledger_for(target, expenses)
+        for name, function in helper_benchmarks(expenses):
+            result = time_call(lambda: consume(function(ledger)), args.repeat)
+            result.update(name=name, size=size, target=target)
+            results.append(result)
+            print(f"  {target:8} {name:28} {result['best']:.4f}s", flush=True)
+    return results
+
+
+def run(args):
+    end_date = datetime.strptime(args.end_date, '%Y-%m-%d').date() if args.end_date else date.today()
+    results = []
+    import_rates = {}
+    # Data files are relative paths, so run from a scratch directory
+    with tempfile.TemporaryDirectory() as work_dir:
+        cwd = os.getcwd()
+        os.chdir(work_dir)
+        try:
+            for size in sorted(args.sizes):
+                results.extend(run_size(size, args, end_date, import_rates))
+        finally:
+            os.chdir(cwd)
+    
+    report = {
+        'meta': {
+            'created': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'end_date': end_date.strftime('%Y-%m-%d'),
+            'repeat': args.repeat,
+            'sizes': args.sizes,
+            'targets': args.targets,
+            'storage': args.storage,
+            'import_max_rows': args.import_max_rows,
+            'numpy': vectorized.numpy.__version__ if vectorized.available() else None
+        },
+        'results': results
+    }
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f"Wrote {len(results)} timings to {args.output}")
+
+
+# ============================================================================
+# COMPARE
+# ============================================================================
+
+def result_key(result):
+    return (result['name'], result['size'], result['target'], result.get('storage'))
+
+
+def compare(base_file, new_file, threshold):
+    """Print best-time ratios new/base; exit 1 if anything slowed down past threshold"""
+    with open(base_file) as file:
+        base = {result_key(result): result for result in json.load(file)['results']}
+    with open(new_file) as file:
+        new = json.load(file)['results']
+    
+    regressions = 0
+    for result in new:
+        old = base.get(result_key(result))
+        if old is None or old['best'] == 0:
+            continue
+        ratio = result['best'] / old['best']
+        flag = ""
+        if ratio > threshold:
+            flag = "  <-- slower"
+            regressions += 1
+        label = result.get('storage') or result['target']
+        print(f"{result['size']:>9,} {label:8} {result['name']:28} {old['best']:.4f}s -> {result['best']:.4f}s  x{ratio:.2f}{flag}")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the expense tracker helpers")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in DEFAULT_SIZES),
+                        help="comma-separated ledger sizes")
+    parser.add_argument("--targets", default="list,store",
+                        help="comma-separated: list (plain dicts), store (ExpenseStore), sqlite (SqliteLedger), "
+                             "partitioned (PartitionedLedger), mapped (MappedLedger)")
+    parser.add_argument("--storage", default="json,journal,sqlite,partitioned,binary",
+                        help="comma-separated storage modes to time load/save for")
+    parser.add_argument("--import-max-rows", type=int, default=DEFAULT_IMPORT_MAX_ROWS,
+                        help="largest ledger size to time the CSV import for")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark")
+    parser.add_argument("--seed", type=int, default=42, help="synthetic data seed")
+    parser.add_argument("--end-date", help="last date in the synthetic ledger (YYYY-MM-DD, default today)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="JSON results file")
+    parser.add_argument("--pure-python", action="store_true", help="don't use the NumPy backend even if NumPy is installed")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="compare two results files")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown ratio flagged by --compare")
+    args = parser.parse_args()
+    
+    if args.compare:
+        sys.exit(compare(args.compare[0], args.compare[1], args.threshold))
+    
+    args.sizes = [int(size) for size in args.sizes.split(",")]
+    args.targets = args.targets.split(",")
+    args.storage = args.storage.split(",")
+    if args.pure_python:
+        vectorized.USE_NUMPY = False
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Synthetic ledger generator for the benchmarks
+Deterministic: the same (row count, seed, end date) always gives the same expenses
+"""
+
+import math
+import random
+from datetime import date, datetime, timedelta
+
+# How often each category shows up and its typical (median) amount in Rs.
+# Matched by a word in the category name; anything unmatched is "occasional"
+CATEGORY_PROFILES = {
+    "Groceries": (30, 250),
+    "Transportation": (14, 180),
+    "Utilities": (6, 900),
+    "Medical": (4, 600),
+    "Entertainment": (5, 450),
+    "Shopping": (5, 1200),
+    "Kids": (4, 500),
+    "Family": (4, 400),
+    "Education": (2, 2500),
+    "Housing": (1, 15000),
+    "EMI": (1, 8000),
+    "Travel": (1, 6000),
+    "Electronics": (1, 9000),
+    "Investments": (1, 5000),
+    "Government": (1, 3000)
+}
+OCCASIONAL_PROFILE = (2, 700)
+
+# Cash and UPI dominate day-to-day spending
+PAYMENT_MODE_WEIGHTS = {
+    "Cash": 30,
+    "UPI (GPay/PhonePe/Paytm)": 40,
+    "Credit Card": 8,
+    "Debit Card": 8,
+    "Net Banking": 4
+}
+OTHER_PAYMENT_MODE_WEIGHT = 2
+
+DESCRIPTIONS = ["", "", "", "weekly", "monthly", "for home", "paid by Papa", "urgent",
+                "online order", "local shop", "with friends", "festival", "refill", "advance"]
+
+
+def category_profile(category):
+    """(frequency weight, median amount) for a category name"""
+    for word, profile in CATEGORY_PROFILES.items():
+        if word in category:
+            return profile
+    return OCCASIONAL_PROFILE
+
+
+def generate_expenses(count, categories, payment_modes, seed=42, end_date=None, years=3):
+    """Build `count` expenses spread over `years` years ending on end_date.
+    
+    categories / payment_modes: the app's CATEGORIES dict and PAYMENT_MODES list.
+    Amounts are log-normal around each category's typical amount, weekends
+    are busier than weekdays, and IDs increase with created_at like the app's.
+    """
+    rng = random.Random(seed)
+    end_date = end_date or date.today()
+    days = years * 365
+    start_date = end_date - timedelta(days=days - 1)
+    
+    category_names = list(categories.keys())
+    category_weights = [category_profile(name)[0] for name in category_names]
+    mode_weights = [PAYMENT_MODE_WEIGHTS.get(mode, OTHER_PAYMENT_MODE_WEIGHT) for mode in payment_modes]
+    day_weights = []
+    for offset in range(days):
+        day_weights.append(3 if (start_date + timedelta(days=offset)).weekday() >= 5 else 2)
+    
+    picked_categories = rng.choices(category_names, category_weights, k=count)
+    picked_modes = rng.choices(payment_modes, mode_weights, k=count)
+    picked_days = sorted(rng.choices(range(days), day_weights, k=count))
+    
+    base_id = int(datetime(start_date.year, start_date.month, start_date.day).timestamp() * 1000000)
+    expenses = []
+    for i in range(count):
+        category = picked_categories[i]
+        median = category_profile(category)[1]
+        amount = rng.lognormvariate(math.log(median), 0.7)
+        # Most entries are whole rupees, some carry paise
+        amount = round(amount, 2) if rng.random() < 0.2 else float(round(amount))
+        
+        day = start_date + timedelta(days=picked_days[i])
+        created = datetime(day.year, day.month, day.day, rng.randint(7, 22), rng.randint(0, 59), rng.randint(0, 59))
+        expenses.append({
+            'id': base_id + picked_days[i] * 86400000000 + i,
+            'date': day.strftime('%Y-%m-%d'),
+            'category': category,
+            'subcategory': rng.choice(categories[category]),
+            'description': rng.choice(DESCRIPTIONS),
+            'amount': max(amount, 1.0),
+            'payment_mode': picked_modes[i],
+            'created_at': created.strftime('%Y-%m-%d %H:%M:%S'),
+            'updated_at': created.strftime('%Y-%m-%d %H:%M:%S')
+        })
+    return expenses
@@ -0,0 +1,87 @@
+"""
+Ghar Ka Khata core: expense data model, storage and analytics helpers
+
+Import-safe (no Streamlit), so scripts, workers and benchmarks can use it
+directly; app.py is the dashboard on top.
+
+Storage settings (STORAGE_MODE, DATA_FILE, ...) are read at call time from
+khata.storage, so set them there:
+
+    from khata import storage
+    storage.STORAGE_MODE = "journal"
+
+With NumPy installed, totals run vectorized (see vectorized.py); set
+khata.vectorized.USE_NUMPY = False to use the pure-Python loops.
+"""
+
+from . import storage, vectorized
+from .model import CATEGORIES, PAYMENT_MODES, EXPENSE_FIELDS, all_subcategories, aggregate_result
+from .storage import (
+    StaleDataError,
+    SqliteLedger,
+    lock_storage,
+    load_expenses,
+    load_expenses_versioned,
+    save_expenses,
+    record_change,
+    record_changes,
+    persist_expenses,
+    storage_signature,
+    migrate_json_to_sqlite,
+    migrate_json_to_partitions,
+    migrate_json_to_binary
+)
+from .records import encode_expenses, decode_expenses, json_to_records, records_to_json
+from .mapped import MappedLedger
+from .store import ExpenseStore, StoreView, PartitionedLedger, LEDGER_TYPES, load_ledger
+from .analytics import (
+    allocate_ids,
+    generate_unique_id,
+    add_expense,
+    add_expenses,
+    update_expense,
+    delete_expense,
+    get_expense_by_id,
+    aggregate_expenses,
+    with_zero_totals,
+    calculate_total,
+    calculate_average,
+    find_max_expense,
+    find_min_expense,
+    filter_by_category,
+    filter_by_payment_mode,
+    filter_today,
+    filter_this_week,
+    filter_this_month,
+    filter_this_year,
+    filter_by_date_range,
+    get_category_wise_totals,
+    get_subcategory_wise_totals,
+    get_payment_mode_totals,
+    get_daily_totals,
+    get_monthly_totals,
+    SORT_CHOICES,
+    sort_expenses,
+    sort_expenses_by_date,
+    sort_expenses_by_amount,
+    rank_totals,
+    search_expenses,
+    paginate_expenses,
+    get_expense_page,
+    generate_text_bar,
+    CSV_COLUMNS,
+    stream_csv,
+    gzip_chunks,
+    export_to_csv_format,
+    write_csv_file,
+    get_top_expenses,
+    get_top_expenses_by_group,
+    REPORT_SECTIONS,
+    iter_sorted_expenses,
+    stream_detailed_report,
+    generate_detailed_report,
+    write_report_file,
+    build_export
+)
+from .shared import ExportCache, SharedLedger
+from .importer import import_csv, import_csv_file, iter_csv_expenses, guess_column_map, read_csv_headers
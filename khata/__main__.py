@@ -0,0 +1,7 @@
+"""Entry point for `python -m khata` (see khata.cli)"""
+
+import sys
+
+from .cli import main
+
+sys.exit(main())
@@ -0,0 +1,670 @@
+"""
+Expense helpers: add/edit/delete, aggregates, filters, sorting, search,
+CSV export and the detailed report
+"""
+
+import csv
+import heapq
+import io
+import json
+import time
+import zlib
+from datetime import datetime, timedelta
+
+from . import vectorized
+from .model import CATEGORIES, PAYMENT_MODES, aggregate_result
+from .storage import record_change, record_changes
+from .mapped import MappedLedger
+from .store import ExpenseStore, StoreView, PartitionedLedger, LEDGER_TYPES
+
+CSV_CHUNK_ROWS = 1000  # rows per chunk when streaming CSV exports
+
+_last_id = 0
+
+
+def allocate_ids(count):
+    """A block of `count` unique timestamp IDs (never repeats within this process)"""
+    global _last_id
+    start = max(int(time.time() * 1000000), _last_id + 1)
+    _last_id = start + count - 1
+    return range(start, start + count)
+
+
+def generate_unique_id():
+    """Generate unique ID using timestamp"""
+    return allocate_ids(1)[0]
+
+
+def add_expense(expenses_list, date, category, subcategory, description, amount, payment_mode):
+    """Add new expense"""
+    new_expense = {
+        'id': generate_unique_id(),
+        'date': date,
+        'category': category,
+        'subcategory': subcategory,
+        'description': description,
+        'amount': amount,
+        'payment_mode': payment_mode,
+        'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'updated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    }
+    expenses_list.append(new_expense)
+    record_change('add', new_expense)
+    return expenses_list
+
+
+def add_expenses(expenses_list, new_expenses):
+    """Add a batch of complete expense dicts (IDs included) with one storage record"""
+    # Lists, ExpenseStore and SqliteLedger all take the whole batch in one go
+    expenses_list.extend(new_expenses)
+    record_changes('add', new_expenses)
+    return expenses_list
+
+
+def update_expense(expenses_list, expense_id, date, category, subcategory, description, amount, payment_mode):
+    """Update existing expense by ID"""
+    if isinstance(expenses_list, LEDGER_TYPES):
+        updated = expenses_list.update(expense_id, {
+            'date': date,
+            'category': category,
+            'subcategory': subcategory,
+            'description': description,
+            'amount': amount,
+            'payment_mode': payment_mode,
+            'updated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        })
+        if updated:
+            record_change('update', expenses_list.get(expense_id))
+        return expenses_list
+    
+    for i in range(len(expenses_list)):
+        if expenses_list[i]['id'] == expense_id:
+            expenses_list[i]['date'] = date
+            expenses_list[i]['category'] = category
+            expenses_list[i]['subcategory'] = subcategory
+            expenses_list[i]['description'] = description
+            expenses_list[i]['amount'] = amount
+            expenses_list[i]['payment_mode'] = payment_mode
+            expenses_list[i]['updated_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            record_change('update', expenses_list[i])
+            break
+    return expenses_list
+
+
+def delete_expense(expenses_list, expense_id):
+    """Delete expense by ID"""
+    if isinstance(expenses_list, LEDGER_TYPES):
+        if expenses_list.delete(expense_id):
+            record_change('delete', {'id': expense_id})
+        return expenses_list
+    
+    new_list = []
+    for expense in expenses_list:
+        if expense['id'] != expense_id:
+            new_list.append(expense)
+        else:
+            record_change('delete', expense)
+    return new_list
+
+
+def get_expense_by_id(expenses_list, expense_id):
+    """Get single expense by ID"""
+    if isinstance(expenses_list, LEDGER_TYPES):
+        return expenses_list.get(expense_id)
+    
+    for expense in expenses_list:
+        if expense['id'] == expense_id:
+            return expense
+    return None
+
+
+def aggregate_expenses(expenses_list, measures=(), group_by=()):
+    """Compute several measures and group-by totals in a single pass.
+    
+    measures: any of 'total', 'count', 'average', 'max', 'min'
+    group_by: any of 'category', 'subcategory', 'category_subcategory',
+              'payment_mode', 'date', 'month'
+    Returns {measure: value, ..., group: {key: total}, ...}; group keys appear
+    in first-seen order ('category_subcategory' keys are (category, subcategory)).
+    """
+    if isinstance(expenses_list, LEDGER_TYPES):
+        return expenses_list.summarize(measures, group_by)
+    if (isinstance(expenses_list, list) and len(expenses_list) >= vectorized.VECTORIZE_MIN_ROWS and
+            vectorized.available()):
+        result = vectorized.summarize_expenses(expenses_list, measures, group_by)
+        if result is not None:
+            return result
+    
+    total = 0
+    count = 0
+    max_amount = 0
+    min_amount = None
+    groups = {}
+    for name in group_by:
+        groups[name] = {}
+    group_items = list(groups.items())
+    
+    for expense in expenses_list:
+        amount = expense['amount']
+        total = total + amount
+        count = count + 1
+        if amount > max_amount:
+            max_amount = amount
+        if min_amount is None or amount < min_amount:
+            min_amount = amount
+        
+        for name, totals in group_items:
+            if name == 'month':
+                key = expense['date'][:7]
+            elif name == 'category_subcategory':
+                key = (expense['category'], expense['subcategory'])
+            else:
+                key = expense[name]
+            if key in totals:
+                totals[key] = totals[key] + amount
+            else:
+                totals[key] = amount
+    
+    return aggregate_result(measures, total, count, max_amount, min_amount, groups)
+
+
+def with_zero_totals(names, totals):
+    """Totals dict listing every name (0 if unused) first, then any extra keys"""
+    seeded = {}
+    for name in names:
+        seeded[name] = 0
+    for name, amount in totals.items():
+        seeded[name] = seeded.get(name, 0) + amount
+    return seeded
+
+
+def calculate_total(expenses_list):
+    """Calculate total"""
+    return aggregate_expenses(expenses_list, ['total'])['total']
+
+
+def calculate_average(expenses_list):
+    """Calculate average"""
+    return aggregate_expenses(expenses_list, ['average'])['average']
+
+
+def find_max_expense(expenses_list):
+    """Find maximum expense"""
+    return aggregate_expenses(expenses_list, ['max'])['max']
+
+
+def find_min_expense(expenses_list):
+    """Find minimum expense"""
+    return aggregate_expenses(expenses_list, ['min'])['min']
+
+
+def filter_by_category(expenses_list, category):
+    """Filter by category"""
+    if isinstance(expenses_list, LEDGER_TYPES):
+        return expenses_list.filter_equals('category', category)
+    
+    filtered_list = []
+    for expense in expenses_list:
+        if expense['category'] == category:
+            filtered_list.append(expense)
+    return filtered_list
+
+
+def filter_by_payment_mode(expenses_list, payment_mode):
+    """Filter by payment mode"""
+    if isinstance(expenses_list, LEDGER_TYPES):
+        return expenses_list.filter_equals('payment_mode', payment_mode)
+    
+    filtered_list = []
+    for expense in expenses_list:
+        if expense['payment_mode'] == payment_mode:
+            filtered_list.append(expense)
+    return filtered_list
+
+
+def filter_today(expenses_list):
+    """Filter today's expenses"""
+    today = datetime.now().strftime('%Y-%m-%d')
+    if isinstance(expenses_list, LEDGER_TYPES):
+        return expenses_list.filter_dates(today, today)
+    
+    filtered_list = []
+    for expense in expenses_list:
+        if expense['date'] == today:
+            filtered_list.append(expense)
+    return filtered_list
+
+
+def filter_this_week(expenses_list):
+    """Filter this week's expenses"""
+    today = datetime.now()
+    week_start = today - timedelta(days=today.weekday())
+    week_start_str = week_start.strftime('%Y-%m-%d')
+    today_str = today.strftime('%Y-%m-%d')
+    if isinstance(expenses_list, LEDGER_TYPES):
+        return expenses_list.filter_dates(week_start_str, today_str)
+    
+    filtered_list = []
+    for expense in expenses_list:
+        if week_start_str <= expense['date'] <= today_str:
+            filtered_list.append(expense)
+    return filtered_list
+
+
+def filter_this_month(expenses_list):
+    """Filter this month's expenses"""
+    today = datetime.now()
+    month_start = today.replace(day=1).strftime('%Y-%m-%d')
+    today_str = today.strftime('%Y-%m-%d')
+    if isinstance(expenses_list, LEDGER_TYPES):
+        return expenses_list.filter_dates(month_start, today_str)
+    
+    filtered_list = []
+    for expense in expenses_list:
+        if month_start <= expense['date'] <= today_str:
+            filtered_list.append(expense)
+    return filtered_list
+
+
+def filter_this_year(expenses_list):
+    """Filter this year's expenses"""
+    today = datetime.now()
+    year_start = today.replace(month=1, day=1).strftime('%Y-%m-%d')
+    today_str = today.strftime('%Y-%m-%d')
+    if isinstance(expenses_list, LEDGER_TYPES):
+        return expenses_list.filter_dates(year_start, today_str)
+    
+    filtered_list = []
+    for expense in expenses_list:
+        if year_start <= expense['date'] <= today_str:
+            filtered_list.append(expense)
+    return filtered_list
+
+
+def filter_by_date_range(expenses_list, start_date, end_date):
+    """Filter by date range"""
+    if isinstance(expenses_list, LEDGER_TYPES):
+        return expenses_list.filter_dates(start_date, end_date)
+    
+    filtered_list = []
+    for expense in expenses_list:
+        if start_date <= expense['date'] <= end_date:
+            filtered_list.append(expense)
+    return filtered_list
+
+
+def get_category_wise_totals(expenses_list):
+    """Calculate category-wise totals"""
+    totals = aggregate_expenses(expenses_list, group_by=['category'])['category']
+    return with_zero_totals(CATEGORIES.keys(), totals)
+
+
+def get_subcategory_wise_totals(expenses_list, category):
+    """Calculate subcategory-wise totals"""
+    pair_totals = aggregate_expenses(expenses_list, group_by=['category_subcategory'])['category_subcategory']
+    
+    totals = {}
+    for (expense_category, subcategory), amount in pair_totals.items():
+        if expense_category == category:
+            totals[subcategory] = amount
+    
+    return with_zero_totals(CATEGORIES.get(category, []), totals)
+
+
+def get_payment_mode_totals(expenses_list):
+    """Calculate payment mode-wise totals"""
+    totals = aggregate_expenses(expenses_list, group_by=['payment_mode'])['payment_mode']
+    return with_zero_totals(PAYMENT_MODES, totals)
+
+
+def get_daily_totals(expenses_list):
+    """Calculate daily totals"""
+    return aggregate_expenses(expenses_list, group_by=['date'])['date']
+
+
+def get_monthly_totals(expenses_list):
+    """Calculate monthly totals"""
+    return aggregate_expenses(expenses_list, group_by=['month'])['month']
+
+
+# View & Edit sort choices as (field, ascending) keys, most significant first
+SORT_CHOICES = {
+    "Date (Newest)": [('date', False), ('id', False)],
+    "Date (Oldest)": [('date', True), ('id', True)],
+    "Amount (High)": [('amount', False), ('date', False)],
+    "Amount (Low)": [('amount', True), ('date', False)]
+}
+
+
+def sort_expenses(expenses_list, keys):
+    """Sort by several (field, ascending) keys, e.g. [('date', False), ('amount', False)]"""
+    if isinstance(expenses_list, LEDGER_TYPES):
+        return expenses_list.sort_rows(keys)
+    
+    sorted_list = list(expenses_list)
+    # Python's sort is stable, so sorting by the least significant key first
+    # leaves ties of the more significant keys in the right order
+    for field, ascending in reversed(keys):
+        sorted_list.sort(key=lambda expense: expense[field], reverse=not ascending)
+    return sorted_list
+
+
+def sort_expenses_by_date(expenses_list, ascending=True):
+    """Sort by date"""
+    return sort_expenses(expenses_list, [('date', ascending)])
+
+
+def sort_expenses_by_amount(expenses_list, ascending=True):
+    """Sort by amount"""
+    return sort_expenses(expenses_list, [('amount', ascending)])
+
+
+def rank_totals(totals):
+    """Non-zero (name, amount) pairs from a totals dict, largest first"""
+    ranked = []
+    for name, amount in totals.items():
+        if amount > 0:
+            ranked.append((name, amount))
+    ranked.sort(key=lambda pair: pair[1], reverse=True)
+    return ranked
+
+
+def search_expenses(expenses_list, search_term):
+    """Search expenses"""
+    if isinstance(expenses_list, (ExpenseStore, StoreView, PartitionedLedger, MappedLedger)):
+        return expenses_list.search(search_term)
+    
+    search_term_lower = search_term.lower()
+    results = []
+    
+    for expense in expenses_list:
+        description_lower = expense['description'].lower() if expense['description'] else ""
+        category_lower = expense['category'].lower()
+        subcategory_lower = expense['subcategory'].lower()
+        
+        if (search_term_lower in description_lower or 
+            search_term_lower in category_lower or 
+            search_term_lower in subcategory_lower):
+            results.append(expense)
+    
+    return results
+
+
+def paginate_expenses(expenses_list, keys, offset, limit, category=None):
+    """(rows, match count, total) for one page of a plain list, sorted and filtered in full"""
+    if category is not None:
+        expenses_list = filter_by_category(expenses_list, category)
+    ordered = sort_expenses(expenses_list, keys)
+    return ordered[offset:offset + limit], len(ordered), calculate_total(ordered)
+
+
+def get_expense_page(expenses_list, keys, page_number, page_size, category=None, search_term=""):
+    """One page (numbered from 1) of expenses after search, category filter and sort.
+    
+    Returns (rows, match count, total of all matches). Ledgers materialize only
+    the rows on the page.
+    """
+    offset = (page_number - 1) * page_size
+    if isinstance(expenses_list, LEDGER_TYPES):
+        return expenses_list.page(keys, offset, page_size, category, search_term)
+    if search_term:
+        expenses_list = search_expenses(expenses_list, search_term)
+    return paginate_expenses(expenses_list, keys, offset, page_size, category)
+
+
+def generate_text_bar(value, max_value, bar_length=20):
+    """Generate text-based bar"""
+    if max_value == 0:
+        return "░" * bar_length
+    
+    filled_length = int((value / max_value) * bar_length)
+    bar = "█" * filled_length + "░" * (bar_length - filled_length)
+    return bar
+
+
+# CSV export columns: field -> header
+CSV_COLUMNS = {
+    'date': "Date",
+    'category': "Category",
+    'subcategory': "Subcategory",
+    'description': "Description",
+    'amount': "Amount",
+    'payment_mode': "Payment Mode"
+}
+
+
+def stream_csv(expenses_list, columns=None, chunk_rows=CSV_CHUNK_ROWS):
+    """Yield CSV text a chunk of rows at a time (header first).
+    
+    columns: fields to include, in order (default: all of CSV_COLUMNS).
+    The csv module quotes commas, quotes and newlines, so descriptions
+    round-trip unchanged.
+    """
+    columns = list(columns or CSV_COLUMNS)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow([CSV_COLUMNS[column] for column in columns])
+    
+    pending = 0
+    for expense in expenses_list:
+        writer.writerow(["" if expense[column] is None else expense[column] for column in columns])
+        pending += 1
+        if pending == chunk_rows:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def gzip_chunks(chunks):
+    """gzip-compress a stream of text chunks, yielding bytes"""
+    compressor = zlib.compressobj(9, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_to_csv_format(expenses_list, columns=None, compress=False):
+    """Convert to CSV format (gzip bytes when compress is set)"""
+    chunks = stream_csv(expenses_list, columns)
+    if compress:
+        return b"".join(gzip_chunks(chunks))
+    return "".join(chunks)
+
+
+def write_csv_file(path, expenses_list, columns=None, compress=False):
+    """Stream a CSV export straight to a file"""
+    chunks = stream_csv(expenses_list, columns)
+    if compress:
+        with open(path, 'wb') as file:
+            for data in gzip_chunks(chunks):
+                file.write(data)
+    else:
+        with open(path, 'w', encoding='utf-8', newline='') as file:
+            for chunk in chunks:
+                file.write(chunk)
+
+
+def get_top_expenses(expenses_list, n=5):
+    """Get top N expenses (heap selection, O(n log N); ties keep list order)"""
+    if n <= 0:
+        return []
+    if isinstance(expenses_list, LEDGER_TYPES):
+        return expenses_list.top_rows(n)
+    return heapq.nlargest(n, expenses_list, key=lambda expense: expense['amount'])
+
+
+def get_top_expenses_by_group(expenses_list, n=5, group_by='category'):
+    """Get top N expenses within each category, subcategory, payment_mode, date or month"""
+    if n <= 0:
+        return {}
+    heaps = {}
+    seq = 0
+    for expense in expenses_list:
+        if group_by == 'month':
+            key = expense['date'][:7]
+        else:
+            key = expense[group_by]
+        
+        if key not in heaps:
+            heaps[key] = []
+        heap = heaps[key]
+        
+        # Min-heap of the N best so far; -seq makes earlier rows win ties
+        entry = (expense['amount'], -seq, expense)
+        if len(heap) < n:
+            heapq.heappush(heap, entry)
+        elif entry[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, entry)
+        seq = seq + 1
+    
+    top_by_group = {}
+    for key, heap in heaps.items():
+        heap.sort(key=lambda entry: entry[:2], reverse=True)
+        top_by_group[key] = [entry[2] for entry in heap]
+    return top_by_group
+
+
+# Sections of the detailed report, in the order they are written
+REPORT_SECTIONS = ('summary', 'categories', 'payment_modes', 'months', 'top', 'transactions')
+
+
+def iter_sorted_expenses(expenses_list, keys, limit=None):
+    """Expenses ordered by (field, ascending) keys, yielded one at a time (at most limit)"""
+    if isinstance(expenses_list, LEDGER_TYPES):
+        return expenses_list.iter_sorted(keys, limit)
+    return iter(sort_expenses(expenses_list, keys)[:limit])
+
+
+def stream_detailed_report(expenses_list, report_type="monthly", sections=REPORT_SECTIONS, max_transactions=None):
+    """Yield the detailed report line by line, section by section.
+    
+    sections: which of REPORT_SECTIONS to include
+    max_transactions: cap on the ALL TRANSACTIONS listing (None lists every row)
+    """
+    # Header
+    yield "=" * 60
+    yield "       GHAR KA KHATA - DETAILED EXPENSE REPORT"
+    yield "=" * 60
+    yield f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+    yield f"Report Type: {report_type.upper()}"
+    yield "=" * 60
+    yield ""
+    
+    # Every figure in the first four sections comes from one pass over the data
+    group_by = []
+    for section, name in (('categories', 'category'), ('payment_modes', 'payment_mode'), ('months', 'month')):
+        if section in sections:
+            group_by.append(name)
+    if 'summary' in sections or group_by:
+        summary = aggregate_expenses(expenses_list, ['total', 'count', 'average', 'max', 'min'], group_by)
+        total = summary['total']
+    
+    if 'summary' in sections:
+        yield "📊 SUMMARY"
+        yield "-" * 40
+        yield f"Total Expenses     : Rs. {total:,.2f}"
+        yield f"Total Transactions : {summary['count']}"
+        yield f"Average Expense    : Rs. {summary['average']:,.2f}"
+        yield f"Highest Expense    : Rs. {summary['max']:,.2f}"
+        yield f"Lowest Expense     : Rs. {summary['min']:,.2f}"
+        yield ""
+    
+    if 'categories' in sections:
+        yield "📁 CATEGORY-WISE BREAKDOWN"
+        yield "-" * 40
+        
+        # Sort categories by amount
+        category_totals = with_zero_totals(CATEGORIES.keys(), summary['category'])
+        for cat, amt in rank_totals(category_totals):
+            percentage = (amt / total * 100) if total > 0 else 0
+            yield f"{cat}"
+            yield f"    Amount: Rs. {amt:,.2f} ({percentage:.1f}%)"
+        yield ""
+    
+    if 'payment_modes' in sections:
+        yield "💳 PAYMENT MODE BREAKDOWN"
+        yield "-" * 40
+        
+        payment_totals = with_zero_totals(PAYMENT_MODES, summary['payment_mode'])
+        for mode, amt in payment_totals.items():
+            if amt > 0:
+                percentage = (amt / total * 100) if total > 0 else 0
+                yield f"{mode}: Rs. {amt:,.2f} ({percentage:.1f}%)"
+        yield ""
+    
+    if 'months' in sections:
+        yield "📅 MONTHLY BREAKDOWN"
+        yield "-" * 40
+        
+        monthly_totals = summary['month']
+        for month in sorted(monthly_totals.keys()):
+            yield f"{month}: Rs. {monthly_totals[month]:,.2f}"
+        yield ""
+    
+    if 'top' in sections:
+        yield "🔝 TOP 10 HIGHEST EXPENSES"
+        yield "-" * 40
+        
+        for i, expense in enumerate(get_top_expenses(expenses_list, 10)):
+            yield f"{i+1}. Rs. {expense['amount']:,.2f}"
+            yield f"   {expense['category']} → {expense['subcategory']}"
+            yield f"   Date: {expense['date']} | {expense['payment_mode']}"
+            if expense['description']:
+                yield f"   Note: {expense['description']}"
+            yield ""
+    
+    if 'transactions' in sections:
+        yield "📋 ALL TRANSACTIONS"
+        yield "-" * 40
+        
+        listed = 0
+        for expense in iter_sorted_expenses(expenses_list, [('date', False)], max_transactions):
+            listed += 1
+            yield f"{listed}. {expense['date']} | Rs. {expense['amount']:,.2f}"
+            yield f"   {expense['category']} → {expense['subcategory']}"
+            yield f"   Payment: {expense['payment_mode']}"
+            if expense['description']:
+                yield f"   Note: {expense['description']}"
+            yield ""
+        
+        remaining = len(expenses_list) - listed
+        if max_transactions is not None and remaining > 0:
+            yield f"... and {remaining} more transactions"
+            yield ""
+    
+    # Footer
+    yield "=" * 60
+    yield "         End of Report - Ghar Ka Khata v3.0"
+    yield "=" * 60
+
+
+def generate_detailed_report(expenses_list, report_type="monthly", sections=REPORT_SECTIONS, max_transactions=None):
+    """Generate detailed expense report"""
+    return "\n".join(stream_detailed_report(expenses_list, report_type, sections, max_transactions))
+
+
+def write_report_file(path, expenses_list, report_type="monthly", sections=REPORT_SECTIONS, max_transactions=None):
+    """Stream the detailed report straight to a file"""
+    with open(path, 'w', encoding='utf-8') as file:
+        for line in stream_detailed_report(expenses_list, report_type, sections, max_transactions):
+            file.write(line + "\n")
+
+
+def build_export(export_format, expenses_list, period="All Time", columns=None,
+                 sections=REPORT_SECTIONS, max_transactions=None):
+    """Build one download: 'csv', 'csv.gz', 'json' or the detailed text 'report'"""
+    if export_format == 'csv':
+        return export_to_csv_format(expenses_list, columns)
+    if export_format == 'csv.gz':
+        return export_to_csv_format(expenses_list, columns, compress=True)
+    if export_format == 'json':
+        return json.dumps(list(expenses_list), indent=2, ensure_ascii=False)
+    if export_format == 'report':
+        return generate_detailed_report(expenses_list, period, sections, max_transactions)
+    raise ValueError(f"Unknown export format: {export_format}")
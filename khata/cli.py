@@ -0,0 +1,273 @@
+"""
+Headless batch reports and exports (no Streamlit)
+
+    python -m khata LEDGER [LEDGER ...] --period last-month --format report,csv --out-dir reports
+
+A LEDGER is a JSON snapshot file, a binary .khb file, a SQLite .db file, a month-partition directory
+(one with a manifest.json), or a directory holding the app's data files (read
+with the configured storage mode, never migrated or rewritten). Each ledger is loaded
+once and written for every period and format; several ledgers are spread over
+a process pool.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+
+from . import storage
+from .analytics import REPORT_SECTIONS, CSV_COLUMNS, filter_by_date_range, write_csv_file, write_report_file
+from .mapped import MappedLedger
+from .store import ExpenseStore, PartitionedLedger
+
+FORMATS = ('report', 'csv', 'json')
+
+
+# ============================================================================
+# PERIODS
+# ============================================================================
+
+def month_bounds(year, month):
+    """First and last day of a month as YYYY-MM-DD strings"""
+    first = date(year, month, 1)
+    following = date(year + month // 12, month % 12 + 1, 1)
+    return first.strftime('%Y-%m-%d'), (following - timedelta(days=1)).strftime('%Y-%m-%d')
+
+
+def parse_period(text, today=None):
+    """(label, start, end) for a period; start/end are None for all time.
+    
+    Accepts: all, this-month, last-month, this-year, last-year, YYYY, YYYY-MM,
+    or START:END with YYYY-MM-DD dates.
+    """
+    today = today or date.today()
+    if text == "all":
+        return "all", None, None
+    if text == "this-month":
+        return parse_period(today.strftime('%Y-%m'))
+    if text == "last-month":
+        return parse_period((today.replace(day=1) - timedelta(days=1)).strftime('%Y-%m'))
+    if text == "this-year":
+        return parse_period(str(today.year))
+    if text == "last-year":
+        return parse_period(str(today.year - 1))
+    
+    if ":" in text:
+        start, end = text.split(":", 1)
+        datetime.strptime(start, '%Y-%m-%d')
+        datetime.strptime(end, '%Y-%m-%d')
+        return f"{start}_to_{end}", start, end
+    if len(text) == 4 and text.isdigit():
+        return text, f"{text}-01-01", f"{text}-12-31"
+    
+    month = datetime.strptime(text, '%Y-%m')
+    start, end = month_bounds(month.year, month.month)
+    return text, start, end
+
+
+# ============================================================================
+# ONE LEDGER
+# ============================================================================
+
+def ledger_name(path):
+    """Output file prefix for a ledger path"""
+    path = os.path.normpath(path)
+    if os.path.isdir(path):
+        return os.path.basename(os.path.abspath(path))
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def ledger_names(paths):
+    """One distinct output prefix per ledger path.
+    
+    Ledgers whose names clash (a/expenses_data.json and b/expenses_data.json)
+    get their parent directory's name in front, then their extension after.
+    Raises ValueError if names still clash, e.g. the same ledger given twice.
+    """
+    names = [ledger_name(path) for path in paths]
+    for widen in (parent_prefix, extension_suffix):
+        for i in clashing(names):
+            names[i] = widen(paths[i], names[i])
+    repeated = clashing(names)
+    if repeated:
+        raise ValueError("ledgers would overwrite each other's outputs: " +
+                         ", ".join(paths[i] for i in repeated))
+    return names
+
+
+def clashing(names):
+    """Indexes of names that appear more than once"""
+    counts = {}
+    for name in names:
+        counts[name] = counts.get(name, 0) + 1
+    return [i for i, name in enumerate(names) if counts[name] > 1]
+
+
+def parent_prefix(path, name):
+    """parent_name, from the ledger's enclosing directory"""
+    parent = os.path.basename(os.path.dirname(os.path.abspath(os.path.normpath(path))))
+    return f"{parent}_{name}" if parent else name
+
+
+def extension_suffix(path, name):
+    """name_ext, so home/shop.json and home/shop.db differ"""
+    extension = os.path.splitext(os.path.normpath(path))[1].lstrip(".")
+    return f"{name}_{extension}" if extension else name
+
+
+def open_ledger(path, storage_mode):
+    """Load one ledger: a columnar store, a SqliteLedger for .db files, a MappedLedger for .khb files or a PartitionedLedger"""
+    if os.path.exists(storage.manifest_path(path)):
+        expenses = PartitionedLedger(path)
+    elif os.path.isdir(path):
+        expenses = storage.read_storage_dir(path, storage_mode)
+    elif not os.path.exists(path):
+        # (SQLite would create an empty database rather than fail)
+        raise FileNotFoundError(path)
+    elif path.endswith(".db"):
+        expenses = storage.SqliteLedger(path)
+    elif path.endswith(".khb"):
+        expenses = MappedLedger(path)
+    else:
+        # Strict, so a corrupt file fails the job instead of reporting on no expenses
+        expenses = storage.read_snapshot(path, strict=True)
+    
+    if isinstance(expenses, list):
+        return ExpenseStore(expenses)
+    return expenses
+
+
+def write_outputs(job):
+    """Write every period x format for one ledger; returns (ledger, written paths, seconds)"""
+    start_time = time.perf_counter()
+    ledger = open_ledger(job['path'], job['storage_mode'])
+    name = job['name']
+    written = []
+    
+    for label, start, end in job['periods']:
+        if start is None:
+            expenses = ledger
+            report_type = "All Time"
+        else:
+            expenses = filter_by_date_range(ledger, start, end)
+            report_type = label
+        
+        for export_format in job['formats']:
+            base = os.path.join(job['out_dir'], f"{name}_{label}")
+            if export_format == 'report':
+                path = base + ".txt"
+                write_report_file(path, expenses, report_type, job['sections'], job['max_transactions'])
+            elif export_format == 'csv':
+                path = base + (".csv.gz" if job['gzip'] else ".csv")
+                write_csv_file(path, expenses, job['columns'], job['gzip'])
+            else:
+                path = base + ".json"
+                with open(path, 'w', encoding='utf-8') as file:
+                    json.dump(list(expenses), file, indent=2, ensure_ascii=False)
+            written.append(path)
+    
+    return job['path'], written, time.perf_counter() - start_time
+
+
+def run_job(job):
+    """write_outputs, turning an error into a result so one bad ledger doesn't stop the batch"""
+    try:
+        path, written, seconds = write_outputs(job)
+        return path, written, seconds, None
+    except Exception as error:
+        return job['path'], [], 0.0, f"{type(error).__name__}: {error}"
+
+
+# ============================================================================
+# COMMAND LINE
+# ============================================================================
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m khata",
+        description="Write expense reports and CSV/JSON exports for one or more ledgers")
+    parser.add_argument("ledgers", nargs="+",
+                        help="JSON snapshot, binary .khb file, SQLite .db file, partition directory, or directory with the app's data files")
+    parser.add_argument("--period", action="append", dest="periods",
+                        help="all, this-month, last-month, this-year, last-year, YYYY, YYYY-MM "
+                             "or YYYY-MM-DD:YYYY-MM-DD (repeatable, default all)")
+    parser.add_argument("--format", default="report,csv,json",
+                        help="comma-separated: " + ", ".join(FORMATS))
+    parser.add_argument("--out-dir", default="reports", help="directory for the output files")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="processes to spread ledgers over (1 runs inline)")
+    parser.add_argument("--storage", default=storage.STORAGE_MODE,
+                        choices=sorted(storage.STORAGE_BACKENDS),
+                        help="storage mode for ledger directories")
+    parser.add_argument("--sections", default=",".join(REPORT_SECTIONS),
+                        help="comma-separated report sections: " + ", ".join(REPORT_SECTIONS))
+    parser.add_argument("--max-transactions", type=int,
+                        help="cap on the report's transaction listing")
+    parser.add_argument("--columns", default=",".join(CSV_COLUMNS),
+                        help="comma-separated CSV columns: " + ", ".join(CSV_COLUMNS))
+    parser.add_argument("--gzip", action="store_true", help="gzip the CSV exports")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    
+    formats = args.format.split(",")
+    sections = args.sections.split(",")
+    columns = args.columns.split(",")
+    for values, allowed, option in ((formats, FORMATS, "--format"),
+                                    (sections, REPORT_SECTIONS, "--sections"),
+                                    (columns, list(CSV_COLUMNS), "--columns")):
+        unknown = [value for value in values if value not in allowed]
+        if unknown:
+            parser.error(f"{option}: unknown {', '.join(unknown)}")
+    try:
+        periods = [parse_period(text) for text in (args.periods or ["all"])]
+    except ValueError as error:
+        parser.error(f"--period: {error}")
+    
+    try:
+        names = ledger_names(args.ledgers)
+    except ValueError as error:
+        parser.error(str(error))
+    
+    os.makedirs(args.out_dir, exist_ok=True)
+    jobs = []
+    for path, name in zip(args.ledgers, names):
+        jobs.append({
+            'path': path,
+            'name': name,
+            'storage_mode': args.storage,
+            'periods': periods,
+            'formats': formats,
+            'out_dir': args.out_dir,
+            'sections': sections,
+            'max_transactions': args.max_transactions,
+            'columns': columns,
+            'gzip': args.gzip
+        })
+    
+    start_time = time.perf_counter()
+    failures = 0
+    workers = min(args.workers, len(jobs))
+    if workers <= 1:
+        results = []
+        for job in jobs:
+            results.append(run_job(job))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(run_job, jobs))
+    
+    for path, written, seconds, error in results:
+        if error:
+            failures += 1
+            print(f"FAILED {path}: {error}", file=sys.stderr)
+        else:
+            print(f"{path}: {len(written)} files in {seconds:.2f}s")
+    print(f"Done: {len(jobs) - failures}/{len(jobs)} ledgers in {time.perf_counter() - start_time:.2f}s -> {args.out_dir}")
+    return 1 if failures else 0
+
@@ -0,0 +1,29 @@
+"""
+Convert a ledger between the JSON snapshot and the binary record format
+
+    python -m khata.convert expenses_data.json expenses_data.khb
+    python -m khata.convert expenses_data.khb expenses_data.json
+"""
+
+import sys
+
+from .records import json_to_records, records_to_json
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 2:
+        print("usage: python -m khata.convert SOURCE TARGET  (a .json and a .khb file, either way round)",
+              file=sys.stderr)
+        return 2
+    source, target = argv
+    if source.endswith(".json"):
+        count = json_to_records(source, target)
+    else:
+        count = records_to_json(source, target)
+    print(f"Converted {count} expenses: {source} -> {target}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,274 @@
+"""
+Bulk CSV / bank-statement import
+
+Streams a CSV, maps its columns onto expense fields, validates categories and
+payment modes, and adds the good rows in batches: one block of IDs, one
+storage record and one persist per batch.
+"""
+
+import csv
+import io
+import math
+from datetime import datetime
+
+from .analytics import CSV_COLUMNS, add_expenses, allocate_ids
+from .model import CATEGORIES, PAYMENT_MODES
+from .shared import SharedLedger
+from .storage import deferred_compaction, lock_storage, persist_expenses
+
+IMPORT_BATCH_SIZE = 5000  # rows added (and persisted) together
+MAX_REPORTED_ERRORS = 100  # rejected rows listed in the import result
+
+IMPORT_FIELDS = ('date', 'category', 'subcategory', 'description', 'amount', 'payment_mode')
+
+# Date layouts seen in app exports and Indian bank statements, tried in order
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%d/%m/%y', '%d-%m-%y',
+                '%d-%b-%Y', '%d %b %Y', '%d-%b-%y', '%d %b %y')
+
+# Other header names for each field (compared case-insensitively)
+COLUMN_SYNONYMS = {
+    'date': ['date', 'txn date', 'transaction date', 'value date', 'tran date'],
+    'category': ['category'],
+    'subcategory': ['subcategory', 'sub category', 'sub-category'],
+    'description': ['description', 'narration', 'remarks', 'particulars', 'details'],
+    'amount': ['amount', 'debit', 'withdrawal', 'withdrawal amt.', 'withdrawal amount', 'debit amount', 'amount (inr)'],
+    'payment_mode': ['payment mode', 'payment_mode', 'mode']
+}
+
+
+# ============================================================================
+# COLUMN MAPPING & VALIDATION
+# ============================================================================
+
+def name_key(name):
+    """Lower-case name without a leading emoji, so 'groceries' matches '🛒 Groceries'"""
+    name = name.strip()
+    words = name.split(" ", 1)
+    if len(words) == 2 and not any(character.isalnum() for character in words[0]):
+        name = words[1]
+    return name.lower()
+
+
+def guess_column_map(headers):
+    """Expense field -> CSV header (or None) for the headers of a CSV file"""
+    by_key = {}
+    for header in headers:
+        by_key.setdefault(header.strip().lower(), header)
+    
+    column_map = {}
+    for field in IMPORT_FIELDS:
+        column_map[field] = None
+        for candidate in [CSV_COLUMNS[field].lower()] + COLUMN_SYNONYMS[field]:
+            if candidate in by_key:
+                column_map[field] = by_key[candidate]
+                break
+    return column_map
+
+
+def build_lookups():
+    """Forgiving name -> canonical name tables for CATEGORIES and PAYMENT_MODES"""
+    categories = {}
+    subcategories = {}
+    owners = {}
+    for category, names in CATEGORIES.items():
+        categories[category] = category
+        categories[name_key(category)] = category
+        subcategories[category] = {}
+        for subcategory in names:
+            subcategories[category][subcategory] = subcategory
+            subcategories[category][name_key(subcategory)] = subcategory
+            # A subcategory listed under two categories can't identify either
+            owners[name_key(subcategory)] = None if name_key(subcategory) in owners else (category, subcategory)
+    
+    payment_modes = {}
+    for mode in PAYMENT_MODES:
+        payment_modes[mode] = mode
+        payment_modes[name_key(mode)] = mode
+    return {'categories': categories, 'subcategories': subcategories, 'owners': owners, 'payment_modes': payment_modes}
+
+
+def parse_amount(text):
+    """'₹1,234.50', 'Rs. 99', '(250.00)' -> float (parentheses mean negative)"""
+    cleaned = text.strip()
+    for symbol in ("₹", "INR", "Rs.", "Rs", ","):
+        cleaned = cleaned.replace(symbol, "")
+    cleaned = cleaned.strip()
+    if cleaned.startswith("(") and cleaned.endswith(")"):
+        return -float(cleaned[1:-1])
+    return float(cleaned)
+
+
+def parse_date(text, date_formats, cache):
+    """Date text -> 'YYYY-MM-DD' (statements repeat dates, so results are cached)"""
+    parsed = cache.get(text)
+    if parsed is None:
+        for date_format in date_formats:
+            try:
+                parsed = datetime.strptime(text.strip(), date_format).strftime('%Y-%m-%d')
+                break
+            except ValueError:
+                continue
+        else:
+            raise ValueError(f"Unrecognised date: {text!r}")
+        cache[text] = parsed
+    return parsed
+
+
+def row_to_expense(row, column_map, defaults, lookups, date_formats, date_cache, debit_negative):
+    """Expense fields (no id yet) for one CSV row; raises ValueError if the row is invalid"""
+    def value(field):
+        header = column_map.get(field)
+        text = (row.get(header) or "").strip() if header else ""
+        return text or defaults.get(field, "")
+    
+    date_text = value('date')
+    if not date_text:
+        raise ValueError("Missing date")
+    amount_text = value('amount')
+    if not amount_text:
+        raise ValueError("Missing amount")
+    try:
+        amount = parse_amount(amount_text)
+    except ValueError:
+        raise ValueError(f"Bad amount: {amount_text!r}")
+    if not math.isfinite(amount):
+        # float() takes "nan" and "inf", which no comparison below would catch
+        raise ValueError(f"Bad amount: {amount_text!r}")
+    if debit_negative:
+        # Statement style: debits are negative, credits (income) are skipped
+        if amount >= 0:
+            raise ValueError("Credit, not an expense")
+        amount = -amount
+    elif amount <= 0:
+        raise ValueError(f"Amount must be greater than 0: {amount_text!r}")
+    
+    category_text = value('category')
+    subcategory_text = value('subcategory')
+    if category_text:
+        category = lookups['categories'].get(category_text) or lookups['categories'].get(name_key(category_text))
+        if category is None:
+            raise ValueError(f"Unknown category: {category_text!r}")
+        if subcategory_text:
+            names = lookups['subcategories'][category]
+            subcategory = names.get(subcategory_text) or names.get(name_key(subcategory_text))
+            if subcategory is None:
+                raise ValueError(f"Unknown subcategory for {category}: {subcategory_text!r}")
+        else:
+            # Every category ends with its catch-all "Other ..." subcategory
+            subcategory = CATEGORIES[category][-1]
+    elif subcategory_text:
+        owner = lookups['owners'].get(name_key(subcategory_text))
+        if owner is None:
+            raise ValueError(f"Can't tell the category of subcategory {subcategory_text!r}")
+        category, subcategory = owner
+    else:
+        raise ValueError("Missing category")
+    
+    mode_text = value('payment_mode')
+    payment_mode = lookups['payment_modes'].get(mode_text) or lookups['payment_modes'].get(name_key(mode_text))
+    if payment_mode is None:
+        raise ValueError(f"Unknown payment mode: {mode_text!r}")
+    
+    return {
+        'date': parse_date(date_text, date_formats, date_cache),
+        'category': category,
+        'subcategory': subcategory,
+        'description': value('description'),
+        'amount': amount,
+        'payment_mode': payment_mode
+    }
+
+
+# ============================================================================
+# IMPORT PIPELINE
+# ============================================================================
+
+def iter_csv_expenses(lines, column_map=None, defaults=None, date_formats=DATE_FORMATS, debit_negative=False):
+    """Yield (line number, expense fields or error message) for each CSV row, streaming.
+    
+    lines: any iterable of CSV text lines (an open file, an uploaded file wrapper)
+    column_map: expense field -> CSV header (default: guessed from the header row)
+    defaults: field -> value for unmapped or empty cells (e.g. a payment mode)
+    """
+    reader = csv.DictReader(lines)
+    headers = reader.fieldnames or []
+    column_map = column_map or guess_column_map(headers)
+    missing = [header for header in column_map.values() if header and header not in headers]
+    if missing:
+        raise ValueError(f"CSV has no column(s): {', '.join(missing)}")
+    
+    defaults = dict(defaults or {})
+    defaults.setdefault('payment_mode', "Other")
+    lookups = build_lookups()
+    date_cache = {}
+    for row in reader:
+        try:
+            yield reader.line_num, row_to_expense(row, column_map, defaults, lookups, date_formats, date_cache, debit_negative)
+        except ValueError as error:
+            yield reader.line_num, str(error)
+
+
+def commit_batch(ledger, batch):
+    """Give a batch IDs and timestamps, add it and persist once"""
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    expenses = []
+    for expense_id, fields in zip(allocate_ids(len(batch)), batch):
+        expense = {'id': expense_id}
+        expense.update(fields)
+        expense['created_at'] = now
+        expense['updated_at'] = now
+        expenses.append(expense)
+    
+    if isinstance(ledger, SharedLedger):
+        ledger.add_expenses(expenses)
+    else:
+        with lock_storage():
+            add_expenses(ledger, expenses)
+            persist_expenses(ledger)
+
+
+def import_csv(lines, ledger, column_map=None, defaults=None, date_formats=DATE_FORMATS,
+               debit_negative=False, batch_size=IMPORT_BATCH_SIZE, progress=None):
+    """Import expenses from CSV lines into a ledger (a list, ExpenseStore, SqliteLedger or SharedLedger).
+    
+    Valid rows are added batch_size at a time; invalid rows are skipped and
+    reported. progress(imported, skipped) is called after each batch. In
+    journal mode the journal is compacted once, after the last batch.
+    Returns {'imported': n, 'skipped': n, 'errors': [(line, message), ...]}.
+    """
+    result = {'imported': 0, 'skipped': 0, 'errors': []}
+    batch = []
+    with deferred_compaction():
+        for line, fields in iter_csv_expenses(lines, column_map, defaults, date_formats, debit_negative):
+            if isinstance(fields, str):
+                result['skipped'] += 1
+                if len(result['errors']) < MAX_REPORTED_ERRORS:
+                    result['errors'].append((line, fields))
+                continue
+            
+            batch.append(fields)
+            if len(batch) == batch_size:
+                commit_batch(ledger, batch)
+                result['imported'] += len(batch)
+                batch = []
+                if progress is not None:
+                    progress(result['imported'], result['skipped'])
+        
+        if batch:
+            commit_batch(ledger, batch)
+            result['imported'] += len(batch)
+            if progress is not None:
+                progress(result['imported'], result['skipped'])
+    return result
+
+
+def import_csv_file(path, ledger, **options):
+    """import_csv for a file on disk (UTF-8, with or without a BOM)"""
+    with open(path, 'r', encoding='utf-8-sig', newline='') as file:
+        return import_csv(file, ledger, **options)
+
+
+def read_csv_headers(data):
+    """Header row of CSV bytes (e.g. an uploaded file) without reading the rest"""
+    first_line = io.TextIOWrapper(io.BytesIO(data), encoding='utf-8-sig', newline='').readline()
+    return next(csv.reader([first_line]), [])
@@ -0,0 +1,235 @@
+"""
+Read-only, memory-mapped ledger over a binary records file (see records.py)
+"""
+
+from array import array
+from datetime import date
+
+from . import storage, vectorized
+from .model import aggregate_result
+from .records import RECORD, DateText, column_layout, map_records, record_to_expense
+
+# Only the columns a scan needs are unpacked; every other byte is skipped
+DATE_COLUMN = column_layout('date')
+ID_COLUMN = column_layout('id')
+SUMMARY_COLUMNS = column_layout('date', 'amount', 'category', 'subcategory', 'payment_mode')
+SEARCH_COLUMNS = column_layout('description_offset', 'description_length', 'category', 'subcategory', 'flags')
+CODE_COLUMNS = {
+    'category': column_layout('category'),
+    'subcategory': column_layout('subcategory'),
+    'payment_mode': column_layout('payment_mode')
+}
+SORT_COLUMNS = {
+    'id': ID_COLUMN,
+    'date': DATE_COLUMN,
+    'amount': column_layout('amount'),
+    'created_at': column_layout('created_at'),
+    'updated_at': column_layout('updated_at')
+}
+
+
+class MappedLedger:
+    """List-like, read-only ledger that queries a memory-mapped .khb file in place.
+    
+    Nothing is parsed up front: filters and totals scan the date, amount and
+    code columns of the mapped records with struct.iter_unpack, and filters
+    return a narrower ledger holding only the matching record numbers. Rows
+    become expense dicts only when iterated, sorted or listed, so millions of
+    rows can be totalled with a small resident set. Totals add up amounts in
+    ledger order, exactly like the plain-list helpers.
+    """
+    
+    def __init__(self, path=None, positions=None, mapping=None):
+        self.mapping = mapping or map_records(path or storage.BINARY_FILE)
+        self.tables = self.mapping['tables']
+        # Record numbers in this (filtered) view, or None for every record
+        self.positions = positions
+    
+    def _narrow(self, positions):
+        return MappedLedger(positions=array('i', positions), mapping=self.mapping)
+    
+    def _scan(self, layout):
+        """Unpack a column layout for every record in the view, in ledger order"""
+        records = self.mapping['records']
+        if self.positions is None:
+            return layout.iter_unpack(records)
+        size = RECORD.size
+        return (layout.unpack_from(records, i * size) for i in self.positions)
+    
+    def _numbers(self):
+        if self.positions is None:
+            return range(self.mapping['count'])
+        return self.positions
+    
+    def _rows(self, positions):
+        records = self.mapping['records']
+        heap = self.mapping['heap']
+        text = DateText()
+        size = RECORD.size
+        for i in positions:
+            yield record_to_expense(RECORD.unpack_from(records, i * size), self.tables, heap, text)
+    
+    def __iter__(self):
+        return self._rows(self._numbers())
+    
+    def __len__(self):
+        if self.positions is None:
+            return self.mapping['count']
+        return len(self.positions)
+    
+    def __bool__(self):
+        return len(self) > 0
+    
+    def copy(self):
+        """Materialize the matching rows as a plain list"""
+        return list(self)
+    
+    # --- filters ------------------------------------------------------------------
+    
+    def filter_dates(self, start_date, end_date):
+        """Rows dated between start_date and end_date (inclusive)"""
+        start = date.fromisoformat(start_date).toordinal()
+        end = date.fromisoformat(end_date).toordinal()
+        matches = []
+        for i, (day,) in zip(self._numbers(), self._scan(DATE_COLUMN)):
+            if start <= day <= end:
+                matches.append(i)
+        return self._narrow(matches)
+    
+    def filter_equals(self, column, value):
+        """Rows where category / subcategory / payment_mode equals value"""
+        names = self.tables[column]
+        if value not in names:
+            return self._narrow([])
+        code = names.index(value)
+        matches = []
+        for i, (row_code,) in zip(self._numbers(), self._scan(CODE_COLUMNS[column])):
+            if row_code == code:
+                matches.append(i)
+        return self._narrow(matches)
+    
+    def search(self, search_term):
+        """Rows whose description, category or subcategory contains the term"""
+        term = search_term.lower()
+        heap = self.mapping['heap']
+        # Whole-table matches are decided once per code, not once per row
+        category_hits = [term in name.lower() for name in self.tables['category']]
+        subcategory_hits = [term in name.lower() for name in self.tables['subcategory']]
+        matches = []
+        for i, (offset, length, category, subcategory, flags) in zip(self._numbers(), self._scan(SEARCH_COLUMNS)):
+            if (category_hits[category] or subcategory_hits[subcategory] or
+                    (length and term in str(heap[offset:offset + length], 'utf-8').lower())):
+                matches.append(i)
+        return list(self._rows(matches))
+    
+    # --- totals -------------------------------------------------------------------
+    
+    def summarize(self, measures, group_by):
+        """Measures and group-by totals from one scan of the amount, date and code columns (see aggregate_expenses)"""
+        if len(self) >= vectorized.VECTORIZE_MIN_ROWS and vectorized.available():
+            return vectorized.summarize_records(self.mapping, self.positions, measures, group_by)
+        categories = self.tables['category']
+        subcategories = self.tables['subcategory']
+        payment_modes = self.tables['payment_mode']
+        text = DateText()
+        months = {}
+        
+        total = 0
+        count = 0
+        max_amount = 0
+        min_amount = None
+        groups = {}
+        for name in group_by:
+            groups[name] = {}
+        group_items = list(groups.items())
+        
+        for day, amount, category, subcategory, payment_mode in self._scan(SUMMARY_COLUMNS):
+            total = total + amount
+            count = count + 1
+            if amount > max_amount:
+                max_amount = amount
+            if min_amount is None or amount < min_amount:
+                min_amount = amount
+            
+            for name, totals in group_items:
+                if name == 'category':
+                    key = categories[category]
+                elif name == 'subcategory':
+                    key = subcategories[subcategory]
+                elif name == 'category_subcategory':
+                    key = (categories[category], subcategories[subcategory])
+                elif name == 'payment_mode':
+                    key = payment_modes[payment_mode]
+                elif name == 'date':
+                    key = text.date(day)
+                else:
+                    key = months.get(day)
+                    if key is None:
+                        key = text.date(day)[:7]
+                        months[day] = key
+                if key in totals:
+                    totals[key] = totals[key] + amount
+                else:
+                    totals[key] = amount
+        
+        return aggregate_result(measures, total, count, max_amount, min_amount, groups)
+    
+    # --- ordering -----------------------------------------------------------------
+    
+    def _sort_values(self, field):
+        """One sortable value per record in the view, in ledger order"""
+        if field in SORT_COLUMNS:
+            return [values[0] for values in self._scan(SORT_COLUMNS[field])]
+        if field in CODE_COLUMNS:
+            names = self.tables[field]
+            return [names[values[0]] for values in self._scan(CODE_COLUMNS[field])]
+        if field == 'description':
+            heap = self.mapping['heap']
+            return [str(heap[offset:offset + length], 'utf-8')
+                    for offset, length, category, subcategory, flags in self._scan(SEARCH_COLUMNS)]
+        raise ValueError(f"Cannot sort by {field}")
+    
+    def sorted_positions(self, keys):
+        """Record numbers ordered by (field, ascending) keys; ties keep ledger order"""
+        numbers = list(self._numbers())
+        order = list(range(len(numbers)))
+        # Stable sort per key, least significant first
+        for field, ascending in reversed(keys):
+            values = self._sort_values(field)
+            order.sort(key=values.__getitem__, reverse=not ascending)
+        return [numbers[j] for j in order]
+    
+    def sort_rows(self, keys):
+        """Rows ordered by (field, ascending) keys"""
+        return list(self._rows(self.sorted_positions(keys)))
+    
+    def iter_sorted(self, keys, limit=None):
+        """Like sort_rows, but yields rows one at a time (at most limit)"""
+        return self._rows(self.sorted_positions(keys)[:limit])
+    
+    def top_rows(self, n):
+        """The n largest expenses"""
+        return list(self.iter_sorted([('amount', False)], n))
+    
+    def page(self, keys, offset, limit, category=None, search_term=""):
+        """(rows, match count, total) for one page of the sorted, filtered rows"""
+        if search_term:
+            from .analytics import paginate_expenses
+            return paginate_expenses(self.search(search_term), keys, offset, limit, category)
+        ledger = self if category is None else self.filter_equals('category', category)
+        rows = list(ledger._rows(ledger.sorted_positions(keys)[offset:offset + limit]))
+        return rows, len(ledger), ledger.summarize(['total'], [])['total']
+    
+    def get(self, expense_id):
+        """Expense dict by ID (or None)"""
+        for i, (row_id,) in zip(self._numbers(), self._scan(ID_COLUMN)):
+            if row_id == expense_id:
+                return next(self._rows([i]))
+        return None
+    
+    # --- read-only ----------------------------------------------------------------
+    
+    def _read_only(self, *args):
+        raise AttributeError("Read-only mapped ledger: change expenses through a writable storage mode")
+    
+    append = extend = update = delete = _read_only
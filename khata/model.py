@@ -0,0 +1,373 @@
+"""
+Data model: expense categories, payment modes and the fields of an expense
+"""
+
+# ============================================================================
+# ENHANCED CATEGORY & SUBCATEGORY STRUCTURE
+# ============================================================================
+
+CATEGORIES = {
+    "🛒 Groceries": [
+        "Vegetables (Sabzi)",
+        "Fruits (Phal)",
+        "Milk & Dairy (Doodh/Paneer/Dahi)",
+        "Rice & Grains (Chawal/Gehu)",
+        "Dal & Pulses (Dal/Chana)",
+        "Cooking Oil & Ghee",
+        "Spices & Masalas",
+        "Flour & Atta",
+        "Bread & Bakery",
+        "Eggs & Meat",
+        "Fish & Seafood",
+        "Snacks & Namkeen",
+        "Biscuits & Cookies",
+        "Tea & Coffee",
+        "Sugar & Jaggery",
+        "Dry Fruits",
+        "Packaged Food",
+        "Beverages & Soft Drinks",
+        "Other Groceries"
+    ],
+    
+    "💡 Utilities": [
+        "Electricity Bill",
+        "Water Bill",
+        "Gas (LPG/PNG) Bill",
+        "Internet/WiFi Bill",
+        "Mobile Recharge",
+        "Landline Bill",
+        "DTH/Cable TV",
+        "Newspaper/Magazine",
+        "Society Maintenance",
+        "Garbage Collection",
+        "Other Utilities"
+    ],
+    
+    "🏠 Housing & Rent": [
+        "House Rent",
+        "Society Maintenance",
+        "Property Tax",
+        "Home Insurance",
+        "Repairs & Maintenance",
+        "Plumbing Work",
+        "Electrical Work",
+        "Painting & Whitewash",
+        "Pest Control",
+        "Security Charges",
+        "Parking Charges",
+        "Other Housing"
+    ],
+    
+    "🚗 Transportation": [
+        "Petrol/Diesel",
+        "CNG/Gas",
+        "Auto Rickshaw",
+        "Cab/Taxi (Ola/Uber)",
+        "Bus Fare",
+        "Metro/Train Fare",
+        "Toll Charges",
+        "Parking Fees",
+        "Vehicle Service",
+        "Vehicle Repair",
+        "Tyre/Battery",
+        "Vehicle Insurance",
+        "Driving License/RC",
+        "Fastag Recharge",
+        "Other Transport"
+    ],
+    
+    "🏥 Medical & Health": [
+        "Doctor Consultation",
+        "Medicines (Pharmacy)",
+        "Lab Tests & Diagnostics",
+        "Hospital Bills",
+        "Health Insurance Premium",
+        "Dental Treatment",
+        "Eye Care/Spectacles",
+        "Ayurvedic/Homeopathy",
+        "Gym/Fitness Membership",
+        "Yoga Classes",
+        "Medical Equipment",
+        "First Aid Supplies",
+        "Vaccinations",
+        "Physiotherapy",
+        "Other Medical"
+    ],
+    
+    "📚 Education": [
+        "School Fees",
+        "College Fees",
+        "Tuition/Coaching Fees",
+        "Books & Notebooks",
+        "Stationery",
+        "School Uniform",
+        "School Bus/Transport",
+        "Online Courses",
+        "Certification Exams",
+        "Computer Classes",
+        "Music/Dance Classes",
+        "Sports Coaching",
+        "Educational Apps",
+        "Library Fees",
+        "Project Materials",
+        "Other Education"
+    ],
+    
+    "👕 Shopping & Clothing": [
+        "Men's Clothing",
+        "Women's Clothing",
+        "Kids' Clothing",
+        "Footwear/Shoes",
+        "Jewellery",
+        "Watches",
+        "Bags & Wallets",
+        "Cosmetics & Makeup",
+        "Skincare Products",
+        "Hair Care Products",
+        "Perfumes & Deodorants",
+        "Accessories",
+        "Festival Shopping",
+        "Wedding Shopping",
+        "Other Shopping"
+    ],
+    
+    "🎬 Entertainment": [
+        "Movies (Theatre)",
+        "OTT Subscriptions (Netflix/Prime/Hotstar)",
+        "Music Subscriptions (Spotify/Gaana)",
+        "Dining Out/Restaurant",
+        "Food Delivery (Swiggy/Zomato)",
+        "Cafe & Coffee",
+        "Street Food",
+        "Picnic/Outing",
+        "Amusement Park",
+        "Gaming",
+        "Books & Magazines",
+        "Hobbies",
+        "Party & Celebration",
+        "Other Entertainment"
+    ],
+    
+    "✈️ Travel & Vacation": [
+        "Flight Tickets",
+        "Train Tickets (IRCTC)",
+        "Bus Tickets",
+        "Hotel/Accommodation",
+        "Travel Insurance",
+        "Visa Fees",
+        "Passport Fees",
+        "Tour Package",
+        "Local Sightseeing",
+        "Travel Food",
+        "Travel Shopping",
+        "Pilgrimage/Religious Travel",
+        "Other Travel"
+    ],
+    
+    "💳 EMI & Loans": [
+        "Home Loan EMI",
+        "Car Loan EMI",
+        "Personal Loan EMI",
+        "Education Loan EMI",
+        "Credit Card Bill",
+        "Credit Card EMI",
+        "Gold Loan EMI",
+        "Two-Wheeler Loan EMI",
+        "Consumer Durable EMI",
+        "Other Loan EMI"
+    ],
+    
+    "📱 Electronics & Gadgets": [
+        "Mobile Phone",
+        "Laptop/Computer",
+        "Tablet/iPad",
+        "TV/Smart TV",
+        "Refrigerator",
+        "Washing Machine",
+        "AC/Cooler",
+        "Microwave/Oven",
+        "Mixer/Grinder",
+        "Water Purifier",
+        "Geyser/Heater",
+        "Fan/Cooler",
+        "Camera",
+        "Earphones/Headphones",
+        "Smart Watch",
+        "Other Electronics"
+    ],
+    
+    "🏡 Home & Furniture": [
+        "Furniture (Sofa/Bed/Table)",
+        "Mattress & Bedding",
+        "Curtains & Blinds",
+        "Kitchen Utensils",
+        "Cookware",
+        "Crockery & Cutlery",
+        "Home Decor",
+        "Cleaning Supplies",
+        "Detergent & Soap",
+        "Room Freshener",
+        "Storage & Organization",
+        "Garden Supplies",
+        "Light & Lamps",
+        "Other Home Items"
+    ],
+    
+    "👶 Kids & Baby": [
+        "Baby Food & Formula",
+        "Diapers",
+        "Baby Clothes",
+        "Baby Care Products",
+        "Toys & Games",
+        "School Supplies",
+        "Kids Books",
+        "Baby Furniture",
+        "Stroller/Pram",
+        "Kids Activities",
+        "Birthday Party",
+        "Other Kids Expenses"
+    ],
+    
+    "🐕 Pets": [
+        "Pet Food",
+        "Pet Grooming",
+        "Vet/Doctor Visits",
+        "Pet Medicines",
+        "Pet Accessories",
+        "Pet Insurance",
+        "Pet Boarding",
+        "Other Pet Expenses"
+    ],
+    
+    "💰 Investments & Savings": [
+        "SIP/Mutual Funds",
+        "Fixed Deposit",
+        "Recurring Deposit",
+        "PPF Contribution",
+        "NPS Contribution",
+        "LIC Premium",
+        "Stock Purchase",
+        "Gold Purchase",
+        "Chit Fund",
+        "Other Investments"
+    ],
+    
+    "🎁 Gifts & Donations": [
+        "Birthday Gifts",
+        "Wedding Gifts",
+        "Festival Gifts",
+        "Charity/Donation",
+        "Religious Donation",
+        "Temple/Church Offering",
+        "Tips & Gratuity",
+        "Other Gifts"
+    ],
+    
+    "👨‍👩‍👧‍👦 Family & Personal": [
+        "Salon/Haircut",
+        "Spa & Massage",
+        "Parlour/Beauty",
+        "Laundry/Dry Cleaning",
+        "Tailoring/Alterations",
+        "Marriage Expenses",
+        "Funeral Expenses",
+        "Family Function",
+        "Pocket Money",
+        "Personal Care",
+        "Other Personal"
+    ],
+    
+    "📋 Government & Taxes": [
+        "Income Tax",
+        "Property Tax",
+        "Professional Tax",
+        "GST Payment",
+        "Stamp Duty",
+        "Registration Fees",
+        "Court Fees",
+        "Fine/Penalty",
+        "Other Government"
+    ],
+    
+    "🔧 Services & Repairs": [
+        "Maid/Domestic Help",
+        "Cook Salary",
+        "Driver Salary",
+        "Watchman/Security",
+        "Carpenter Work",
+        "AC Service/Repair",
+        "Appliance Repair",
+        "Mobile Repair",
+        "Computer Repair",
+        "Other Services"
+    ],
+    
+    "❓ Miscellaneous": [
+        "ATM Withdrawal (Cash)",
+        "Bank Charges",
+        "Courier/Postage",
+        "Photocopy/Printing",
+        "Emergency Expense",
+        "Lost/Stolen Items",
+        "Uncategorized",
+        "Other Expenses"
+    ]
+}
+
+PAYMENT_MODES = [
+    "Cash",
+    "UPI (GPay/PhonePe/Paytm)",
+    "Credit Card",
+    "Debit Card",
+    "Net Banking",
+    "Wallet (Paytm/Amazon)",
+    "Cheque",
+    "Bank Transfer (NEFT/IMPS)",
+    "EMI",
+    "Other"
+]
+
+# ============================================================================
+# EXPENSES
+# ============================================================================
+
+# Fields of every expense record, in storage order
+EXPENSE_FIELDS = ['id', 'date', 'category', 'subcategory', 'description',
+                  'amount', 'payment_mode', 'created_at', 'updated_at']
+
+
+def all_subcategories():
+    """Every subcategory name across CATEGORIES"""
+    names = []
+    for subcategories in CATEGORIES.values():
+        for subcategory in subcategories:
+            names.append(subcategory)
+    return names
+
+
+def paise_to_amount(paise, whole):
+    """Integer paise back to an amount: an int when every amount behind it was a
+    whole-rupee int (as a plain list's totals would be), otherwise a float"""
+    if whole:
+        return paise // 100
+    return paise / 100
+
+
+def aggregate_result(measures, total, count, max_amount, min_amount, groups):
+    """Assemble the requested measures (plus group-by totals) into one result dict"""
+    result = {}
+    for measure in measures:
+        if measure == 'total':
+            result['total'] = total
+        elif measure == 'count':
+            result['count'] = count
+        elif measure == 'average':
+            result['average'] = round(total / count, 2) if count > 0 else 0
+        elif measure == 'max':
+            result['max'] = max_amount if count > 0 else 0
+        elif measure == 'min':
+            result['min'] = min_amount if count > 0 else 0
+        else:
+            raise ValueError(f"Unknown measure: {measure}")
+    result.update(groups)
+    return result
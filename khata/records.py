@@ -0,0 +1,273 @@
+"""
+Compact binary expense records
+
+    python -m khata.convert expenses_data.json expenses_data.khb   # JSON -> binary
+    python -m khata.convert expenses_data.khb expenses_data.json   # binary -> JSON
+
+File layout (little-endian):
+    header   magic, format version, record size, record count, table bytes, heap bytes
+    tables   JSON {"category": [...], "subcategory": [...], "payment_mode": [...]}: the
+             code -> name dictionaries, in CATEGORIES / PAYMENT_MODES order and then
+             any names the model no longer lists
+    records  one fixed-width RECORD per expense, in ledger order
+    heap     UTF-8 descriptions, referenced by (offset, length) from the records
+
+Conversion is lossless: decoding gives back the same expense dicts, key order
+included, so a JSON snapshot survives a round trip byte for byte.
+"""
+
+import json
+import mmap
+import struct
+from datetime import date, datetime
+
+from .model import CATEGORIES, PAYMENT_MODES, EXPENSE_FIELDS, all_subcategories
+
+MAGIC = b"KHTB"
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHHIII')
+# id, date (ordinal day), amount, created_at and updated_at (seconds since
+# 0001-01-01, -1 for none), description heap offset and length, category,
+# subcategory and payment mode codes, flags
+RECORD_CODES = 'qidqqIIHHHB'
+RECORD = struct.Struct('<' + RECORD_CODES)
+RECORD_FIELDS = ('id', 'date', 'amount', 'created_at', 'updated_at', 'description_offset',
+                 'description_length', 'category', 'subcategory', 'payment_mode', 'flags')
+
+FLAG_INT_AMOUNT = 1  # amount was a whole int (e.g. a Quick Add), not a float
+FLAG_NO_DESCRIPTION = 2  # description was None rather than ""
+
+TABLE_COLUMNS = ('category', 'subcategory', 'payment_mode')
+
+
+# ============================================================================
+# FIELD ENCODING
+# ============================================================================
+
+def model_tables():
+    """Code -> name lists seeded from the model, so known names get the same codes in every file"""
+    subcategories = []
+    for name in all_subcategories():
+        if name not in subcategories:
+            subcategories.append(name)
+    return {'category': list(CATEGORIES), 'subcategory': subcategories, 'payment_mode': list(PAYMENT_MODES)}
+
+
+def encode_timestamp(text):
+    """'YYYY-MM-DD HH:MM:SS' -> seconds since 0001-01-01 (-1 for None)"""
+    if text is None:
+        return -1
+    parsed = datetime.fromisoformat(text)
+    if parsed.isoformat(' ') != text:
+        raise ValueError(f"Timestamp not in YYYY-MM-DD HH:MM:SS form: {text!r}")
+    return parsed.toordinal() * 86400 + parsed.hour * 3600 + parsed.minute * 60 + parsed.second
+
+
+def encode_date(text):
+    """'YYYY-MM-DD' -> ordinal day"""
+    parsed = date.fromisoformat(text)
+    if parsed.isoformat() != text:
+        raise ValueError(f"Date not in YYYY-MM-DD form: {text!r}")
+    return parsed.toordinal()
+
+
+class DateText:
+    """Ordinal days and timestamps back to text, cached (ledgers repeat a few thousand days)"""
+    
+    def __init__(self):
+        self.days = {}
+        self.times = {}
+    
+    def date(self, ordinal):
+        text = self.days.get(ordinal)
+        if text is None:
+            text = date.fromordinal(ordinal).isoformat()
+            self.days[ordinal] = text
+        return text
+    
+    def timestamp(self, seconds):
+        if seconds < 0:
+            return None
+        day, rest = divmod(seconds, 86400)
+        time_text = self.times.get(rest)
+        if time_text is None:
+            time_text = f"{rest // 3600:02d}:{rest // 60 % 60:02d}:{rest % 60:02d}"
+            self.times[rest] = time_text
+        return self.date(day) + " " + time_text
+
+
+# ============================================================================
+# ENCODE / DECODE
+# ============================================================================
+
+def encode_expenses(expenses_list):
+    """Expense dicts -> binary records (raises ValueError for values the format can't hold)"""
+    tables = model_tables()
+    codes = {}
+    for column in TABLE_COLUMNS:
+        codes[column] = {}
+        for code, name in enumerate(tables[column]):
+            codes[column][name] = code
+    
+    fields = set(EXPENSE_FIELDS)
+    days = {}
+    records = bytearray()
+    heap = bytearray()
+    count = 0
+    for expense in expenses_list:
+        if expense.keys() != fields:
+            raise ValueError(f"Expense {expense.get('id')} doesn't have exactly the fields {EXPENSE_FIELDS}")
+        
+        column_codes = []
+        for column in TABLE_COLUMNS:
+            name = expense[column]
+            code = codes[column].get(name)
+            if code is None:
+                code = len(tables[column])
+                tables[column].append(name)
+                codes[column][name] = code
+            column_codes.append(code)
+        
+        flags = 0
+        amount = expense['amount']
+        if type(amount) is int:
+            flags = flags | FLAG_INT_AMOUNT
+        description = expense['description']
+        if description is None:
+            flags = flags | FLAG_NO_DESCRIPTION
+            description = ""
+        text = description.encode('utf-8')
+        day = days.get(expense['date'])
+        if day is None:
+            day = encode_date(expense['date'])
+            days[expense['date']] = day
+        
+        records += RECORD.pack(
+            expense['id'],
+            day,
+            amount,
+            encode_timestamp(expense['created_at']),
+            encode_timestamp(expense['updated_at']),
+            len(heap),
+            len(text),
+            column_codes[0],
+            column_codes[1],
+            column_codes[2],
+            flags
+        )
+        heap += text
+        count = count + 1
+    
+    table_bytes = json.dumps(tables, ensure_ascii=False).encode('utf-8')
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, RECORD.size, count, len(table_bytes), len(heap))
+    return b"".join([header, table_bytes, records, heap])
+
+
+def read_header(data):
+    """(record count, tables, records offset, heap offset) of a binary buffer (bytes, mmap or memoryview)"""
+    if len(data) < HEADER.size:
+        raise ValueError("Not a binary expense file: too short")
+    magic, version, record_size, count, table_length, heap_length = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("Not a binary expense file")
+    if version != FORMAT_VERSION or record_size != RECORD.size:
+        raise ValueError(f"Unsupported binary expense format version {version}")
+    records_offset = HEADER.size + table_length
+    heap_offset = records_offset + count * RECORD.size
+    if len(data) < heap_offset + heap_length:
+        raise ValueError("Binary expense file is truncated")
+    tables = json.loads(bytes(data[HEADER.size:records_offset]).decode('utf-8'))
+    return count, tables, records_offset, heap_offset
+
+
+def record_to_expense(values, tables, heap, text):
+    """Expense dict for one unpacked RECORD (heap: the description bytes, text: a DateText)"""
+    (expense_id, day, amount, created, updated, offset, length,
+     category, subcategory, payment_mode, flags) = values
+    if flags & FLAG_NO_DESCRIPTION:
+        description = None
+    else:
+        description = str(heap[offset:offset + length], 'utf-8')
+    return {
+        'id': expense_id,
+        'date': text.date(day),
+        'category': tables['category'][category],
+        'subcategory': tables['subcategory'][subcategory],
+        'description': description,
+        'amount': int(amount) if flags & FLAG_INT_AMOUNT else amount,
+        'payment_mode': tables['payment_mode'][payment_mode],
+        'created_at': text.timestamp(created),
+        'updated_at': text.timestamp(updated)
+    }
+
+
+def decode_expenses(data):
+    """Binary records -> expense dicts (the exact dicts encode_expenses was given)"""
+    count, tables, records_offset, heap_offset = read_header(data)
+    view = memoryview(data)
+    heap = view[heap_offset:]
+    text = DateText()
+    
+    expenses_list = []
+    for values in RECORD.iter_unpack(view[records_offset:heap_offset]):
+        expenses_list.append(record_to_expense(values, tables, heap, text))
+    return expenses_list
+
+
+# ============================================================================
+# IN-PLACE ACCESS
+# ============================================================================
+
+def column_layout(*fields):
+    """A Struct the size of RECORD that unpacks only the named fields (in record order), skipping the rest"""
+    layout = '<'
+    for field, code in zip(RECORD_FIELDS, RECORD_CODES):
+        if field in fields:
+            layout = layout + code
+        else:
+            layout = layout + f"{struct.calcsize('<' + code)}x"
+    return struct.Struct(layout)
+
+
+def map_records(path):
+    """Memory-map a binary file read-only: {'count', 'tables', 'records', 'heap'}.
+    
+    records and heap are memoryviews straight onto the mapped pages, so the
+    OS reads (and can drop) them on demand instead of the file being loaded.
+    """
+    with open(path, 'rb') as file:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    count, tables, records_offset, heap_offset = read_header(mapped)
+    view = memoryview(mapped)
+    return {
+        'count': count,
+        'tables': tables,
+        'records': view[records_offset:heap_offset],
+        'heap': view[heap_offset:]
+    }
+
+
+# ============================================================================
+# FILE CONVERSION
+# ============================================================================
+
+def read_records_file(path):
+    with open(path, 'rb') as file:
+        return decode_expenses(file.read())
+
+
+def json_to_records(json_file, records_file):
+    """Convert a JSON snapshot to a binary file; returns the number of expenses"""
+    with open(json_file, 'r') as file:
+        expenses_list = json.load(file)
+    with open(records_file, 'wb') as file:
+        file.write(encode_expenses(expenses_list))
+    return len(expenses_list)
+
+
+def records_to_json(records_file, json_file):
+    """Convert a binary file back to a JSON snapshot (same layout as the app writes)"""
+    expenses_list = read_records_file(records_file)
+    with open(json_file, 'w') as file:
+        json.dump(expenses_list, file, indent=2)
+    return len(expenses_list)
@@ -0,0 +1,124 @@
+"""
+One expense ledger shared by every session of a server process
+"""
+
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from .analytics import add_expense, add_expenses, delete_expense, update_expense
+from .storage import lock_storage, persist_expenses, save_expenses, storage_signature
+from .store import ExpenseStore, StoreView, load_ledger
+
+EXPORT_CACHE_SIZE = 12  # generated CSV/JSON/report downloads kept per server process
+
+class ExportCache:
+    """Least-recently-used cache of generated downloads.
+    
+    Keys carry the ledger version, so entries for old data are never hit
+    again and simply age out.
+    """
+    
+    def __init__(self, capacity=EXPORT_CACHE_SIZE):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+    
+    def get(self, key, build):
+        """Cached payload for key, calling build() on a miss"""
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+        
+        # Build outside the lock so one slow report doesn't block other downloads
+        payload = build()
+        with self.lock:
+            self.entries[key] = payload
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+        return payload
+
+
+class SharedLedger:
+    """Expenses shared by every session in this server process.
+    
+    Sessions read through view(), which is cheap: it only stats the data
+    files and reloads when they changed underneath us (another process or a
+    script wrote them). All changes go through add/update/delete/replace_all,
+    which take the storage lock, reload if the files moved on since we last
+    saw them, apply the change on top and persist - so a second writer's rows
+    are merged rather than overwritten.
+    """
+    
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.ledger = None
+        self.signature = None
+        self.version = 0
+        self.exports = ExportCache()
+        self._view = None
+    
+    def _refresh(self):
+        if self.ledger is not None and storage_signature() == self.signature:
+            return
+        self.ledger, self.signature = load_ledger()
+        self.version += 1
+        if isinstance(self.ledger, ExpenseStore):
+            self._view = StoreView(self.ledger, self.lock)
+        else:
+            self._view = self.ledger
+    
+    @contextmanager
+    def _writing(self):
+        with self.lock, lock_storage():
+            self._refresh()
+            try:
+                yield self.ledger
+                persist_expenses(self.ledger)
+            except BaseException:
+                # The change may be half applied in memory and not on disk:
+                # drop the ledger so the next view() reloads what was saved
+                self.ledger = None
+                self.signature = None
+                raise
+            self.signature = storage_signature()
+            self.version += 1
+    
+    def view(self):
+        """Read-only expenses for a session"""
+        with self.lock:
+            self._refresh()
+            return self._view
+    
+    def export(self, export_format, filter_key, build):
+        """A download for the current data, built once per (format, filter, version)"""
+        with self.lock:
+            self._refresh()
+            key = (export_format, filter_key, self.version)
+        return self.exports.get(key, build)
+    
+    def add_expense(self, date, category, subcategory, description, amount, payment_mode):
+        with self._writing() as ledger:
+            add_expense(ledger, date, category, subcategory, description, amount, payment_mode)
+    
+    def add_expenses(self, new_expenses):
+        """Add a batch of complete expenses with one persist"""
+        with self._writing() as ledger:
+            add_expenses(ledger, new_expenses)
+    
+    def update_expense(self, expense_id, date, category, subcategory, description, amount, payment_mode):
+        with self._writing() as ledger:
+            update_expense(ledger, expense_id, date, category, subcategory, description, amount, payment_mode)
+    
+    def delete_expense(self, expense_id):
+        with self._writing() as ledger:
+            delete_expense(ledger, expense_id)
+    
+    def replace_all(self, expenses_list):
+        """Overwrite every expense (e.g. delete all) and reload"""
+        with self.lock, lock_storage():
+            save_expenses(expenses_list)
+            self.ledger = None
+            self._refresh()
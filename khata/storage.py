@@ -0,0 +1,892 @@
+"""
+Storage layer: JSON snapshot, append-only journal, SQLite, month-partitioned and binary backends
+"""
+
+import gzip
+import json
+import lzma
+import os
+import sqlite3
+import threading
+import zlib
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from .model import EXPENSE_FIELDS, aggregate_result, paise_to_amount
+from .records import decode_expenses, encode_expenses
+
+# Data file path
+DATA_FILE = "expenses_data.json"
+
+# Storage mode: "json" (the default) rewrites DATA_FILE on every change, so the
+# file is always current for anything else that reads it,
+# "journal" (opt-in) appends each change to JOURNAL_FILE and folds it into DATA_FILE
+# once the journal passes JOURNAL_COMPACT_SIZE, so DATA_FILE lags until then,
+# "sqlite" keeps expenses in DB_FILE and runs filters/totals as SQL queries,
+# "partitioned" keeps one JSON file per month in PARTITION_DIR and loads months on demand,
+# "binary" rewrites BINARY_FILE (fixed-width records, see records.py) on every change
+STORAGE_MODE = "json"
+JOURNAL_FILE = "expenses_journal.jsonl"
+JOURNAL_COMPACT_SIZE = 256 * 1024  # bytes of journal before compaction
+DB_FILE = "expenses_data.db"
+PARTITION_DIR = "data"  # YYYY-MM.json partitions plus manifest.json
+BINARY_FILE = "expenses_data.khb"
+ARCHIVE_FORMAT = "gzip"  # codec for closed months in PARTITION_DIR: "gzip", "lzma", "zlib" or None (plain JSON)
+LOCK_FILE = "expenses_data.lock"  # advisory lock shared by every process writing the data files
+
+class StaleDataError(Exception):
+    """The data files changed since the expenses being saved were loaded"""
+
+
+_lock_depth = threading.local()
+
+
+@contextmanager
+def lock_storage():
+    """Hold the advisory lock on the data files (re-entrant within a thread).
+    
+    Every write goes through this, so two app processes or a script and the
+    app never interleave a snapshot rewrite with a journal append.
+    """
+    depth = getattr(_lock_depth, 'value', 0)
+    _lock_depth.value = depth + 1
+    try:
+        if depth:
+            yield
+            return
+        with open(LOCK_FILE, 'a+') as file:
+            if fcntl is not None:
+                fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+            else:
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+                else:
+                    file.seek(0)
+                    msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+    finally:
+        _lock_depth.value = depth
+
+
+# --- JSON file backend -------------------------------------------------------
+
+def read_snapshot(data_file=None, strict=False):
+    """Read the expenses snapshot from JSON file.
+    
+    strict=True raises on a file that isn't a JSON list instead of reading
+    it as no expenses (a missing file is still empty).
+    """
+    data_file = data_file or DATA_FILE
+    if strict and os.path.exists(data_file):
+        with open(data_file, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+        if not isinstance(data, list):
+            raise ValueError(f"{data_file}: expected a JSON list of expenses")
+        return data
+    if os.path.exists(data_file):
+        try:
+            with open(data_file, 'r') as file:
+                data = json.load(file)
+                return data
+        except:
+            return []
+    return []
+
+
+@contextmanager
+def atomic_write(path, mode='w'):
+    """Open a temp file that replaces path once written, so a crash never leaves half a file"""
+    temp_file = path + ".tmp"
+    with open(temp_file, mode) as file:
+        yield file
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_file, path)
+
+
+def write_json_file(path, data):
+    with atomic_write(path) as file:
+        json.dump(data, file, indent=2)
+
+
+def write_snapshot(expenses_list):
+    """Write the expenses snapshot"""
+    write_json_file(DATA_FILE, list(expenses_list))
+
+
+# --- Journal backend (snapshot + append-only log) -----------------------------
+
+def append_journal(record):
+    """Append one change record to the journal and fsync it"""
+    with open(JOURNAL_FILE, 'a') as file:
+        file.write(json.dumps(record) + "\n")
+        file.flush()
+        os.fsync(file.fileno())
+
+
+def replay_journal(expenses_list, journal_file=None, repair=True):
+    """Apply journal records on top of the snapshot (safe to replay twice).
+    
+    repair=False leaves a torn tail as it is, for read-only callers.
+    """
+    journal_file = journal_file or JOURNAL_FILE
+    if not os.path.exists(journal_file):
+        return expenses_list
+    
+    positions = {}
+    for i in range(len(expenses_list)):
+        positions[expenses_list[i]['id']] = i
+    
+    with open(journal_file, 'r') as file:
+        content = file.read()
+    
+    for line in content.split("\n"):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            # Empty line or a record torn by a crash mid-write
+            continue
+        
+        if record['op'] == 'delete':
+            if record['id'] in positions:
+                expenses_list[positions.pop(record['id'])] = None
+        else:
+            expense = record['expense']
+            if expense['id'] in positions:
+                expenses_list[positions[expense['id']]] = expense
+            else:
+                positions[expense['id']] = len(expenses_list)
+                expenses_list.append(expense)
+    
+    # Fence off a torn tail so the next record starts on its own line
+    if repair and content and not content.endswith("\n"):
+        with open(journal_file, 'a') as file:
+            file.write("\n")
+    
+    return [expense for expense in expenses_list if expense is not None]
+
+
+def compact_journal(expenses_list):
+    """Fold the journal into a fresh snapshot and start an empty journal"""
+    with lock_storage():
+        write_snapshot(expenses_list)
+        with open(JOURNAL_FILE, 'w') as file:
+            file.flush()
+            os.fsync(file.fileno())
+
+
+def load_journal_storage():
+    """Load the snapshot and replay the journal tail"""
+    return replay_journal(read_snapshot())
+
+
+def append_journal_records(records):
+    """Append many change records with a single write and fsync"""
+    with open(JOURNAL_FILE, 'a') as file:
+        file.write("".join(json.dumps(record) + "\n" for record in records))
+        file.flush()
+        os.fsync(file.fileno())
+
+
+def record_journal_change(op, expense):
+    """Append a single add/update/delete to the journal"""
+    if op == 'delete':
+        append_journal({'op': op, 'id': expense['id']})
+    else:
+        append_journal({'op': op, 'expense': expense})
+
+
+def record_journal_changes(op, expenses):
+    """Append a batch of adds/updates/deletes to the journal"""
+    if op == 'delete':
+        append_journal_records([{'op': op, 'id': expense['id']} for expense in expenses])
+    else:
+        append_journal_records([{'op': op, 'expense': expense} for expense in expenses])
+
+
+def persist_journal(expenses_list):
+    """Compact the journal once it passes the size threshold (unless compaction is deferred)"""
+    if getattr(_compaction_deferred, 'value', 0):
+        return
+    if os.path.exists(JOURNAL_FILE) and os.path.getsize(JOURNAL_FILE) > JOURNAL_COMPACT_SIZE:
+        with lock_storage():
+            # Other processes may have appended records this list never saw,
+            # so fold what is on disk rather than what is in memory
+            compact_journal(load_journal_storage())
+
+
+_compaction_deferred = threading.local()
+
+
+@contextmanager
+def deferred_compaction():
+    """Hold off journal compaction for changes made in this thread, then compact once at the end.
+    
+    A bulk import appends far more than JOURNAL_COMPACT_SIZE per batch, so
+    compacting after every batch would rewrite the whole snapshot each time.
+    The journal itself is still appended (and fsynced) batch by batch.
+    """
+    depth = getattr(_compaction_deferred, 'value', 0)
+    _compaction_deferred.value = depth + 1
+    try:
+        yield
+    finally:
+        _compaction_deferred.value = depth
+    if depth == 0 and STORAGE_MODE == "journal":
+        with lock_storage():
+            persist_journal(None)
+
+
+# --- SQLite backend ------------------------------------------------------------
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS expenses (
+    seq INTEGER PRIMARY KEY,
+    id INTEGER NOT NULL UNIQUE,
+    date TEXT NOT NULL,
+    category TEXT NOT NULL,
+    subcategory TEXT NOT NULL,
+    description TEXT,
+    amount NOT NULL,  -- no declared type, so 60 stays an integer and 60.5 a real
+    payment_mode TEXT NOT NULL,
+    created_at TEXT,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_expenses_date ON expenses(date);
+CREATE INDEX IF NOT EXISTS idx_expenses_category ON expenses(category, subcategory);
+CREATE INDEX IF NOT EXISTS idx_expenses_subcategory ON expenses(subcategory);
+CREATE INDEX IF NOT EXISTS idx_expenses_payment_mode ON expenses(payment_mode);
+-- One row, bumped by every write: the data version behind storage_signature()
+CREATE TABLE IF NOT EXISTS ledger_version (version INTEGER NOT NULL);
+INSERT INTO ledger_version (version) SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM ledger_version);
+"""
+
+
+_sqlite_connections = threading.local()
+
+
+def sqlite_connect(db_file=None):
+    """This thread's connection to the SQLite database.
+    
+    Opened (and the tables and indexes created) once per thread and file, then
+    reused, so a query costs no connect or schema script. A database file that
+    was deleted or replaced since, a forked worker process, or a caller that
+    closed the connection gets a fresh one.
+    """
+    path = os.path.abspath(db_file or DB_FILE)
+    connections = getattr(_sqlite_connections, 'by_path', None)
+    if connections is None:
+        connections = _sqlite_connections.by_path = {}
+    
+    try:
+        owner = (os.getpid(), os.stat(path).st_ino)
+    except FileNotFoundError:
+        owner = None
+    cached = connections.get(path)
+    if cached is not None:
+        conn, cached_owner = cached
+        if owner is not None and owner == cached_owner and sqlite_is_open(conn):
+            return conn
+        if cached_owner[0] == os.getpid():
+            conn.close()
+    
+    conn = sqlite3.connect(path)
+    conn.executescript(SQLITE_SCHEMA)
+    connections[path] = (conn, (os.getpid(), os.stat(path).st_ino))
+    return conn
+
+
+def sqlite_is_open(conn):
+    """Whether the connection hasn't been closed"""
+    try:
+        conn.total_changes
+    except sqlite3.ProgrammingError:
+        return False
+    return True
+
+
+def sqlite_bump_version(conn):
+    """Count one more write (call inside the write's transaction)"""
+    conn.execute("UPDATE ledger_version SET version = version + 1")
+
+
+def sqlite_version(db_file=None):
+    """The database's write counter (0 if it doesn't exist yet)"""
+    if not os.path.exists(db_file or DB_FILE):
+        return 0
+    return sqlite_connect(db_file).execute("SELECT version FROM ledger_version").fetchone()[0]
+
+
+def sqlite_insert_rows(conn, expenses_list):
+    """Insert (or replace) expense dicts into the expenses table"""
+    rows = []
+    for expense in expenses_list:
+        row = []
+        for field in EXPENSE_FIELDS:
+            row.append(expense.get(field))
+        rows.append(row)
+    conn.executemany(
+        f"INSERT OR REPLACE INTO expenses ({', '.join(EXPENSE_FIELDS)}) "
+        f"VALUES ({', '.join(['?'] * len(EXPENSE_FIELDS))})",
+        rows
+    )
+
+
+class SqliteLedger:
+    """List-like view of the expenses table; filters narrow the WHERE clause instead of copying rows"""
+    
+    def __init__(self, db_file=None, clauses=(), params=()):
+        self.db_file = db_file or DB_FILE
+        self.clauses = tuple(clauses)
+        self.params = tuple(params)
+    
+    def _where(self):
+        if not self.clauses:
+            return ""
+        return " WHERE " + " AND ".join(self.clauses)
+    
+    def _fetch(self, select, tail=""):
+        conn = sqlite_connect(self.db_file)
+        return conn.execute(f"SELECT {select} FROM expenses{self._where()}{tail}", self.params).fetchall()
+    
+    def _stream(self, select, tail=""):
+        # Like _fetch, but yields rows off the cursor instead of fetching them all
+        conn = sqlite_connect(self.db_file)
+        yield from conn.execute(f"SELECT {select} FROM expenses{self._where()}{tail}", self.params)
+    
+    def _write(self, sql, params):
+        conn = sqlite_connect(self.db_file)
+        with conn:
+            rowcount = conn.execute(sql, params).rowcount
+            sqlite_bump_version(conn)
+            return rowcount
+    
+    def where(self, clause, *params):
+        """Return a narrower ledger with one more condition"""
+        return SqliteLedger(self.db_file, self.clauses + (clause,), self.params + params)
+    
+    def __iter__(self):
+        for row in self._stream(", ".join(EXPENSE_FIELDS), " ORDER BY seq"):
+            yield dict(zip(EXPENSE_FIELDS, row))
+    
+    def __len__(self):
+        return self._fetch("COUNT(*)")[0][0]
+    
+    def __bool__(self):
+        return len(self) > 0
+    
+    def copy(self):
+        """Materialize the matching rows as a plain list"""
+        return list(self)
+    
+    def aggregate(self, expression):
+        """Run a single aggregate (e.g. SUM(amount)) over the matching rows"""
+        return self._fetch(expression)[0][0]
+    
+    def filter_equals(self, column, value):
+        """Rows where a column equals a value"""
+        return self.where(f"{column} = ?", value)
+    
+    def filter_dates(self, start_date, end_date):
+        """Rows dated between start_date and end_date (inclusive)"""
+        return self.where("date BETWEEN ? AND ?", start_date, end_date)
+    
+    def group_totals(self, column):
+        """Sum amounts grouped by one aggregate_expenses group-by name"""
+        if column == 'month':
+            expressions = ["substr(date, 1, 7)"]
+        elif column == 'category_subcategory':
+            expressions = ["category", "subcategory"]
+        else:
+            expressions = [column]
+        keys = ", ".join(expressions)
+        
+        totals = {}
+        for row in self._fetch(f"{keys}, SUM(amount)", f" GROUP BY {keys} ORDER BY MIN(seq)"):
+            if len(expressions) == 1:
+                totals[row[0]] = row[-1]
+            else:
+                totals[tuple(row[:-1])] = row[-1]
+        return totals
+    
+    def summarize(self, measures, group_by):
+        """Measures and group-by totals (see aggregate_expenses)"""
+        total, count, max_amount, min_amount = self._fetch(
+            "COALESCE(SUM(amount), 0), COUNT(*), MAX(amount), MIN(amount)")[0]
+        groups = {}
+        for name in group_by:
+            groups[name] = self.group_totals(name)
+        return aggregate_result(measures, total, count, max_amount, min_amount, groups)
+    
+    def _order_by(self, keys, limit=None, offset=0):
+        order = []
+        for field, ascending in keys:
+            if field not in EXPENSE_FIELDS:
+                raise ValueError(f"Cannot sort by {field}")
+            order.append(f"{field} {'ASC' if ascending else 'DESC'}")
+        order.append("seq")
+        tail = " ORDER BY " + ", ".join(order)
+        if limit is not None:
+            tail = tail + f" LIMIT {int(limit)} OFFSET {int(offset)}"
+        return tail
+    
+    def sort_rows(self, keys, limit=None, offset=0):
+        """Rows ordered by (field, ascending) keys; ties keep insertion order"""
+        return [dict(zip(EXPENSE_FIELDS, row)) for row in self._fetch(", ".join(EXPENSE_FIELDS), self._order_by(keys, limit, offset))]
+    
+    def iter_sorted(self, keys, limit=None):
+        """Like sort_rows, but yields rows as the query produces them"""
+        for row in self._stream(", ".join(EXPENSE_FIELDS), self._order_by(keys, limit)):
+            yield dict(zip(EXPENSE_FIELDS, row))
+    
+    def top_rows(self, n):
+        """The n largest expenses"""
+        return self.sort_rows([('amount', False)], limit=n)
+    
+    def page(self, keys, offset, limit, category=None, search_term=""):
+        """(rows, match count, total) for one page of the sorted, filtered rows"""
+        if search_term:
+            # Match search_expenses exactly (Python's lower(), not SQLite's ASCII-only one);
+            # imported here because the helpers build on this module
+            from .analytics import paginate_expenses, search_expenses
+            return paginate_expenses(search_expenses(self, search_term), keys, offset, limit, category)
+        ledger = self if category is None else self.filter_equals('category', category)
+        total, count = ledger._fetch("COALESCE(SUM(amount), 0), COUNT(*)")[0]
+        return ledger.sort_rows(keys, limit, offset), count, total
+    
+    def get(self, expense_id):
+        """Fetch one expense by ID (or None)"""
+        rows = self.where("id = ?", expense_id)._fetch(", ".join(EXPENSE_FIELDS))
+        if rows:
+            return dict(zip(EXPENSE_FIELDS, rows[0]))
+        return None
+    
+    def append(self, expense):
+        """Insert a new expense"""
+        conn = sqlite_connect(self.db_file)
+        with conn:
+            sqlite_insert_rows(conn, [expense])
+            sqlite_bump_version(conn)
+    
+    def extend(self, expenses):
+        """Insert many expenses in one transaction"""
+        conn = sqlite_connect(self.db_file)
+        with conn:
+            sqlite_insert_rows(conn, expenses)
+            sqlite_bump_version(conn)
+    
+    def update(self, expense_id, fields):
+        """Update columns of one expense; returns False if the ID is unknown"""
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        return 0 < self._write(f"UPDATE expenses SET {assignments} WHERE id = ?", tuple(fields.values()) + (expense_id,))
+    
+    def delete(self, expense_id):
+        """Delete one expense; returns False if the ID is unknown"""
+        return 0 < self._write("DELETE FROM expenses WHERE id = ?", (expense_id,))
+
+
+def migrate_json_to_sqlite(json_file=None, db_file=None):
+    """One-shot migration: copy the JSON file (and journal tail) into an empty SQLite database"""
+    conn = sqlite_connect(db_file)
+    if conn.execute("SELECT COUNT(*) FROM expenses").fetchone()[0] > 0:
+        return 0
+    expenses_list = replay_journal(read_snapshot(json_file))
+    with conn:
+        sqlite_insert_rows(conn, expenses_list)
+        sqlite_bump_version(conn)
+    return len(expenses_list)
+
+
+def load_sqlite_storage():
+    """Open the SQLite ledger, migrating from the JSON file on first use"""
+    if not os.path.exists(DB_FILE):
+        migrate_json_to_sqlite()
+    return SqliteLedger()
+
+
+def save_sqlite_storage(expenses_list):
+    """Replace the table contents with the given expenses"""
+    if isinstance(expenses_list, SqliteLedger):
+        return
+    conn = sqlite_connect()
+    with conn:
+        conn.execute("DELETE FROM expenses")
+        sqlite_insert_rows(conn, expenses_list)
+        sqlite_bump_version(conn)
+
+
+# --- Month-partitioned backend ---------------------------------------------------
+
+# Closed-month archive codecs: file suffix, compress, decompress
+ARCHIVE_CODECS = {
+    "gzip": (".json.gz", gzip.compress, gzip.decompress),
+    "lzma": (".json.xz", lzma.compress, lzma.decompress),
+    "zlib": (".json.zz", zlib.compress, zlib.decompress)
+}
+
+
+def manifest_path(partition_dir=None):
+    return os.path.join(partition_dir or PARTITION_DIR, "manifest.json")
+
+
+def read_manifest(partition_dir=None):
+    """Month -> partition entry ({'file', 'count', 'min_id', 'max_id', 'archived', 'stats'}); empty without a manifest"""
+    path = manifest_path(partition_dir)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as file:
+        return json.load(file)['partitions']
+
+
+def write_manifest(manifest, partition_dir=None):
+    partitions = {}
+    for month in sorted(manifest):
+        partitions[month] = manifest[month]
+    write_json_file(manifest_path(partition_dir), {'version': 1, 'partitions': partitions})
+
+
+def partition_stats(expenses_list):
+    """Summary of one month: total, count, min/max amount and category / payment mode totals.
+    
+    Totals are added up in paise and stay ints when every amount behind them was an int.
+    """
+    total = [0, True]
+    max_amount = 0
+    min_amount = None
+    category_totals = {}
+    payment_totals = {}
+    for expense in expenses_list:
+        amount = expense['amount']
+        paise = round(amount * 100)
+        whole = isinstance(amount, int)
+        if amount > max_amount:
+            max_amount = amount
+        if min_amount is None or amount < min_amount:
+            min_amount = amount
+        for totals in (total, category_totals.setdefault(expense['category'], [0, True]),
+                       payment_totals.setdefault(expense['payment_mode'], [0, True])):
+            totals[0] = totals[0] + paise
+            totals[1] = totals[1] and whole
+    
+    for totals in (category_totals, payment_totals):
+        for key, (paise, whole) in totals.items():
+            totals[key] = paise_to_amount(paise, whole)
+    return {
+        'total': paise_to_amount(total[0], total[1]),
+        'count': len(expenses_list),
+        'min': min_amount,
+        'max': max_amount,
+        'category': category_totals,
+        'payment_mode': payment_totals
+    }
+
+
+def closed_month(month):
+    """True for months before the current one (they only change through edits to old entries)"""
+    return month < datetime.now().strftime('%Y-%m')
+
+
+def read_partition(entry, partition_dir=None):
+    """One month's expenses from its manifest entry (decompressing archived months)"""
+    path = os.path.join(partition_dir or PARTITION_DIR, entry['file'])
+    for suffix, compress, decompress in ARCHIVE_CODECS.values():
+        if path.endswith(suffix):
+            with open(path, 'rb') as file:
+                return json.loads(decompress(file.read()))
+    with open(path, 'r') as file:
+        return json.load(file)
+
+
+def write_partition(month, expenses_list, partition_dir=None):
+    """Write one month's expenses; returns its manifest entry.
+    
+    Closed months go to the compressed archive (ARCHIVE_FORMAT), the current
+    month stays plain JSON.
+    """
+    expenses_list = list(expenses_list)
+    partition_dir = partition_dir or PARTITION_DIR
+    archived = ARCHIVE_FORMAT is not None and closed_month(month)
+    if archived:
+        suffix, compress, decompress = ARCHIVE_CODECS[ARCHIVE_FORMAT]
+        path = os.path.join(partition_dir, month + suffix)
+        with atomic_write(path, 'wb') as file:
+            file.write(compress(json.dumps(expenses_list, separators=(',', ':')).encode('utf-8')))
+    else:
+        path = os.path.join(partition_dir, month + ".json")
+        write_json_file(path, expenses_list)
+    
+    ids = [expense['id'] for expense in expenses_list]
+    return {
+        'file': os.path.basename(path),
+        'count': len(ids),
+        'min_id': min(ids),
+        'max_id': max(ids),
+        'archived': archived,
+        'stats': partition_stats(expenses_list)
+    }
+
+
+def remove_partition_files(file_names, partition_dir=None):
+    for file_name in file_names:
+        path = os.path.join(partition_dir or PARTITION_DIR, file_name)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def split_by_month(expenses_list):
+    """YYYY-MM -> that month's expenses (in their original order)"""
+    months = {}
+    for expense in expenses_list:
+        month = expense['date'][:7]
+        if month not in months:
+            months[month] = []
+        months[month].append(expense)
+    return months
+
+
+def save_partitioned_storage(expenses_list):
+    """Write changed partitions (a PartitionedLedger) or rewrite every partition from a list"""
+    # Imported here because the ledger classes build on this module
+    from .store import PartitionedLedger
+    if isinstance(expenses_list, PartitionedLedger):
+        expenses_list.flush()
+        return
+    
+    os.makedirs(PARTITION_DIR, exist_ok=True)
+    old_manifest = read_manifest()
+    manifest = {}
+    for month, month_expenses in split_by_month(expenses_list).items():
+        manifest[month] = write_partition(month, month_expenses)
+    # The manifest is written last, so a crash part-way leaves the old one pointing at whole files
+    write_manifest(manifest)
+    kept = set(entry['file'] for entry in manifest.values())
+    remove_partition_files([entry['file'] for entry in old_manifest.values() if entry['file'] not in kept])
+
+
+def archive_closed_months(partition_dir=None):
+    """Move closed months still kept as plain JSON into the compressed archive; returns those months"""
+    if ARCHIVE_FORMAT is None:
+        return []
+    with lock_storage():
+        manifest = read_manifest(partition_dir)
+        archived = []
+        old_files = []
+        for month, entry in manifest.items():
+            if closed_month(month) and not entry.get('archived'):
+                manifest[month] = write_partition(month, read_partition(entry, partition_dir), partition_dir)
+                archived.append(month)
+                old_files.append(entry['file'])
+        if archived:
+            write_manifest(manifest, partition_dir)
+            remove_partition_files(old_files, partition_dir)
+        return archived
+
+
+def migrate_json_to_partitions(json_file=None):
+    """One-shot migration: split the JSON file (and journal tail) into month partitions"""
+    with lock_storage():
+        if os.path.exists(manifest_path()):
+            return 0
+        expenses_list = replay_journal(read_snapshot(json_file))
+        save_partitioned_storage(expenses_list)
+        return len(expenses_list)
+
+
+def load_partitioned_storage():
+    """Open the partitioned ledger (only the manifest is read), migrating from the JSON file on first use.
+    
+    Months that closed since the last start are archived first.
+    """
+    if not os.path.exists(manifest_path()):
+        migrate_json_to_partitions()
+    archive_closed_months()
+    from .store import PartitionedLedger
+    return PartitionedLedger()
+
+
+# --- Binary record backend --------------------------------------------------------
+
+def read_binary_data():
+    """Raw contents of the binary file (None if there are no expenses yet), converting the JSON file on first use"""
+    if not os.path.exists(BINARY_FILE):
+        migrate_json_to_binary()
+    if not os.path.exists(BINARY_FILE):
+        return None
+    with open(BINARY_FILE, 'rb') as file:
+        return file.read()
+
+
+def read_binary_storage():
+    """Load expenses from the binary file"""
+    data = read_binary_data()
+    if data is None:
+        return []
+    return decode_expenses(data)
+
+
+def write_binary_storage(expenses_list):
+    """Write every expense as binary records"""
+    with atomic_write(BINARY_FILE, 'wb') as file:
+        file.write(encode_expenses(expenses_list))
+
+
+def migrate_json_to_binary(json_file=None):
+    """One-shot migration: convert the JSON file (and journal tail) to the binary file"""
+    with lock_storage():
+        if os.path.exists(BINARY_FILE) or not os.path.exists(json_file or DATA_FILE):
+            return 0
+        expenses_list = replay_journal(read_snapshot(json_file))
+        write_binary_storage(expenses_list)
+        return len(expenses_list)
+
+
+# --- Backend registry ------------------------------------------------------------
+
+# Each backend: load() -> expenses, save(list) full write, record(op, expense) per
+# change (or None), record_many(op, expenses) per batch of changes (or None),
+# persist(list) after a change
+STORAGE_BACKENDS = {
+    "json": {
+        "load": read_snapshot,
+        "save": write_snapshot,
+        "record": None,
+        "record_many": None,
+        "persist": write_snapshot
+    },
+    "journal": {
+        "load": load_journal_storage,
+        "save": compact_journal,
+        "record": record_journal_change,
+        "record_many": record_journal_changes,
+        "persist": persist_journal
+    },
+    "sqlite": {
+        "load": load_sqlite_storage,
+        "save": save_sqlite_storage,
+        "record": None,
+        "record_many": None,
+        "persist": save_sqlite_storage
+    },
+    "partitioned": {
+        "load": load_partitioned_storage,
+        "save": save_partitioned_storage,
+        "record": None,
+        "record_many": None,
+        "persist": save_partitioned_storage
+    },
+    "binary": {
+        "load": read_binary_storage,
+        "save": write_binary_storage,
+        "record": None,
+        "record_many": None,
+        "persist": write_binary_storage
+    }
+}
+
+
+def load_expenses():
+    """Load expenses using the configured storage backend"""
+    return STORAGE_BACKENDS[STORAGE_MODE]["load"]()
+
+
+def read_storage_dir(directory, storage_mode):
+    """Expenses from the app's data files in another directory, read the way
+    storage_mode would load them but without writing anything.
+    
+    Unlike load_expenses() this never migrates, archives, compacts or repairs
+    the journal, and leaves the storage settings alone. A mode whose own
+    files don't exist yet reads the JSON snapshot plus journal it would
+    migrate from.
+    """
+    def data_path(name):
+        return os.path.join(directory, os.path.basename(name))
+    
+    partition_dir = data_path(PARTITION_DIR)
+    if storage_mode == "sqlite" and os.path.exists(data_path(DB_FILE)):
+        return SqliteLedger(data_path(DB_FILE))
+    if storage_mode == "partitioned" and os.path.exists(manifest_path(partition_dir)):
+        from .store import PartitionedLedger
+        return PartitionedLedger(partition_dir)
+    if storage_mode == "binary" and os.path.exists(data_path(BINARY_FILE)):
+        from .mapped import MappedLedger
+        return MappedLedger(data_path(BINARY_FILE))
+    
+    expenses_list = read_snapshot(data_path(DATA_FILE), strict=True)
+    if storage_mode == "json":
+        return expenses_list
+    return replay_journal(expenses_list, data_path(JOURNAL_FILE), repair=False)
+
+
+def load_expenses_versioned():
+    """Load expenses together with the data version they were read at"""
+    with lock_storage():
+        return load_expenses(), storage_signature()
+
+
+def save_expenses(expenses_list, base_version=None):
+    """Save all expenses using the configured storage backend.
+    
+    Pass the version from load_expenses_versioned() as base_version to refuse
+    overwriting changes another process made in the meantime.
+    """
+    with lock_storage():
+        if base_version is not None and storage_signature() != base_version:
+            raise StaleDataError("Expenses changed on disk since they were loaded")
+        STORAGE_BACKENDS[STORAGE_MODE]["save"](expenses_list)
+
+
+def record_change(op, expense):
+    """Record a single add/update/delete (for backends that log changes)"""
+    record = STORAGE_BACKENDS[STORAGE_MODE]["record"]
+    if record is not None:
+        with lock_storage():
+            record(op, expense)
+
+
+def record_changes(op, expenses):
+    """Record a batch of adds/updates/deletes with one write (for backends that log changes)"""
+    record_many = STORAGE_BACKENDS[STORAGE_MODE]["record_many"]
+    if record_many is not None:
+        with lock_storage():
+            record_many(op, expenses)
+
+
+def persist_expenses(expenses_list):
+    """Persist after a single change"""
+    with lock_storage():
+        STORAGE_BACKENDS[STORAGE_MODE]["persist"](expenses_list)
+
+
+def storage_signature():
+    """(path, mtime_ns, size) of the files behind the current storage mode, to spot outside changes
+    ((path, write counter) for SQLite, whose file times don't track every commit)"""
+    if STORAGE_MODE == "sqlite":
+        return ((DB_FILE, sqlite_version()),)
+    if STORAGE_MODE == "json":
+        files = [DATA_FILE]
+    elif STORAGE_MODE == "journal":
+        files = [DATA_FILE, JOURNAL_FILE]
+    elif STORAGE_MODE == "partitioned":
+        # Every flush rewrites the manifest
+        files = [manifest_path()]
+    else:
+        files = [BINARY_FILE]
+    
+    signature = []
+    for path in files:
+        if os.path.exists(path):
+            stat = os.stat(path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        else:
+            signature.append((path, 0, 0))
+    return tuple(signature)
@@ -0,0 +1,1120 @@
+"""
+Columnar in-memory expense store with incremental indexes and aggregates,
+and the month-partitioned ledger built from one store per month
+"""
+
+import calendar
+import os
+import threading
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+from datetime import datetime
+
+from . import storage, vectorized
+from .mapped import MappedLedger
+from .model import CATEGORIES, PAYMENT_MODES, aggregate_result, all_subcategories, paise_to_amount
+from .records import FLAG_INT_AMOUNT, FLAG_NO_DESCRIPTION, RECORD, read_header
+from .storage import (
+    SqliteLedger,
+    load_expenses_versioned,
+    lock_storage,
+    read_binary_data,
+    read_manifest,
+    read_partition,
+    remove_partition_files,
+    split_by_month,
+    write_manifest,
+    write_partition
+)
+
+VIEW_BATCH_ROWS = 1000  # rows a StoreView builds per lock hold while streaming
+PARTITION_CACHE_ROWS = 250000  # rows of loaded month partitions kept in memory before evicting
+# Group-bys the per-month manifest stats can answer (see storage.partition_stats)
+PARTITION_STATS_GROUPS = ('category', 'payment_mode', 'month')
+
+class CodeTable:
+    """Maps repeated strings (categories, payment modes) to small integer codes"""
+    
+    def __init__(self, values=()):
+        self.values = []
+        self.codes = {}
+        for value in values:
+            self.encode(value)
+    
+    def encode(self, value):
+        """Code for a value, adding it to the table if new"""
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+    
+    def lookup(self, value):
+        """Code for a value, or -1 if it was never stored"""
+        return self.codes.get(value, -1)
+
+
+def timestamp_to_seconds(text):
+    """'YYYY-MM-DD HH:MM:SS' -> seconds since 0001-01-01 (-1 for missing)"""
+    if not text:
+        return -1
+    parsed = datetime.strptime(text, '%Y-%m-%d %H:%M:%S')
+    return parsed.toordinal() * 86400 + parsed.hour * 3600 + parsed.minute * 60 + parsed.second
+
+
+def trigrams(text):
+    """All 3-character substrings of a text"""
+    grams = set()
+    for i in range(len(text) - 2):
+        grams.add(text[i:i + 3])
+    return grams
+
+
+class TextIndex:
+    """Substring search index: lowercase text -> row slots, plus trigram -> texts.
+    
+    Rows repeat the same few category/subcategory names and many descriptions,
+    so the trigram postings point at distinct texts and each text keeps the
+    slots of the rows that use it.
+    """
+    
+    def __init__(self):
+        self.slots = {}
+        self.grams = {}
+    
+    def add(self, text, slot):
+        slots = self.slots.get(text)
+        if slots is None:
+            slots = set()
+            self.slots[text] = slots
+            for gram in trigrams(text):
+                if gram not in self.grams:
+                    self.grams[gram] = set()
+                self.grams[gram].add(text)
+        slots.add(slot)
+    
+    def remove(self, text, slot):
+        slots = self.slots[text]
+        slots.discard(slot)
+        if not slots:
+            del self.slots[text]
+            for gram in trigrams(text):
+                texts = self.grams[gram]
+                texts.discard(text)
+                if not texts:
+                    del self.grams[gram]
+    
+    def search(self, term):
+        """Slots of rows with a text containing term (already lowercase)"""
+        if len(term) < 3:
+            candidates = self.slots.keys()
+        else:
+            postings = []
+            for gram in trigrams(term):
+                texts = self.grams.get(gram)
+                if texts is None:
+                    return set()
+                postings.append(texts)
+            postings.sort(key=len)
+            candidates = set(postings[0])
+            for texts in postings[1:]:
+                candidates &= texts
+        
+        found = set()
+        for text in candidates:
+            # Trigrams only narrow the candidates; confirm the real substring
+            if term in text:
+                found |= self.slots[text]
+        return found
+
+
+# Group-bys the store materializes (see aggregate_expenses)
+STORE_GROUPS = ('category', 'subcategory', 'category_subcategory', 'payment_mode', 'date', 'month')
+
+
+class ExpenseStore:
+    """Columnar in-memory expenses: one compact array per field instead of one dict per row.
+    
+    Amounts are kept as integer paise (with a flag for whole-rupee int
+    amounts, so they come back as ints), dates as ordinal days and category,
+    subcategory and payment mode as small-int codes. Iterating yields plain
+    expense dicts, so the store can stand in for the usual expenses list.
+    
+    Each row lives in a fixed slot. Deleting only marks the slot dead
+    (a tombstone), so ID lookups, edits and deletes are O(1) and iteration
+    order never changes; dead slots are squeezed out once they outnumber
+    the live ones.
+    """
+    
+    def __init__(self, expenses_list=()):
+        self._ids = array('q')
+        self._dates = array('i')
+        self._paise = array('q')
+        # 1 where the amount was an int (e.g. 60, not 60.0)
+        self._whole = array('b')
+        self._categories = array('H')
+        self._subcategories = array('H')
+        self._payment_modes = array('H')
+        self._created = array('q')
+        self._updated = array('q')
+        self._descriptions = []
+        self._live = bytearray()
+        self._dead = 0
+        # Expense ID -> slot
+        self._slots = {}
+        self.category_codes = CodeTable(CATEGORIES.keys())
+        self.subcategory_codes = CodeTable(all_subcategories())
+        self.payment_codes = CodeTable(PAYMENT_MODES)
+        self._date_text = {}
+        # Bumped on every change; cached sort orders are only valid for one version
+        self.version = 0
+        self._sort_cache = {}
+        self._sort_version = 0
+        # Live amount index: sorted (-paise, slot) pairs, built on first use
+        self._amount_index = None
+        # Live date index: ordinal days in sorted order with the matching row
+        # slots (ties in slot order), built on first use
+        self._date_keys = None
+        self._date_positions = None
+        # Search index over lowercase description/category/subcategory, built on first search
+        self._text_index = None
+        # Materialized aggregates: grand total and per-group [paise, rows, non-int rows],
+        # kept current on every change so whole-store totals are O(1) to read
+        self._total_paise = 0
+        self._float_rows = 0
+        self._group_paise = {}
+        for name in STORE_GROUPS:
+            self._group_paise[name] = {}
+        for expense in expenses_list:
+            self.append(expense)
+    
+    @classmethod
+    def from_records(cls, data):
+        """Store filled straight from binary records (see records.py), with no expense dicts in between"""
+        store = cls()
+        count, tables, records_offset, heap_offset = read_header(data)
+        view = memoryview(data)
+        heap = view[heap_offset:]
+        # File codes -> this store's codes (the same numbers for names the model lists)
+        categories = [store.category_codes.encode(name) for name in tables['category']]
+        subcategories = [store.subcategory_codes.encode(name) for name in tables['subcategory']]
+        payment_modes = [store.payment_codes.encode(name) for name in tables['payment_mode']]
+        
+        for (expense_id, day, amount, created, updated, offset, length,
+             category, subcategory, payment_mode, flags) in RECORD.iter_unpack(view[records_offset:heap_offset]):
+            store._ids.append(expense_id)
+            store._dates.append(day)
+            store._paise.append(round(amount * 100))
+            store._whole.append(1 if flags & FLAG_INT_AMOUNT else 0)
+            store._categories.append(categories[category])
+            store._subcategories.append(subcategories[subcategory])
+            store._payment_modes.append(payment_modes[payment_mode])
+            store._created.append(created)
+            store._updated.append(updated)
+            if flags & FLAG_NO_DESCRIPTION:
+                store._descriptions.append(None)
+            else:
+                store._descriptions.append(str(heap[offset:offset + length], 'utf-8'))
+        
+        store._live = bytearray(b'\x01' * count)
+        for i in range(count):
+            store._slots[store._ids[i]] = i
+            store._count_row(i, 1)
+        store.version += 1
+        return store
+    
+    # --- encoding -------------------------------------------------------------
+    
+    def _date_string(self, ordinal):
+        text = self._date_text.get(ordinal)
+        if text is None:
+            text = datetime.fromordinal(ordinal).date().isoformat()
+            self._date_text[ordinal] = text
+        return text
+    
+    def _timestamp_string(self, seconds):
+        if seconds < 0:
+            return None
+        day, rest = divmod(seconds, 86400)
+        return f"{self._date_string(day)} {rest // 3600:02d}:{rest // 60 % 60:02d}:{rest % 60:02d}"
+    
+    def _columns(self, column):
+        if column == 'category':
+            return self._categories, self.category_codes
+        if column == 'subcategory':
+            return self._subcategories, self.subcategory_codes
+        return self._payment_modes, self.payment_codes
+    
+    def _count_row(self, i, sign):
+        """Add (sign=1) or remove (sign=-1) row i from the materialized aggregates"""
+        amount = sign * self._paise[i]
+        fraction = 0 if self._whole[i] else sign
+        self._total_paise = self._total_paise + amount
+        self._float_rows = self._float_rows + fraction
+        category = self._categories[i]
+        subcategory = self._subcategories[i]
+        keys = (category, subcategory, category * 65536 + subcategory, self._payment_modes[i],
+                self._dates[i], self._date_string(self._dates[i])[:7])
+        for name, key in zip(STORE_GROUPS, keys):
+            totals = self._group_paise[name]
+            entry = totals.get(key)
+            if entry is None:
+                entry = [0, 0, 0]
+                totals[key] = entry
+            entry[0] = entry[0] + amount
+            entry[1] = entry[1] + sign
+            entry[2] = entry[2] + fraction
+            if entry[1] == 0:
+                del totals[key]
+    
+    def _row_texts(self, i):
+        """Distinct lowercase texts a search can match for row i"""
+        description = self._descriptions[i]
+        return {
+            description.lower() if description else "",
+            self.category_codes.values[self._categories[i]].lower(),
+            self.subcategory_codes.values[self._subcategories[i]].lower()
+        }
+    
+    def _set(self, i, expense):
+        self._dates[i] = datetime.fromisoformat(expense['date']).toordinal()
+        self._paise[i] = round(expense['amount'] * 100)
+        self._whole[i] = 1 if isinstance(expense['amount'], int) else 0
+        self._categories[i] = self.category_codes.encode(expense['category'])
+        self._subcategories[i] = self.subcategory_codes.encode(expense['subcategory'])
+        self._payment_modes[i] = self.payment_codes.encode(expense['payment_mode'])
+        self._descriptions[i] = expense['description']
+        self._updated[i] = timestamp_to_seconds(expense.get('updated_at'))
+    
+    # --- list-like access -------------------------------------------------------
+    
+    def __len__(self):
+        return len(self._ids) - self._dead
+    
+    def __iter__(self):
+        for i in self.live_slots():
+            yield self.row(i)
+    
+    def __getitem__(self, index):
+        slots = self.live_slots()
+        if isinstance(index, slice):
+            return [self.row(i) for i in slots[index]]
+        return self.row(slots[index])
+    
+    def live_slots(self):
+        """Slots of all live rows, in insertion order"""
+        if self._dead == 0:
+            return range(len(self._ids))
+        live = self._live
+        return [i for i in range(len(live)) if live[i]]
+    
+    def copy(self):
+        """Materialize all rows as a plain list"""
+        return list(self)
+    
+    def row(self, i):
+        """Expense dict for the row in slot i"""
+        return {
+            'id': self._ids[i],
+            'date': self._date_string(self._dates[i]),
+            'category': self.category_codes.values[self._categories[i]],
+            'subcategory': self.subcategory_codes.values[self._subcategories[i]],
+            'description': self._descriptions[i],
+            'amount': self.amount(i),
+            'payment_mode': self.payment_codes.values[self._payment_modes[i]],
+            'created_at': self._timestamp_string(self._created[i]),
+            'updated_at': self._timestamp_string(self._updated[i])
+        }
+    
+    def amount(self, i):
+        """Amount of the row in slot i (an int if it was stored as one)"""
+        return paise_to_amount(self._paise[i], self._whole[i])
+    
+    def rows(self, positions):
+        """Expense dicts for a list of slots"""
+        return [self.row(i) for i in positions]
+    
+    def position(self, expense_id):
+        """Slot of an expense ID (-1 if missing)"""
+        return self._slots.get(expense_id, -1)
+    
+    # --- mutations ----------------------------------------------------------------
+    
+    def append(self, expense):
+        """Add a new expense"""
+        self._ids.append(expense['id'])
+        self._dates.append(0)
+        self._paise.append(0)
+        self._whole.append(0)
+        self._categories.append(0)
+        self._subcategories.append(0)
+        self._payment_modes.append(0)
+        self._created.append(timestamp_to_seconds(expense.get('created_at')))
+        self._updated.append(0)
+        self._descriptions.append(None)
+        self._live.append(1)
+        i = len(self._ids) - 1
+        self._slots[expense['id']] = i
+        self._set(i, expense)
+        self._count_row(i, 1)
+        if self._amount_index is not None:
+            insort(self._amount_index, (-self._paise[i], i))
+        if self._date_keys is not None:
+            self._index_date(i)
+        if self._text_index is not None:
+            for text in self._row_texts(i):
+                self._text_index.add(text, i)
+        self.version += 1
+    
+    def extend(self, expenses):
+        """Add many expenses at once.
+        
+        Big batches drop the lazily built indexes (they are rebuilt on next use)
+        rather than inserting into them one row at a time.
+        """
+        expenses = list(expenses)
+        if len(expenses) > 16:
+            self._amount_index = None
+            self._date_keys = None
+            self._date_positions = None
+            self._text_index = None
+        for expense in expenses:
+            self.append(expense)
+    
+    def get(self, expense_id):
+        """Expense dict by ID (or None)"""
+        i = self.position(expense_id)
+        if i < 0:
+            return None
+        return self.row(i)
+    
+    def update(self, expense_id, fields):
+        """Overwrite fields of one expense; returns False if the ID is unknown"""
+        i = self.position(expense_id)
+        if i < 0:
+            return False
+        expense = self.row(i)
+        expense.update(fields)
+        old_paise = self._paise[i]
+        old_date = self._dates[i]
+        if self._text_index is not None:
+            for text in self._row_texts(i):
+                self._text_index.remove(text, i)
+        self._count_row(i, -1)
+        self._set(i, expense)
+        self._count_row(i, 1)
+        if self._text_index is not None:
+            for text in self._row_texts(i):
+                self._text_index.add(text, i)
+        if self._amount_index is not None and old_paise != self._paise[i]:
+            self._amount_index.pop(bisect_left(self._amount_index, (-old_paise, i)))
+            insort(self._amount_index, (-self._paise[i], i))
+        if self._date_keys is not None and old_date != self._dates[i]:
+            self._unindex_date(old_date, i)
+            self._index_date(i)
+        self.version += 1
+        return True
+    
+    def delete(self, expense_id):
+        """Remove one expense (tombstone its slot); returns False if the ID is unknown"""
+        i = self.position(expense_id)
+        if i < 0:
+            return False
+        self._count_row(i, -1)
+        if self._date_keys is not None:
+            self._unindex_date(self._dates[i], i)
+        if self._amount_index is not None:
+            self._amount_index.pop(bisect_left(self._amount_index, (-self._paise[i], i)))
+        if self._text_index is not None:
+            for text in self._row_texts(i):
+                self._text_index.remove(text, i)
+        del self._slots[expense_id]
+        self._live[i] = 0
+        self._descriptions[i] = None
+        self._dead = self._dead + 1
+        self.version += 1
+        if self._dead > 64 and self._dead > len(self):
+            self._compact()
+        return True
+    
+    def _compact(self):
+        """Squeeze out dead slots (row order is kept; slot-based indexes are rebuilt lazily)"""
+        slots = self.live_slots()
+        self._ids = array('q', [self._ids[i] for i in slots])
+        self._dates = array('i', [self._dates[i] for i in slots])
+        self._paise = array('q', [self._paise[i] for i in slots])
+        self._whole = array('b', [self._whole[i] for i in slots])
+        self._categories = array('H', [self._categories[i] for i in slots])
+        self._subcategories = array('H', [self._subcategories[i] for i in slots])
+        self._payment_modes = array('H', [self._payment_modes[i] for i in slots])
+        self._created = array('q', [self._created[i] for i in slots])
+        self._updated = array('q', [self._updated[i] for i in slots])
+        self._descriptions = [self._descriptions[i] for i in slots]
+        self._live = bytearray(b'\x01' * len(self._ids))
+        self._dead = 0
+        self._slots = {}
+        for i in range(len(self._ids)):
+            self._slots[self._ids[i]] = i
+        self._amount_index = None
+        self._date_keys = None
+        self._date_positions = None
+        self._text_index = None
+        self._sort_cache = {}
+    
+    # --- columnar queries ---------------------------------------------------------
+    
+    def positions_equal(self, column, value):
+        """Slots where category / subcategory / payment_mode equals value"""
+        codes, table = self._columns(column)
+        code = table.lookup(value)
+        live = self._live
+        return [i for i in range(len(codes)) if codes[i] == code and live[i]]
+    
+    def _dates_sorted(self):
+        if self._date_keys is None:
+            dates = self._dates
+            positions = sorted(self.live_slots(), key=dates.__getitem__)
+            self._date_positions = array('i', positions)
+            self._date_keys = array('i', [dates[i] for i in positions])
+        return self._date_keys
+    
+    def _index_date(self, i):
+        """Insert row i into the date index, after earlier rows with the same date"""
+        keys = self._date_keys
+        positions = self._date_positions
+        ordinal = self._dates[i]
+        j = bisect_left(keys, ordinal)
+        end = bisect_right(keys, ordinal, j)
+        while j < end and positions[j] < i:
+            j = j + 1
+        keys.insert(j, ordinal)
+        positions.insert(j, i)
+    
+    def _unindex_date(self, ordinal, i):
+        """Remove row i (indexed under ordinal) from the date index"""
+        keys = self._date_keys
+        positions = self._date_positions
+        j = bisect_left(keys, ordinal)
+        while positions[j] != i:
+            j = j + 1
+        del keys[j]
+        del positions[j]
+    
+    def positions_between(self, start_date, end_date):
+        """Slots dated between start_date and end_date (inclusive), in date order.
+        
+        Two bisects on the date index: O(log n + k).
+        """
+        start = datetime.fromisoformat(start_date).toordinal()
+        end = datetime.fromisoformat(end_date).toordinal()
+        keys = self._dates_sorted()
+        return self._date_positions[bisect_left(keys, start):bisect_right(keys, end)]
+    
+    def search_positions(self, search_term):
+        """Slots (in insertion order) whose description, category or subcategory contains the term"""
+        if self._text_index is None:
+            self._text_index = TextIndex()
+            for i in self.live_slots():
+                for text in self._row_texts(i):
+                    self._text_index.add(text, i)
+        return sorted(self._text_index.search(search_term.lower()))
+    
+    def search(self, search_term):
+        return self.rows(self.search_positions(search_term))
+    
+    def filter_equals(self, column, value):
+        return self.rows(self.positions_equal(column, value))
+    
+    def filter_dates(self, start_date, end_date):
+        return self.rows(self.positions_between(start_date, end_date))
+    
+    def _amounts_sorted(self):
+        if self._amount_index is None:
+            paise = self._paise
+            self._amount_index = sorted((-paise[i], i) for i in self.live_slots())
+        return self._amount_index
+    
+    def top_positions(self, n):
+        """Slots of the n largest expenses (ties in insertion order)"""
+        return [position for key, position in self._amounts_sorted()[:n]]
+    
+    def top_rows(self, n):
+        """The n largest expenses"""
+        return self.rows(self.top_positions(n))
+    
+    def max_amount(self):
+        """Largest amount (the first such row's, as find_max_expense would return it)"""
+        if len(self) == 0:
+            return 0
+        if self._amount_index is None and len(self) >= vectorized.VECTORIZE_MIN_ROWS and vectorized.available():
+            return self.amount(vectorized.live_extremes(self._paise, self._live)[0])
+        return self.amount(self._amounts_sorted()[0][1])
+    
+    def min_amount(self):
+        """Smallest amount (the first such row's)"""
+        if len(self) == 0:
+            return 0
+        if self._amount_index is None and len(self) >= vectorized.VECTORIZE_MIN_ROWS and vectorized.available():
+            return self.amount(vectorized.live_extremes(self._paise, self._live)[1])
+        index = self._amounts_sorted()
+        # Ties sort by slot, so step back to the first row with the smallest amount
+        return self.amount(index[bisect_left(index, (index[-1][0], -1))][1])
+    
+    def _sort_key(self, field):
+        if field == 'date':
+            return self._dates.__getitem__
+        if field == 'amount':
+            return self._paise.__getitem__
+        if field == 'id':
+            return self._ids.__getitem__
+        if field in ('category', 'subcategory', 'payment_mode'):
+            codes, table = self._columns(field)
+            return lambda i: table.values[codes[i]]
+        if field == 'description':
+            return lambda i: self._descriptions[i] or ""
+        raise ValueError(f"Cannot sort by {field}")
+    
+    def sorted_positions(self, keys):
+        """Live slots ordered by (field, ascending) keys, cached until the data changes"""
+        if self._sort_version != self.version:
+            self._sort_cache = {}
+            self._sort_version = self.version
+        keys = tuple(keys)
+        order = self._sort_cache.get(keys)
+        if order is None:
+            positions = list(self.live_slots())
+            # Stable sort per key, least significant first
+            for field, ascending in reversed(keys):
+                positions.sort(key=self._sort_key(field), reverse=not ascending)
+            order = array('i', positions)
+            self._sort_cache[keys] = order
+        return order
+    
+    def sort_rows(self, keys):
+        """Rows ordered by (field, ascending) keys; ties keep insertion order"""
+        return self.rows(self.sorted_positions(keys))
+    
+    def iter_sorted(self, keys, limit=None):
+        """Like sort_rows, but yields rows one at a time (at most limit)"""
+        for i in self.sorted_positions(keys)[:limit]:
+            yield self.row(i)
+    
+    def page(self, keys, offset, limit, category=None, search_term=""):
+        """(rows, match count, total) for one page of the sorted, filtered rows.
+        
+        The filters and sort order cover every row; only the requested slice
+        is turned into expense dicts.
+        """
+        order = self.sorted_positions(keys)
+        keep = None
+        if search_term:
+            keep = set(self.search_positions(search_term))
+        if category is not None:
+            matches = self.positions_equal('category', category)
+            keep = set(matches) if keep is None else keep.intersection(matches)
+        
+        if keep is None:
+            total = paise_to_amount(self._total_paise, self._float_rows == 0)
+        else:
+            order = [i for i in order if i in keep]
+            paise = self._paise
+            whole = self._whole
+            total = paise_to_amount(sum(paise[i] for i in order), all(whole[i] for i in order))
+        return self.rows(order[offset:offset + limit]), len(order), total
+    
+    def _group_label(self, name, key):
+        if name == 'date':
+            return self._date_string(key)
+        if name == 'month':
+            return key
+        if name == 'category_subcategory':
+            category_code, subcategory_code = divmod(key, 65536)
+            return (self.category_codes.values[category_code], self.subcategory_codes.values[subcategory_code])
+        return self._columns(name)[1].values[key]
+    
+    def summarize(self, measures, group_by):
+        """Measures and group-by totals read from the materialized aggregates (see aggregate_expenses)"""
+        groups = {}
+        for name in group_by:
+            decoded = {}
+            for key, entry in self._group_paise[name].items():
+                decoded[self._group_label(name, key)] = paise_to_amount(entry[0], entry[2] == 0)
+            groups[name] = decoded
+        
+        max_amount = self.max_amount() if 'max' in measures else 0
+        min_amount = self.min_amount() if 'min' in measures else 0
+        total = paise_to_amount(self._total_paise, self._float_rows == 0)
+        return aggregate_result(measures, total, len(self), max_amount, min_amount, groups)
+
+
+class StoreView:
+    """Read-only view of a shared ExpenseStore; every read holds the shared lock"""
+    
+    def __init__(self, store, lock):
+        self._store = store
+        self._lock = lock
+    
+    def __getattr__(self, name):
+        if name in ('append', 'extend', 'update', 'delete'):
+            raise AttributeError(f"Read-only view: {name} expenses through the SharedLedger")
+        attribute = getattr(self._store, name)
+        if not callable(attribute):
+            return attribute
+        
+        def locked(*args, **kwargs):
+            with self._lock:
+                return attribute(*args, **kwargs)
+        return locked
+    
+    def __len__(self):
+        with self._lock:
+            return len(self._store)
+    
+    def __iter__(self):
+        with self._lock:
+            ids = array('q', [self._store._ids[i] for i in self._store.live_slots()])
+        return self._iter_ids(ids)
+    
+    def iter_sorted(self, keys, limit=None):
+        """Rows ordered by (field, ascending) keys, yielded in batches (at most limit)"""
+        with self._lock:
+            ids = array('q', [self._store._ids[i] for i in self._store.sorted_positions(keys)[:limit]])
+        return self._iter_ids(ids)
+    
+    def _iter_ids(self, ids):
+        # Only the ids are snapshotted; rows are built a batch at a time under
+        # the lock so streaming a big ledger never holds every dict at once.
+        # Rows deleted mid-way are skipped, rows added mid-way are left out.
+        store = self._store
+        for start in range(0, len(ids), VIEW_BATCH_ROWS):
+            with self._lock:
+                rows = []
+                for expense_id in ids[start:start + VIEW_BATCH_ROWS]:
+                    i = store.position(expense_id)
+                    if i >= 0:
+                        rows.append(store.row(i))
+            yield from rows
+    
+    def __getitem__(self, index):
+        with self._lock:
+            return self._store[index]
+    
+    def copy(self):
+        return list(self)
+
+
+class PartitionCache:
+    """Month partitions of one partition directory, loaded as ExpenseStores on first use.
+    
+    Loaded months are kept least recently used first; once they hold more than
+    PARTITION_CACHE_ROWS rows the oldest-used are dropped. The current month
+    and months with unsaved changes are never dropped.
+    """
+    
+    def __init__(self, partition_dir=None):
+        self.partition_dir = partition_dir or storage.PARTITION_DIR
+        self.manifest = read_manifest(self.partition_dir)
+        self.stores = OrderedDict()
+        self.dirty = set()
+        self.lock = threading.RLock()
+    
+    def months(self):
+        """Every month with expenses (saved or not yet flushed), oldest first"""
+        return sorted(set(self.manifest).union(self.stores))
+    
+    def store(self, month, create=False):
+        """ExpenseStore for a month (None if it has no expenses, unless create)"""
+        store = self.stores.get(month)
+        if store is not None:
+            self.stores.move_to_end(month)
+            return store
+        if month in self.manifest:
+            store = ExpenseStore(read_partition(self.manifest[month], self.partition_dir))
+        elif create:
+            store = ExpenseStore()
+        else:
+            return None
+        self.stores[month] = store
+        self._evict(month)
+        return store
+    
+    def _evict(self, keep):
+        rows = 0
+        for store in self.stores.values():
+            rows = rows + len(store)
+        current = datetime.now().strftime('%Y-%m')
+        for month in list(self.stores):
+            if rows <= PARTITION_CACHE_ROWS:
+                break
+            if month not in (keep, current) and month not in self.dirty:
+                rows = rows - len(self.stores.pop(month))
+    
+    def count(self, month):
+        """Rows in a month without loading it"""
+        store = self.stores.get(month)
+        if store is not None:
+            return len(store)
+        return self.manifest.get(month, {}).get('count', 0)
+    
+    def stats(self, month):
+        """Saved summary stats of a month that isn't loaded (None if it is, or has none)"""
+        if month in self.stores:
+            return None
+        return self.manifest.get(month, {}).get('stats')
+    
+    def locate(self, expense_id):
+        """(month, store) holding an expense ID, or (None, None).
+        
+        Loaded months are checked first; otherwise only months whose manifest
+        ID range covers the ID are loaded.
+        """
+        for month, store in list(self.stores.items()):
+            if store.position(expense_id) >= 0:
+                return month, store
+        for month, entry in self.manifest.items():
+            if month not in self.stores and entry['min_id'] <= expense_id <= entry['max_id']:
+                store = self.store(month)
+                if store.position(expense_id) >= 0:
+                    return month, store
+        return None, None
+    
+    def flush(self):
+        """Write the changed months and the manifest"""
+        if not self.dirty:
+            return
+        os.makedirs(self.partition_dir, exist_ok=True)
+        old_files = []
+        for month in sorted(self.dirty):
+            store = self.stores[month]
+            old_entry = self.manifest.pop(month, None)
+            if len(store):
+                self.manifest[month] = write_partition(month, store, self.partition_dir)
+            else:
+                del self.stores[month]
+            if old_entry is not None and old_entry['file'] != self.manifest.get(month, {}).get('file'):
+                # Emptied, or moved between plain JSON and the archive
+                old_files.append(old_entry['file'])
+        write_manifest(self.manifest, self.partition_dir)
+        remove_partition_files(old_files, self.partition_dir)
+        self.dirty = set()
+
+
+class PartitionedLedger:
+    """List-like ledger over month partitions; filters narrow the months and rows touched.
+    
+    Only the manifest is read up front. A query loads just the months its
+    date range covers (a filter_this_month view never opens last year).
+    Whole-month totals come from the manifest's per-month stats, so archived
+    months are only decompressed when their rows are needed. Narrowed ledgers
+    share one PartitionCache, so a month is loaded once.
+    
+    Rows come back month by month, oldest month first, and in insertion order
+    within a month, so a back-dated entry is listed (and first seen by the
+    daily totals) with its own month, not at the end as in a flat ledger.
+    Merging on a ledger-wide sequence would mean loading every month just to
+    iterate; sorted views are unaffected.
+    """
+    
+    def __init__(self, partition_dir=None, start_date=None, end_date=None, equals=(), cache=None):
+        self.cache = cache or PartitionCache(partition_dir)
+        self.start_date = start_date
+        self.end_date = end_date
+        self.equals = tuple(equals)
+    
+    def _narrow(self, start_date=None, end_date=None, equals=()):
+        if self.start_date is not None and (start_date is None or self.start_date > start_date):
+            start_date = self.start_date
+        if self.end_date is not None and (end_date is None or self.end_date < end_date):
+            end_date = self.end_date
+        return PartitionedLedger(start_date=start_date, end_date=end_date,
+                                 equals=self.equals + tuple(equals), cache=self.cache)
+    
+    def _months(self, reverse=False):
+        months = []
+        for month in self.cache.months():
+            if self.start_date is not None and month < self.start_date[:7]:
+                continue
+            if self.end_date is not None and month > self.end_date[:7]:
+                continue
+            months.append(month)
+        if reverse:
+            months.reverse()
+        return months
+    
+    def _whole_month(self, month):
+        """True if the date range covers the entire month"""
+        last_day = calendar.monthrange(int(month[:4]), int(month[5:7]))[1]
+        return ((self.start_date is None or self.start_date <= f"{month}-01") and
+                (self.end_date is None or self.end_date >= f"{month}-{last_day:02d}"))
+    
+    def _slots(self, month, store):
+        """Matching slots of a month's store in insertion order (None when every row matches)"""
+        whole_month = self._whole_month(month)
+        if whole_month and not self.equals:
+            return None
+        
+        if whole_month:
+            keep = None
+        else:
+            keep = set(store.positions_between(self.start_date or "0001-01-01", self.end_date or "9999-12-31"))
+        for column, value in self.equals:
+            matches = store.positions_equal(column, value)
+            keep = set(matches) if keep is None else keep.intersection(matches)
+        return sorted(keep)
+    
+    def _read_months(self, read):
+        """read(store, slots) for every month in range, loading each as it is reached.
+        
+        Slots are only valid until the store next compacts, so each month's
+        slots are worked out and read under one hold of the cache lock.
+        """
+        for month in self._months():
+            with self.cache.lock:
+                store = self.cache.store(month)
+                if store is None:
+                    continue
+                result = read(store, self._slots(month, store))
+            yield result
+    
+    def __iter__(self):
+        for rows in self._read_months(lambda store, slots: store.rows(store.live_slots() if slots is None else slots)):
+            yield from rows
+    
+    def __len__(self):
+        count = 0
+        for month in self._months():
+            if self._whole_month(month) and not self.equals:
+                count = count + self.cache.count(month)
+                continue
+            with self.cache.lock:
+                store = self.cache.store(month)
+                if store is not None:
+                    count = count + len(self._slots(month, store))
+        return count
+    
+    def __bool__(self):
+        return len(self) > 0
+    
+    def copy(self):
+        """Materialize the matching rows as a plain list"""
+        return list(self)
+    
+    def filter_equals(self, column, value):
+        """Rows where a column equals a value"""
+        return self._narrow(equals=[(column, value)])
+    
+    def filter_dates(self, start_date, end_date):
+        """Rows dated between start_date and end_date (inclusive)"""
+        return self._narrow(start_date, end_date)
+    
+    def search(self, search_term):
+        """Rows whose description, category or subcategory contains the term"""
+        def read(store, slots):
+            matches = store.search_positions(search_term)
+            if slots is not None:
+                keep = set(slots)
+                matches = [i for i in matches if i in keep]
+            return store.rows(matches)
+        
+        found = []
+        for rows in self._read_months(read):
+            found.extend(rows)
+        return found
+    
+    def summarize(self, measures, group_by):
+        """Measures and group-by totals merged from each month's (see aggregate_expenses)"""
+        total_paise = 0
+        whole = True
+        count = 0
+        max_amount = 0
+        min_amount = None
+        groups = {}
+        for name in group_by:
+            groups[name] = {}
+        
+        from_stats = not self.equals and set(group_by).issubset(PARTITION_STATS_GROUPS)
+        for month in self._months():
+            with self.cache.lock:
+                stats = self.cache.stats(month) if from_stats and self._whole_month(month) else None
+                if stats is not None:
+                    # Answered from the manifest without loading (or decompressing) the month
+                    part = dict(stats, month={month: stats['total']})
+                else:
+                    store = self.cache.store(month)
+                    if store is None:
+                        continue
+                    slots = self._slots(month, store)
+                    if slots is None:
+                        part = store.summarize(('total', 'count', 'max', 'min'), group_by)
+                    else:
+                        part = ExpenseStore(store.rows(slots)).summarize(('total', 'count', 'max', 'min'), group_by)
+            if part['count'] == 0:
+                continue
+            # Add up in paise so the result doesn't depend on how rows fall into months;
+            # a total stays an int while every part of it is one
+            total_paise = total_paise + round(part['total'] * 100)
+            whole = whole and isinstance(part['total'], int)
+            count = count + part['count']
+            if part['max'] > max_amount:
+                max_amount = part['max']
+            if min_amount is None or part['min'] < min_amount:
+                min_amount = part['min']
+            for name in group_by:
+                totals = groups[name]
+                for key, amount in part[name].items():
+                    entry = totals.setdefault(key, [0, True])
+                    entry[0] = entry[0] + round(amount * 100)
+                    entry[1] = entry[1] and isinstance(amount, int)
+        
+        for name in group_by:
+            for key, (paise, key_whole) in groups[name].items():
+                groups[name][key] = paise_to_amount(paise, key_whole)
+        return aggregate_result(measures, paise_to_amount(total_paise, whole), count, max_amount, min_amount, groups)
+    
+    def _sorted_month(self, month, keys, limit):
+        """One month's matching rows in (field, ascending) key order, at most limit"""
+        with self.cache.lock:
+            store = self.cache.store(month)
+            if store is None:
+                return []
+            slots = self._slots(month, store)
+            order = store.sorted_positions(keys)
+            if slots is not None:
+                keep = set(slots)
+                order = [i for i in order if i in keep]
+            return store.rows(order[:limit])
+    
+    def iter_sorted(self, keys, limit=None):
+        """Rows ordered by (field, ascending) keys, at most limit; ties keep month, then insertion order.
+        
+        Date-first orders walk the months newest or oldest first and stop at
+        the limit, so "latest 10" only loads the latest month(s). Largest-first
+        orders skip unloaded months whose saved max can't make the cut.
+        """
+        keys = tuple(keys)
+        if keys and keys[0][0] == 'date':
+            remaining = limit
+            for month in self._months(reverse=not keys[0][1]):
+                rows = self._sorted_month(month, keys, remaining)
+                yield from rows
+                if remaining is not None:
+                    remaining = remaining - len(rows)
+                    if remaining <= 0:
+                        return
+            return
+        
+        prune = limit is not None and bool(keys) and keys[0][0] == 'amount' and not keys[0][1]
+        months = self._months()
+        if prune:
+            # Biggest months first, so the cut-off rises quickly
+            months.sort(key=lambda month: -(self.cache.stats(month) or {}).get('max', float('inf')))
+        found = {}
+        cutoff = None
+        for month in months:
+            if cutoff is not None:
+                stats = self.cache.stats(month)
+                if stats is not None and stats['max'] < cutoff:
+                    continue
+            # Each month's best `limit` rows are enough to find the overall best
+            found[month] = self._sorted_month(month, keys, limit)
+            if prune:
+                amounts = sorted((expense['amount'] for rows in found.values() for expense in rows), reverse=True)
+                if len(amounts) >= limit:
+                    cutoff = amounts[limit - 1]
+        
+        candidates = []
+        for month in sorted(found):
+            candidates.extend(found[month])
+        for field, ascending in reversed(keys):
+            candidates.sort(key=lambda expense: expense[field], reverse=not ascending)
+        yield from candidates[:limit]
+    
+    def sort_rows(self, keys):
+        """Rows ordered by (field, ascending) keys"""
+        return list(self.iter_sorted(keys))
+    
+    def top_rows(self, n):
+        """The n largest expenses"""
+        return list(self.iter_sorted([('amount', False)], n))
+    
+    def page(self, keys, offset, limit, category=None, search_term=""):
+        """(rows, match count, total) for one page of the sorted, filtered rows"""
+        if search_term:
+            from .analytics import paginate_expenses
+            return paginate_expenses(self.search(search_term), keys, offset, limit, category)
+        ledger = self if category is None else self.filter_equals('category', category)
+        rows = list(ledger.iter_sorted(keys, offset + limit))[offset:]
+        summary = ledger.summarize(('total', 'count'), ())
+        return rows, summary['count'], summary['total']
+    
+    def get(self, expense_id):
+        """Expense dict by ID (or None)"""
+        with self.cache.lock:
+            month, store = self.cache.locate(expense_id)
+            if store is None:
+                return None
+            return store.get(expense_id)
+    
+    def append(self, expense):
+        """Add a new expense to its month"""
+        with self.cache.lock:
+            month = expense['date'][:7]
+            self.cache.store(month, create=True).append(expense)
+            self.cache.dirty.add(month)
+    
+    def extend(self, expenses):
+        """Add many expenses, one batch per month"""
+        with self.cache.lock:
+            for month, month_expenses in split_by_month(expenses).items():
+                self.cache.store(month, create=True).extend(month_expenses)
+                self.cache.dirty.add(month)
+    
+    def update(self, expense_id, fields):
+        """Overwrite fields of one expense (moving it if its month changes); returns False if the ID is unknown"""
+        with self.cache.lock:
+            month, store = self.cache.locate(expense_id)
+            if store is None:
+                return False
+            self.cache.dirty.add(month)
+            new_month = fields.get('date', month)[:7]
+            if new_month == month:
+                return store.update(expense_id, fields)
+            expense = store.get(expense_id)
+            expense.update(fields)
+            store.delete(expense_id)
+            self.cache.store(new_month, create=True).append(expense)
+            self.cache.dirty.add(new_month)
+            return True
+    
+    def delete(self, expense_id):
+        """Remove one expense; returns False if the ID is unknown"""
+        with self.cache.lock:
+            month, store = self.cache.locate(expense_id)
+            if store is None:
+                return False
+            self.cache.dirty.add(month)
+            return store.delete(expense_id)
+    
+    def flush(self):
+        """Save the months changed since the last flush"""
+        with self.cache.lock:
+            self.cache.flush()
+
+
+# Ledger types with their own (columnar, mapped or SQL) query paths
+LEDGER_TYPES = (SqliteLedger, ExpenseStore, StoreView, PartitionedLedger, MappedLedger)
+
+
+def load_ledger():
+    """Load (ledger, data version): a columnar store (or the SQLite / partitioned ledger)"""
+    if storage.STORAGE_MODE == "binary":
+        with lock_storage():
+            data = read_binary_data()
+            version = storage.storage_signature()
+        return ExpenseStore() if data is None else ExpenseStore.from_records(data), version
+    expenses, version = load_expenses_versioned()
+    if isinstance(expenses, list):
+        return ExpenseStore(expenses), version
+    return expenses, version
@@ -0,0 +1,198 @@
+"""
+Optional NumPy backend for the totals helpers
+
+With NumPy installed, aggregate_expenses over a plain list (and so
+calculate_total / calculate_average / find_max_expense / find_min_expense and
+every get_*_totals helper), MappedLedger.summarize and ExpenseStore's max/min
+run as array operations: amounts, ordinal dates and codes are held as arrays
+and each group-by is one numpy.bincount. Without NumPy, or with
+USE_NUMPY = False, the pure-Python loops run instead.
+
+NumPy is imported on the first ledger big enough to use it, not with the
+package, so `import khata` (and every CLI worker) stays fast.
+
+Results are identical to the loops, not just close: bincount and
+add.accumulate add the amounts in ledger order (no pairwise summation),
+groups keep their first-seen order and list totals stay ints when every
+amount in them was an int.
+"""
+
+from datetime import date
+from operator import itemgetter
+
+from .model import aggregate_result
+from .records import RECORD_CODES, RECORD_FIELDS
+
+USE_NUMPY = True  # use NumPy when it is installed; False forces the pure-Python loops
+VECTORIZE_MIN_ROWS = 1000  # smaller lists are quicker in the plain loop
+
+ORDINAL_EPOCH = 719163  # date(1970, 1, 1).toordinal(), day 0 of datetime64
+
+numpy = None  # the module, once available() has imported it
+RECORD_DTYPE = None  # the binary RECORD as a packed structured dtype, for reading records in place
+_numpy_checked = False
+
+
+def available():
+    """True if the NumPy paths should run: USE_NUMPY is set and NumPy imports
+    (tried once, on the first call)"""
+    global numpy, RECORD_DTYPE, _numpy_checked
+    if not USE_NUMPY:
+        return False
+    if not _numpy_checked:
+        try:
+            import numpy as module
+        except ImportError:  # optional: the pure-Python loops are used instead
+            module = None
+        if module is not None:
+            RECORD_DTYPE = module.dtype([(field, '<' + code) for field, code in zip(RECORD_FIELDS, RECORD_CODES)])
+            numpy = module
+        _numpy_checked = True
+    return numpy is not None
+
+
+# ============================================================================
+# GROUPING
+# ============================================================================
+
+def first_seen_codes(values):
+    """(code per value, distinct values): codes count up from 0 in first-seen order"""
+    values = list(values)
+    labels = list(dict.fromkeys(values))
+    lookup = {label: code for code, label in enumerate(labels)}
+    return numpy.fromiter(map(lookup.__getitem__, values), dtype=numpy.intp, count=len(values)), labels
+
+
+def dense_groups(keys, amounts):
+    """(distinct integer keys in first-seen order, their totals) with rows added in order"""
+    low = int(keys.min())
+    bins = (keys - low).astype(numpy.intp)
+    size = int(bins.max()) + 1
+    first = numpy.full(size, len(bins), dtype=numpy.intp)
+    numpy.minimum.at(first, bins, numpy.arange(len(bins), dtype=numpy.intp))
+    present = numpy.flatnonzero(first < len(bins))
+    order = present[numpy.argsort(first[present], kind='stable')]
+    totals = numpy.bincount(bins, weights=amounts, minlength=size)
+    return (order + low).tolist(), totals[order].tolist()
+
+
+def ordered_total(amounts):
+    """Sum added left to right, exactly like `total = total + amount`"""
+    return numpy.add.accumulate(amounts)[-1].item()
+
+
+# ============================================================================
+# PLAIN LISTS
+# ============================================================================
+
+def summarize_expenses(expenses_list, measures, group_by):
+    """aggregate_expenses for a list of expense dicts (None if it's empty or an amount isn't an int or float)"""
+    amounts = list(map(itemgetter('amount'), expenses_list))
+    kinds = set(map(type, amounts))
+    if not amounts or not kinds <= {int, float}:
+        return None
+    values = numpy.fromiter(amounts, dtype=numpy.float64, count=len(amounts))
+    # 1.0 for rows whose amount is an int: a total of only ints is an int in the loop too
+    whole = None
+    if int in kinds and float in kinds and group_by:
+        whole = numpy.fromiter(map(int.__instancecheck__, amounts), dtype=numpy.float64, count=len(amounts))
+    
+    count = len(amounts)
+    total = ordered_total(values)
+    if float not in kinds:
+        total = int(total)
+    max_amount = 0
+    min_amount = None
+    if 'max' in measures:
+        i = int(numpy.argmax(values))
+        if values[i] > 0:
+            max_amount = amounts[i]
+    if 'min' in measures:
+        min_amount = amounts[int(numpy.argmin(values))]
+    
+    groups = {}
+    dates = None
+    for name in group_by:
+        if name in ('date', 'month'):
+            if dates is None:
+                date_codes, dates = first_seen_codes(map(itemgetter('date'), expenses_list))
+            if name == 'date':
+                codes, labels = date_codes, dates
+            else:
+                # First-seen dates give first-seen months
+                month_of, labels = first_seen_codes(text[:7] for text in dates)
+                codes = month_of[date_codes]
+        elif name == 'category_subcategory':
+            codes, labels = first_seen_codes(zip(map(itemgetter('category'), expenses_list),
+                                                 map(itemgetter('subcategory'), expenses_list)))
+        else:
+            codes, labels = first_seen_codes(map(itemgetter(name), expenses_list))
+        
+        totals = numpy.bincount(codes, weights=values, minlength=len(labels)).tolist()
+        if float not in kinds:
+            totals = [int(amount) for amount in totals]
+        elif whole is not None:
+            all_whole = (numpy.bincount(codes, weights=whole, minlength=len(labels)) ==
+                         numpy.bincount(codes, minlength=len(labels))).tolist()
+            totals = [int(amount) if is_whole else amount for amount, is_whole in zip(totals, all_whole)]
+        groups[name] = dict(zip(labels, totals))
+    
+    return aggregate_result(measures, total, count, max_amount, min_amount, groups)
+
+
+# ============================================================================
+# MAPPED RECORDS & COLUMNAR STORES
+# ============================================================================
+
+def summarize_records(mapping, positions, measures, group_by):
+    """MappedLedger.summarize read straight from the mapped records (positions: record numbers or None)"""
+    records = numpy.frombuffer(mapping['records'], dtype=RECORD_DTYPE, count=mapping['count'])
+    if positions is not None:
+        positions = numpy.array(positions, dtype=numpy.intp)
+    
+    def column(field):
+        if positions is None:
+            return records[field]
+        return records[field][positions]
+    
+    amounts = column('amount')
+    count = len(amounts)
+    if count == 0:
+        groups = {}
+        for name in group_by:
+            groups[name] = {}
+        return aggregate_result(measures, 0, 0, 0, None, groups)
+    
+    max_amount = amounts.max().item()
+    if max_amount <= 0:
+        max_amount = 0
+    min_amount = amounts.min().item()
+    
+    tables = mapping['tables']
+    groups = {}
+    for name in group_by:
+        if name in ('category', 'subcategory', 'payment_mode'):
+            keys, totals = dense_groups(column(name), amounts)
+            labels = [tables[name][key] for key in keys]
+        elif name == 'category_subcategory':
+            width = len(tables['subcategory'])
+            keys, totals = dense_groups(column('category').astype(numpy.int64) * width + column('subcategory'), amounts)
+            labels = [(tables['category'][key // width], tables['subcategory'][key % width]) for key in keys]
+        elif name == 'date':
+            keys, totals = dense_groups(column('date'), amounts)
+            labels = [date.fromordinal(key).isoformat() for key in keys]
+        else:
+            # Months since 1970-01
+            days = (column('date').astype(numpy.int64) - ORDINAL_EPOCH).astype('datetime64[D]')
+            keys, totals = dense_groups(days.astype('datetime64[M]').astype(numpy.int64), amounts)
+            labels = [f"{1970 + key // 12:04d}-{key % 12 + 1:02d}" for key in keys]
+        groups[name] = dict(zip(labels, totals))
+    
+    return aggregate_result(measures, ordered_total(amounts), count, max_amount, min_amount, groups)
+
+
+def live_extremes(paise, live):
+    """Slots of the (first) largest and smallest amount among the live rows of ExpenseStore columns"""
+    slots = numpy.flatnonzero(numpy.frombuffer(live, dtype=numpy.bool_))
+    values = numpy.frombuffer(paise, dtype=numpy.int64)[slots]
+    return int(slots[numpy.argmax(values)]), int(slots[numpy.argmin(values)])
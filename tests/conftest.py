@@ -0,0 +1,46 @@
+import os
+import sys
+from datetime import date
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from khata import storage
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Run in an empty directory (the data files are relative paths); storage settings are restored afterwards"""
+    monkeypatch.chdir(tmp_path)
+    for name in ('STORAGE_MODE', 'DATA_FILE', 'JOURNAL_FILE', 'DB_FILE', 'PARTITION_DIR', 'BINARY_FILE', 'LOCK_FILE'):
+        monkeypatch.setattr(storage, name, getattr(storage, name))
+    return tmp_path
+
+
+def make_expense(expense_id, day, amount, category="🛒 Groceries", subcategory="Vegetables (Sabzi)",
+                 payment_mode="Cash", description="test"):
+    return {
+        'id': expense_id,
+        'date': day,
+        'category': category,
+        'subcategory': subcategory,
+        'description': description,
+        'amount': amount,
+        'payment_mode': payment_mode,
+        'created_at': f"{day} 10:00:00",
+        'updated_at': f"{day} 10:00:00"
+    }
+
+
+@pytest.fixture
+def ledger_rows():
+    """A few expenses over two closed months and the current one, with int and float amounts"""
+    today = date.today().strftime('%Y-%m-%d')
+    return [
+        make_expense(1, '2025-01-05', 60),
+        make_expense(2, '2025-01-20', 99.5, category="💡 Utilities", subcategory="Electricity Bill"),
+        make_expense(3, '2025-02-01', 500, payment_mode="Credit Card", description=None),
+        make_expense(4, today, 1200, category="💡 Utilities", subcategory="Electricity Bill"),
+        make_expense(5, today, 0.75, payment_mode="Credit Card")
+    ]
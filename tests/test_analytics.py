@@ -0,0 +1,30 @@
+"""Query helpers over plain lists and the ledger classes"""
+
+import threading
+
+import pytest
+
+import khata
+
+
+@pytest.mark.parametrize("n", [0, -1])
+def test_top_expenses_of_none(ledger_rows, n):
+    assert khata.get_top_expenses(ledger_rows, n) == []
+    assert khata.get_top_expenses(khata.ExpenseStore(ledger_rows), n) == []
+    assert khata.get_top_expenses_by_group(ledger_rows, n) == {}
+    assert khata.get_top_expenses_by_group(ledger_rows, n, group_by='month') == {}
+
+
+def test_top_expenses_by_group(ledger_rows):
+    top = khata.get_top_expenses_by_group(ledger_rows, 1)
+    assert {category: [expense['id'] for expense in rows] for category, rows in top.items()} == {
+        "🛒 Groceries": [3],
+        "💡 Utilities": [4]
+    }
+
+
+def test_latest_expenses_match_full_sort(ledger_rows):
+    latest = [expense['id'] for expense in khata.sort_expenses_by_date(ledger_rows, ascending=False)[:3]]
+    store = khata.ExpenseStore(ledger_rows)
+    for ledger in (ledger_rows, store, khata.StoreView(store, threading.RLock())):
+        assert [expense['id'] for expense in khata.iter_sorted_expenses(ledger, [('date', False)], 3)] == latest
@@ -0,0 +1,56 @@
+"""Batch reports from the command line"""
+
+import json
+import os
+
+import pytest
+
+from khata import cli, storage
+
+
+def write_ledger(path, expenses_list):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(expenses_list, file)
+
+
+def test_same_named_ledgers_get_distinct_outputs(data_dir, ledger_rows):
+    write_ledger("a/expenses_data.json", ledger_rows[:2])
+    write_ledger("b/expenses_data.json", ledger_rows[2:])
+    assert cli.main(["a/expenses_data.json", "b/expenses_data.json", "--format", "json", "--workers", "1"]) == 0
+    
+    with open("reports/a_expenses_data_all.json", encoding='utf-8') as file:
+        assert [expense['id'] for expense in json.load(file)] == [1, 2]
+    with open("reports/b_expenses_data_all.json", encoding='utf-8') as file:
+        assert [expense['id'] for expense in json.load(file)] == [3, 4, 5]
+
+
+def test_ledger_names():
+    assert cli.ledger_names(["home/shop.json", "parents/"]) == ["shop", "parents"]
+    assert cli.ledger_names(["home/shop.json", "home/shop.db"]) == ["home_shop_json", "home_shop_db"]
+    with pytest.raises(ValueError):
+        cli.ledger_names(["home/shop.json", "./home/shop.json"])
+
+
+@pytest.mark.parametrize("mode", ["journal", "sqlite", "partitioned", "binary"])
+def test_ledger_directory_is_read_only(data_dir, ledger_rows, mode):
+    write_ledger("home/expenses_data.json", ledger_rows)
+    settings = {name: getattr(storage, name) for name in ('STORAGE_MODE', 'DATA_FILE', 'PARTITION_DIR', 'LOCK_FILE')}
+    
+    ledger = cli.open_ledger("home", mode)
+    assert [expense['id'] for expense in ledger] == [1, 2, 3, 4, 5]
+    # Nothing migrated into the directory and the storage settings untouched
+    assert os.listdir("home") == ["expenses_data.json"]
+    assert {name: getattr(storage, name) for name in settings} == settings
+
+
+def test_corrupt_ledger_fails(data_dir, ledger_rows, capsys):
+    write_ledger("good.json", ledger_rows)
+    with open("broken.json", 'w', encoding='utf-8') as file:
+        file.write('[{"id": 1, "date": ')
+    
+    assert cli.main(["good.json", "broken.json", "missing.db", "--format", "csv", "--workers", "1"]) == 1
+    errors = capsys.readouterr().err
+    assert "FAILED broken.json: JSONDecodeError" in errors
+    assert "FAILED missing.db: FileNotFoundError" in errors
+    assert os.listdir("reports") == ["good_all.csv"]
@@ -0,0 +1,43 @@
+"""Bulk CSV import"""
+
+import os
+
+import khata
+from khata import storage
+
+from conftest import make_expense
+
+
+def test_journal_import_compacts_once(data_dir, monkeypatch):
+    rows = [make_expense(i, f"2025-01-{i % 28 + 1:02d}", 10 * i) for i in range(1, 31)]
+    lines = khata.export_to_csv_format(rows).splitlines(keepends=True)
+    storage.STORAGE_MODE = "journal"
+    # Every batch passes the threshold, which used to compact after each one
+    monkeypatch.setattr(storage, 'JOURNAL_COMPACT_SIZE', 1)
+    compactions = []
+    compact_journal = storage.compact_journal
+    monkeypatch.setattr(storage, 'compact_journal', lambda expenses: compactions.append(len(expenses)) or compact_journal(expenses))
+    
+    ledger, version = khata.load_ledger()
+    result = khata.import_csv(lines, ledger, batch_size=10)
+    
+    assert result['imported'] == 30
+    assert compactions == [30]
+    assert os.path.getsize(storage.JOURNAL_FILE) == 0
+    assert [expense['amount'] for expense in storage.read_snapshot()] == [10 * i for i in range(1, 31)]
+
+
+def test_non_finite_amounts_are_skipped(data_dir):
+    lines = ["Date,Category,Amount,Payment Mode\n"]
+    for amount in ("nan", "inf", "-inf", "Infinity", "(NaN)", "60"):
+        lines.append(f"2025-01-05,🛒 Groceries,{amount},Cash\n")
+    ledger = []
+    result = khata.import_csv(lines, ledger)
+    
+    assert result['imported'] == 1
+    assert result['skipped'] == 5
+    assert all(message.startswith("Bad amount") for line, message in result['errors'])
+    assert [expense['amount'] for expense in ledger] == [60.0]
+    # The saved file still loads into the app's ledger
+    ledger, version = khata.load_ledger()
+    assert khata.calculate_total(ledger) == 60
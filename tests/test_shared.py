@@ -0,0 +1,24 @@
+"""One ledger shared by every session"""
+
+import pytest
+
+import khata
+from khata import storage
+
+from conftest import make_expense
+
+
+def test_failed_write_reloads_from_disk(data_dir, ledger_rows, monkeypatch):
+    khata.save_expenses(ledger_rows)
+    shared = khata.SharedLedger()
+    assert len(shared.view()) == 5
+    
+    def fail(expenses_list):
+        raise OSError("disk full")
+    with monkeypatch.context() as patch:
+        patch.setitem(storage.STORAGE_BACKENDS["json"], "persist", fail)
+        with pytest.raises(OSError):
+            shared.add_expenses([make_expense(6, '2025-03-01', 10)])
+    
+    # The unsaved row is gone rather than shown to every session
+    assert [expense['id'] for expense in shared.view()] == [1, 2, 3, 4, 5]
@@ -0,0 +1,96 @@
+"""Saving and reloading through every storage mode"""
+
+import json
+import os
+import threading
+
+import pytest
+
+import khata
+from khata import storage
+
+STORAGE_MODES = list(storage.STORAGE_BACKENDS)
+
+
+def as_json(expenses_list):
+    # Compares values, key order and int vs float (60 must not come back as 60.0)
+    return json.dumps(list(expenses_list), ensure_ascii=False)
+
+
+@pytest.mark.parametrize("mode", STORAGE_MODES)
+def test_int_amounts_round_trip(data_dir, ledger_rows, mode):
+    storage.STORAGE_MODE = mode
+    khata.save_expenses(ledger_rows)
+    assert as_json(khata.load_expenses()) == as_json(ledger_rows)
+    
+    # Through the app's ledger (ExpenseStore for the file modes) and back to disk
+    ledger, version = khata.load_ledger()
+    assert as_json(ledger) == as_json(ledger_rows)
+    khata.save_expenses(ledger, version)
+    assert as_json(khata.load_expenses()) == as_json(ledger_rows)
+
+
+@pytest.mark.parametrize("mode", STORAGE_MODES)
+def test_edited_int_amount_stays_exact(data_dir, ledger_rows, mode):
+    storage.STORAGE_MODE = mode
+    khata.save_expenses(ledger_rows)
+    ledger, version = khata.load_ledger()
+    old = ledger_rows[0]
+    khata.update_expense(ledger, old['id'], old['date'], old['category'], old['subcategory'],
+                         old['description'], 12345, old['payment_mode'])
+    khata.persist_expenses(ledger)
+    
+    reloaded, version = khata.load_ledger()
+    assert khata.get_expense_by_id(reloaded, old['id'])['amount'] == 12345
+    assert type(khata.get_expense_by_id(reloaded, old['id'])['amount']) is int
+    assert khata.calculate_total(reloaded) == 12345 + 99.5 + 500 + 1200 + 0.75
+    # Whole-rupee rows total to an int, as they would in a plain list
+    early = khata.filter_by_date_range(reloaded, "2025-01-01", "2025-02-28")
+    assert repr(khata.get_category_wise_totals(early)["🛒 Groceries"]) == "12845"
+
+
+def test_csv_export_keeps_int_amounts(ledger_rows):
+    lines = khata.export_to_csv_format(khata.ExpenseStore(ledger_rows)).splitlines()
+    assert lines[1:] == khata.export_to_csv_format(ledger_rows).splitlines()[1:]
+    assert ",60," in lines[1] and ",99.5," in lines[2]
+
+
+def test_sqlite_connection_per_thread(data_dir, ledger_rows):
+    storage.STORAGE_MODE = "sqlite"
+    khata.save_expenses(ledger_rows)
+    ledger = khata.load_expenses()
+    assert storage.sqlite_connect() is storage.sqlite_connect()
+    
+    # Another thread gets its own connection (sqlite3 connections are per thread)
+    seen = []
+    thread = threading.Thread(target=lambda: seen.append((storage.sqlite_connect(), len(ledger))))
+    thread.start()
+    thread.join()
+    assert seen[0][0] is not storage.sqlite_connect()
+    assert seen[0][1] == 5
+    
+    # A database replaced underneath is reopened, not read through the stale connection
+    os.remove(storage.DB_FILE)
+    khata.save_expenses(ledger_rows[:2])
+    assert [expense['id'] for expense in khata.load_expenses()] == [1, 2]
+    
+    # So is one a caller closed
+    storage.sqlite_connect().close()
+    assert [expense['id'] for expense in khata.load_expenses()] == [1, 2]
+
+
+@pytest.mark.parametrize("mode", STORAGE_MODES)
+def test_stale_full_save_is_refused(data_dir, ledger_rows, mode):
+    storage.STORAGE_MODE = mode
+    khata.save_expenses(ledger_rows)
+    stale, version = khata.load_expenses_versioned()
+    stale = list(stale)
+    
+    # Another writer adds a row after we loaded
+    other, other_version = khata.load_ledger()
+    khata.add_expense(other, '2025-03-01', "🛒 Groceries", "Vegetables (Sabzi)", "other writer", 40, "Cash")
+    khata.persist_expenses(other)
+    
+    with pytest.raises(storage.StaleDataError):
+        khata.save_expenses(stale, version)
+    assert len(khata.load_expenses_versioned()[0]) == 6
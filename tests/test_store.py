@@ -0,0 +1,71 @@
+"""ExpenseStore and StoreView against the plain-list helpers"""
+
+import threading
+
+import pytest
+
+import khata
+
+from conftest import make_expense
+
+SEARCH_TERMS = ["", "a", "MI", "il", "milk", "Milk Packet", "SABZI", "(sabzi)", "bill", "eLeCtRiCiTy", "₹",
+                "Über", "xyz", "vegetables (sabzi) "]
+DESCRIPTIONS = ["Milk packet", "milk", "Sabzi from mandi", None, "", "Electricity BILL for March",
+                "Über ride ₹", "DAL and rice", "  spaces  "]
+
+
+def search_ids(expenses_list, term):
+    return [expense['id'] for expense in khata.search_expenses(expenses_list, term)]
+
+
+def assert_same_search(rows, store):
+    view = khata.StoreView(store, threading.RLock())
+    for term in SEARCH_TERMS:
+        expected = search_ids(rows, term)
+        assert search_ids(store, term) == expected, term
+        assert search_ids(view, term) == expected, term
+
+
+@pytest.fixture
+def search_rows():
+    rows = []
+    for i in range(1, 151):
+        if i % 3 == 0:
+            category, subcategory = "💡 Utilities", "Electricity Bill"
+        else:
+            category, subcategory = "🛒 Groceries", "Vegetables (Sabzi)"
+        rows.append(make_expense(i, f"2025-01-{i % 28 + 1:02d}", i, category, subcategory,
+                                 description=DESCRIPTIONS[i % len(DESCRIPTIONS)]))
+    return rows
+
+
+def test_search_matches_linear_scan(search_rows):
+    assert_same_search(search_rows, khata.ExpenseStore(search_rows))
+
+
+def test_search_after_edits_and_compaction(search_rows):
+    rows = [dict(expense) for expense in search_rows]
+    store = khata.ExpenseStore(search_rows)
+    # Build the index first, so the edits below go through its incremental updates
+    assert_same_search(rows, store)
+    
+    # The helpers return the ledger (a new list when deleting from a plain list)
+    for edit in (lambda ledger: khata.update_expense(ledger, 5, '2025-01-05', "💡 Utilities", "Water Bill",
+                                                     "Mineral water MILK", 10, "Cash"),
+                 lambda ledger: khata.update_expense(ledger, 6, '2025-01-06', "🛒 Groceries", "Fruits (Phal)",
+                                                     None, 10, "Cash"),
+                 lambda ledger: khata.delete_expense(ledger, 7)):
+        rows, store = edit(rows), edit(store)
+    assert_same_search(rows, store)
+    
+    # Enough deletes to compact the store (its slots are renumbered)
+    for expense_id in range(8, 120):
+        rows = khata.delete_expense(rows, expense_id)
+        store = khata.delete_expense(store, expense_id)
+    assert len(store) == len(rows) == 37
+    assert_same_search(rows, store)
+    
+    added = make_expense(200, '2025-01-30', 1, description="fresh Milk after compaction")
+    rows = khata.add_expenses(rows, [dict(added)])
+    store = khata.add_expenses(store, [dict(added)])
+    assert_same_search(rows, store)